@@ -0,0 +1,132 @@
+import argparse
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+# 合成语料默认的摄像头目录，与配置文件中的摄像头key对应
+DEFAULT_CAMERAS = ('bedroom', 'living_room', 'dining_room')
+
+
+def render_video(path, width=640, height=360, fps=20, seconds=10, seed=0):
+    """渲染一段合成视频：带噪声的背景上有一个移动的矩形
+
+    Args:
+        path: 输出 .mp4 文件路径
+        width: 画面宽度
+        height: 画面高度
+        fps: 帧率
+        seconds: 时长（秒）
+        seed: 随机种子，决定背景和矩形的运动轨迹
+    Returns:
+        int: 写入的帧数
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+    box_w, box_h = max(8, width // 8), max(16, height // 3)
+    x, y = int(rng.integers(0, width - box_w)), int(rng.integers(0, height - box_h))
+    dx, dy = int(rng.integers(2, 6)), int(rng.integers(1, 4))
+    color = tuple(int(c) for c in rng.integers(128, 256, size=3))
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"无法创建视频文件: {path}")
+    frame_total = int(fps * seconds)
+    try:
+        for _ in range(frame_total):
+            frame = background.copy()
+            cv2.rectangle(frame, (x, y), (x + box_w, y + box_h), color, -1)
+            writer.write(frame)
+            x += dx
+            y += dy
+            if x < 0 or x + box_w >= width:
+                dx = -dx
+                x += 2 * dx
+            if y < 0 or y + box_h >= height:
+                dy = -dy
+                y += 2 * dy
+    finally:
+        writer.release()
+    return frame_total
+
+
+def generate_corpus(root, cameras=DEFAULT_CAMERAS, days=2, videos_per_half=5, width=640, height=360,
+                    fps=20, seconds=10, start_date='20240301', seed=0):
+    """生成与NAS目录结构一致的合成视频语料
+
+    目录结构为 {root}/{摄像头}/{YYYYMMDD}{AM|PM}/{MM}M{SS}S_{时间戳}.mp4。
+    每个摄像头只渲染一次模板视频，其余文件复制模板，生成大规模语料也很快。
+
+    Args:
+        root: 语料根目录
+        cameras: 摄像头目录名列表
+        days: 天数
+        videos_per_half: 每个半天目录中的视频数
+        width, height, fps, seconds: 视频参数
+        start_date: 起始日期，格式YYYYMMDD
+        seed: 随机种子
+    Returns:
+        dict: {摄像头: [相对root的视频路径, ...]}
+    """
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, '%Y%m%d')
+    corpus = {}
+    for camera_index, camera in enumerate(cameras):
+        template = os.path.join(root, f".template_{camera}.mp4")
+        os.makedirs(root, exist_ok=True)
+        render_video(template, width, height, fps, seconds, seed=seed * 1000 + camera_index)
+        paths = []
+        for day in range(days):
+            date = start + timedelta(days=day)
+            for half, hour_range in (('AM', range(0, 12)), ('PM', range(12, 24))):
+                folder = f"{camera}/{date.strftime('%Y%m%d')}{half}"
+                os.makedirs(os.path.join(root, folder), exist_ok=True)
+                # 每个视频的录制时间在半天内随机分布，文件名带unix时间戳
+                moments = sorted(rng.randrange(len(hour_range) * 3600) for _ in range(videos_per_half))
+                for offset in moments:
+                    recorded = date + timedelta(hours=hour_range[0], seconds=offset)
+                    name = f"{recorded.minute:02d}M{recorded.second:02d}S_{int(recorded.timestamp())}.mp4"
+                    shutil.copyfile(template, os.path.join(root, folder, name))
+                    paths.append(f"{folder}/{name}")
+        os.unlink(template)
+        corpus[camera] = paths
+    return corpus
+
+
+def add_corpus_arguments(parser):
+    """为命令行添加合成语料参数"""
+    parser.add_argument('--cameras', type=str, default=','.join(DEFAULT_CAMERAS),
+                        help="摄像头目录名，逗号分隔")
+    parser.add_argument('--days', type=int, default=2, help="天数，默认2")
+    parser.add_argument('--videos-per-half', type=int, default=5, help="每个半天目录中的视频数，默认5")
+    parser.add_argument('--width', type=int, default=640, help="视频宽度，默认640")
+    parser.add_argument('--height', type=int, default=360, help="视频高度，默认360")
+    parser.add_argument('--fps', type=int, default=20, help="帧率，默认20")
+    parser.add_argument('--seconds', type=float, default=10, help="视频时长（秒），默认10")
+
+
+def generate_corpus_from_args(root, args, seed=0):
+    """根据命令行参数生成合成语料"""
+    return generate_corpus(root, cameras=[camera for camera in args.cameras.split(',') if camera],
+                           days=args.days, videos_per_half=args.videos_per_half, width=args.width,
+                           height=args.height, fps=args.fps, seconds=args.seconds, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成用于基准测试的合成视频语料')
+    parser.add_argument('root', type=str, help="语料根目录")
+    add_corpus_arguments(parser)
+    parser.add_argument('--seed', type=int, default=0, help="随机种子，默认0")
+    args = parser.parse_args()
+
+    corpus = generate_corpus_from_args(args.root, args, args.seed)
+    for camera, paths in corpus.items():
+        print(f"{camera}: {len(paths)} 个视频")
+    print(f"语料保存至 {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Semaphore
+
+from ..utils.deadline import DeadlineExceeded, call_with_timeout
+from ..utils.fileHandler.file_handler import FileHandler, FileStat
+
+
+class FakeFileHandler(FileHandler):
+    """基于本地目录的模拟NAS后端，用于基准测试
+
+    每次远程操作（列目录、stat、打开文件）注入固定延迟，读取按带宽限速，
+    并发操作数受会话数限制，可按概率注入读取错误和读取卡住。
+    卡住的读取一直占用会话，直到其句柄被放弃（abandon() 或读取超时）后出错返回，其他读取不受影响；
+    设置 op_timeout 时与SMB后端一样，单次读取超时后放弃该句柄并抛出DeadlineExceeded。
+    get_local_path 始终返回None，使调用方走与SMB相同的读取+临时文件路径。
+    多进程解码时按构造参数在子进程中重建，各进程的统计和会话数互相独立。
+    """
+
+    def __init__(self, root, latency=0.005, bandwidth_mbps=100, error_rate=0.0, max_sessions=8, seed=0,
+                 stall_rate=0.0, op_timeout=None):
+        """
+        Args:
+            root: 本地语料根目录
+            latency: 每次远程操作的延迟（秒）
+            bandwidth_mbps: 读取带宽（MB/s），0表示不限速
+            error_rate: 读取失败的概率
+            max_sessions: 模拟的会话数，超出时操作排队等待
+            seed: 错误注入的随机种子
+            stall_rate: 读取卡住的概率
+            op_timeout: 单次读取的期限（秒），为空则不限制
+        """
+        self.root = root
+        self.latency = latency
+        self.bandwidth_mbps = bandwidth_mbps
+        self.bandwidth = bandwidth_mbps * 1024 * 1024
+        self.error_rate = error_rate
+        self.max_sessions = max_sessions
+        self._sessions = Semaphore(max_sessions)
+        self.stall_rate = stall_rate
+        self.op_timeout = op_timeout
+        self._rng = random.Random(seed)
+        self._lock = Lock()
+        # 卡住的读取: {发起读取的线程: 放弃句柄时触发的事件}
+        self._stalled = {}
+        self._io_executor = None
+        self.seed = seed
+        self.stats = {'ops': 0, 'reads': 0, 'bytes_read': 0, 'injected_errors': 0,
+                      'injected_stalls': 0, 'abandoned_reads': 0}
+
+    def __reduce__(self):
+        # 锁和会话信号量无法pickle，传给子进程时按构造参数重建
+        return (FakeFileHandler, (self.root, self.latency, self.bandwidth_mbps, self.error_rate, self.max_sessions,
+                                  self.seed, self.stall_rate, self.op_timeout))
+
+    def _get_full_path(self, path):
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def _remote_op(self, transfer_bytes=0, stall=None):
+        """占用一个会话并等待延迟和传输时间，stall为事件时一直等到句柄被放弃"""
+        with self._sessions:
+            if stall is not None:
+                stall.wait()
+                raise ConnectionAbortedError("文件句柄已被放弃")
+            delay = self.latency
+            if self.bandwidth and transfer_bytes:
+                delay += transfer_bytes / self.bandwidth
+            if delay:
+                time.sleep(delay)
+        with self._lock:
+            self.stats['ops'] += 1
+
+    def _scandir(self, path):
+        self._remote_op()
+        with os.scandir(self._get_full_path(path)) as entries:
+            return sorted((entry.name, entry.is_dir()) for entry in entries
+                          if not (entry.name.startswith('.') or entry.name.startswith('@')))
+
+    def list_video_files(self, path='', video_filter=None):
+        return list(self.iter_video_files(path, video_filter))
+
+    def iter_video_files(self, path='', video_filter=None):
+        for name, is_dir in self._scandir(path):
+            if is_dir:
+                if video_filter is None or video_filter.accept_dir(name):
+                    yield from self.iter_video_files(f"{path}/{name}", video_filter)
+            elif name.endswith('.mp4'):
+                if video_filter is None or video_filter.accept_file(name):
+                    yield f"{path}/{name}"
+
+    def list_files(self, path='', excludes=[]):
+        self._remote_op()
+        return [name for name in os.listdir(self._get_full_path(path)) if name not in excludes]
+
+    def read(self, path, mode='rb'):
+        full_path = self._get_full_path(path)
+        size = os.path.getsize(full_path)
+        with self._lock:
+            self.stats['reads'] += 1
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            if fail:
+                self.stats['injected_errors'] += 1
+            stall = None
+            if self.stall_rate and self._rng.random() < self.stall_rate:
+                self.stats['injected_stalls'] += 1
+                stall = self._stalled[threading.get_ident()] = Event()
+        try:
+            call_with_timeout(self.op_timeout, self._remote_op, size, stall)
+        except DeadlineExceeded:
+            self._release_stall(threading.get_ident())
+            raise
+        finally:
+            if stall is not None:
+                with self._lock:
+                    if self._stalled.get(threading.get_ident()) is stall:
+                        del self._stalled[threading.get_ident()]
+        if fail:
+            raise OSError(f"注入的读取错误: {path}")
+        with open(full_path, mode) as file:
+            data = file.read()
+        with self._lock:
+            self.stats['bytes_read'] += len(data)
+        return data
+
+    def read_range(self, path, offset, length):
+        with open(self._get_full_path(path), 'rb') as file:
+            file.seek(offset)
+            data = file.read(length)
+        self._remote_op(len(data))
+        with self._lock:
+            self.stats['reads'] += 1
+            self.stats['bytes_read'] += len(data)
+        return data
+
+    def path_exists(self, path):
+        self._remote_op()
+        return os.path.exists(self._get_full_path(path))
+
+    def stat(self, path):
+        self._remote_op()
+        result = os.stat(self._get_full_path(path))
+        return FileStat(result.st_size, result.st_mtime)
+
+    def abandon(self, thread):
+        """放弃线程卡住的读取句柄，该读取出错返回"""
+        self._release_stall(thread.ident)
+
+    def _release_stall(self, thread_id):
+        with self._lock:
+            stall = self._stalled.pop(thread_id, None)
+            if stall is not None:
+                self.stats['abandoned_reads'] += 1
+        if stall is not None:
+            stall.set()
+
+    def get_safe_connections_limit(self):
+        return self.max_sessions
+
+    def for_subprocess(self):
+        return self
+
+    async def async_read(self, path, mode='rb'):
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=self.max_sessions, thread_name_prefix='fake-io')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, self.read, path, mode)
+
+    def shutdown(self):
+        if self._io_executor is not None:
+            self._io_executor.shutdown(wait=True)
+            self._io_executor = None
@@ -0,0 +1,146 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from ..utils.config_reader import get_root_path
+from ..utils.decode import FrameRing
+
+TRANSPORTS = ('pickle', 'shared_memory')
+
+
+def _produce_pickled(queue, barrier, frames, shape):
+    """生产方：每帧经 multiprocessing.Queue 传递，帧数据随消息pickle"""
+    frame = np.zeros(shape, dtype=np.uint8)
+    barrier.wait()
+    for index in range(frames):
+        frame[0, 0, 0] = index % 256
+        queue.put((index, frame))
+    queue.put(None)
+
+
+def _produce_shared(ring, barrier, frames, shape):
+    """生产方：每帧拷贝到共享内存帧槽，只传递槽编号"""
+    frame = np.zeros(shape, dtype=np.uint8)
+    barrier.wait()
+    for index in range(frames):
+        frame[0, 0, 0] = index % 256
+        ring.put(frame, index)
+    ring.put_message(None)
+
+
+def _consume(frame):
+    # 读取整帧，模拟推理或编码对帧数据的一次完整访问
+    return int(frame.max())
+
+
+def measure(transport, shape, frames, producers, slots, start_method='spawn'):
+    """测量一种传递方式的吞吐
+
+    生产方进程就绪后同时开始计时，不计入进程启动时间。
+
+    Returns:
+        float: 耗时秒数
+    """
+    ctx = multiprocessing.get_context(start_method)
+    barrier = ctx.Barrier(producers + 1)
+    per_producer = frames // producers
+    ring = queue = None
+    if transport == 'shared_memory':
+        ring = FrameRing(ctx, slots, int(np.prod(shape)))
+        target, channel = _produce_shared, ring
+    else:
+        # 队列长度与帧槽数相同，两种方式的背压一致
+        queue = ctx.Queue(maxsize=slots)
+        target, channel = _produce_pickled, queue
+    processes = [ctx.Process(target=target, args=(channel, barrier, per_producer, shape), daemon=True)
+                 for _ in range(producers)]
+    for process in processes:
+        process.start()
+    try:
+        barrier.wait()
+        start = time.perf_counter()
+        running = producers
+        while running:
+            if ring is not None:
+                slot, frame, meta = ring.get()
+                if meta is None:
+                    running -= 1
+                    continue
+                _consume(frame)
+                del frame
+                ring.release(slot)
+            else:
+                message = queue.get()
+                if message is None:
+                    running -= 1
+                    continue
+                _consume(message[1])
+        elapsed = time.perf_counter() - start
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if ring is not None:
+            ring.close()
+    return elapsed
+
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(height), int(width), 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比解码进程与消费进程之间pickle传帧和共享内存帧槽的吞吐')
+    parser.add_argument('--resolutions', type=str, default='640x360,1280x720,1920x1080',
+                        help="帧分辨率，逗号分隔，默认640x360,1280x720,1920x1080")
+    parser.add_argument('--frames', type=int, default=600, help="每种情况传递的总帧数，默认600")
+    parser.add_argument('--producers', type=int, default=2, help="生产方进程数，默认2")
+    parser.add_argument('--slots', type=int, default=16, help="帧槽数（pickle方式为队列长度），默认16")
+    parser.add_argument('--start-method', type=str, default='spawn', choices=['spawn', 'forkserver', 'fork'],
+                        help="子进程启动方式，默认spawn")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="每种情况的重复次数，耗时取中位数，默认3")
+    parser.add_argument('-o', '--output', type=str, default='data/benchmarks/frame_transfer.json',
+                        help="结果JSON文件路径，相对路径基于项目根目录")
+    args = parser.parse_args()
+
+    results = {
+        'python': sys.version.split()[0],
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'cpu_count': os.cpu_count(),
+        'resolutions': {},
+    }
+    for resolution in args.resolutions.split(','):
+        shape = parse_resolution(resolution)
+        frames = args.frames // args.producers * args.producers
+        frame_mb = np.prod(shape) / 1024 / 1024
+        entry = {}
+        for transport in TRANSPORTS:
+            samples = [measure(transport, shape, frames, args.producers, args.slots, args.start_method)
+                       for _ in range(args.repeat)]
+            elapsed = statistics.median(samples)
+            entry[transport] = {'elapsed_seconds': elapsed, 'samples_seconds': samples,
+                                'frames_per_second': frames / elapsed,
+                                'mb_per_second': frames * frame_mb / elapsed}
+        entry['speedup'] = entry['pickle']['elapsed_seconds'] / entry['shared_memory']['elapsed_seconds']
+        results['resolutions'][resolution] = entry
+        print(f"{resolution}: pickle {entry['pickle']['frames_per_second']:.0f} 帧/s，"
+              f"共享内存 {entry['shared_memory']['frames_per_second']:.0f} 帧/s，提升 {entry['speedup']:.2f} 倍")
+
+    output = args.output if os.path.isabs(args.output) else os.path.join(get_root_path(), args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"结果保存至 {output}")
+
+
+if __name__ == "__main__":
+    main()
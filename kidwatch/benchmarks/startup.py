@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from ..utils.config_reader import get_root_path
+
+# 各入口模块及其处理器类
+ENTRY_POINTS = {
+    'kidwatch.check_surveillance': 'CheckerSurveillance',
+    'kidwatch.extract_video_frames': 'ExtractVideoFrames',
+    'kidwatch.generate_sample_list': 'GenerateSampleList',
+    'kidwatch.inference_client': 'InferenceClient',
+    'kidwatch.inference_server': 'InferenceServer',
+    'kidwatch.pipeline': 'StreamingPipeline',
+    'kidwatch.video_classifier': 'VideoClassifier',
+}
+
+
+def _run(args):
+    """在全新的解释器中执行命令，返回 (耗时秒数, 退出码, stderr)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=get_root_path(),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, result.returncode, result.stderr
+
+
+def parse_importtime(stderr, top=10):
+    """解析 -X importtime 输出，返回累计耗时最高的导入模块"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.split(':', 1)[1].split('|')]
+        imports.append((name, int(self_us), int(cumulative_us)))
+    imports.sort(key=lambda item: -item[2])
+    return [{'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+            for name, self_us, cumulative_us in imports[:top]]
+
+
+def _summary(samples):
+    return {
+        'min_ms': min(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+def benchmark_entry_point(module, class_name, repeat):
+    """测量单个入口的导入、--help 和处理器构造耗时"""
+    result = {}
+
+    import_samples = []
+    heaviest = []
+    for _ in range(repeat):
+        elapsed, _, stderr = _run(['-X', 'importtime', '-c', f'import {module}'])
+        import_samples.append(elapsed)
+        heaviest = parse_importtime(stderr)
+    result['import'] = _summary(import_samples)
+    result['heaviest_imports'] = heaviest
+
+    help_samples = [_run(['-m', module, '--help'])[0] for _ in range(repeat)]
+    result['help'] = _summary(help_samples)
+
+    # 构造处理器需要config.yaml，但不应建立NAS连接或加载模型
+    construct_samples = []
+    for _ in range(repeat):
+        elapsed, returncode, stderr = _run(
+            ['-c', f'from {module} import {class_name}; {class_name}()'])
+        if returncode != 0:
+            result['construct_error'] = stderr.strip().splitlines()[-1] if stderr.strip() else 'unknown'
+            break
+        construct_samples.append(elapsed)
+    if construct_samples:
+        result['construct'] = _summary(construct_samples)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量各入口模块的导入和启动耗时')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help="每项测量的重复次数，默认5次")
+    parser.add_argument('-o', '--output', type=str, default='data/benchmarks/startup.json',
+                        help="结果JSON文件路径，相对路径基于项目根目录")
+    args = parser.parse_args()
+
+    results = {
+        'python': sys.version.split()[0],
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'entry_points': {},
+    }
+    for module, class_name in ENTRY_POINTS.items():
+        results['entry_points'][module] = benchmark_entry_point(module, class_name, args.repeat)
+        timings = results['entry_points'][module]
+        print(f"{module}: 导入 {timings['import']['median_ms']:.0f}ms, "
+              f"--help {timings['help']['median_ms']:.0f}ms")
+
+    output = args.output if os.path.isabs(args.output) else os.path.join(get_root_path(), args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"结果保存至 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from ..utils.config_reader import get_root_path
+from ..utils.metrics import Metrics
+from ..utils.video_filter import VideoFilter
+from .corpus import add_corpus_arguments, generate_corpus_from_args
+from .fake_file_handler import FakeFileHandler
+
+EXTRACT_MODES = ('normal', 'concurrent', 'async', 'process')
+
+
+class NullDetector:
+    """不做推理的检测器，用于单独测量分类器的读取和解码吞吐"""
+    _result = SimpleNamespace(boxes=SimpleNamespace(data=[]))
+
+    def __call__(self, frames, conf=None, verbose=True):
+        return [self._result] * (len(frames) if isinstance(frames, list) else 1)
+
+
+def build_camera_configs(cameras, sample_interval):
+    """为合成语料构造摄像头配置，目录名即摄像头key"""
+    base = {'sample_size': 0, 'conf_threshold': 0.5, 'height_ratio': 0.7, 'sample_interval': sample_interval}
+    configs = {camera: dict(base, name=camera, folder=camera) for camera in cameras}
+    configs['default'] = dict(base, name='默认', folder='')
+    return configs
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=get_root_path(),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _count_files(directory, suffix):
+    return sum(name.endswith(suffix) for _, _, names in os.walk(directory) for name in names)
+
+
+class ThroughputBenchmark:
+    """在合成语料和模拟NAS上测量列目录、三种抽帧模式和分类器的吞吐"""
+
+    def __init__(self, corpus_root, work_dir, cameras, args):
+        self.corpus_root = corpus_root
+        self.work_dir = work_dir
+        self.cameras = cameras
+        self.args = args
+        self.camera_configs = build_camera_configs(cameras, args.sample_interval)
+
+    def decode_overrides(self):
+        """命令行指定的解码配置，覆盖配置文件中的decode"""
+        args = self.args
+        overrides = {'backend': args.decode_backend, 'width': args.decode_width, 'threads': args.decode_threads}
+        return {key: value for key, value in overrides.items() if value is not None}
+
+    def apply_decode_config(self, handler):
+        handler.decode_config = dict(handler.decode_config or {}, **self.decode_overrides())
+
+    def make_file_handler(self):
+        """每个场景使用新的模拟后端，统计互不干扰"""
+        args = self.args
+        return FakeFileHandler(self.corpus_root, latency=args.latency, bandwidth_mbps=args.bandwidth,
+                               error_rate=args.error_rate, max_sessions=args.sessions, seed=args.seed,
+                               stall_rate=args.stall_rate, op_timeout=args.op_timeout)
+
+    @contextlib.contextmanager
+    def _quiet(self):
+        """未指定--verbose时屏蔽被测代码的日志输出"""
+        if self.args.verbose:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def _measure(self, run_once):
+        """执行一次场景，记录耗时、GC次数、运行指标增量，以及可选的tracemalloc峰值"""
+        metrics = Metrics()
+        counters_before = metrics.snapshot()['counters']
+        gc_before = [stats['collections'] for stats in gc.get_stats()]
+        if self.args.trace_alloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = run_once()
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.args.trace_alloc:
+                result_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        gc_after = [stats['collections'] for stats in gc.get_stats()]
+        counters = metrics.snapshot()['counters']
+        result['allocation'] = {
+            'gc_collections': [after - before for before, after in zip(gc_before, gc_after)],
+            'frame_buffers_allocated': counters.get('frame_buffers_allocated_total', 0)
+                                       - counters_before.get('frame_buffers_allocated_total', 0),
+            'frame_buffers_reused': counters.get('frame_buffers_reused_total', 0)
+                                    - counters_before.get('frame_buffers_reused_total', 0),
+            'frames_decoded': counters.get('frames_decoded_total', 0)
+                              - counters_before.get('frames_decoded_total', 0),
+        }
+        if self.args.trace_alloc:
+            result['allocation']['traced_peak_bytes'] = result_peak
+        return elapsed, result
+
+    def _repeat(self, run_once):
+        """重复执行场景，耗时取中位数，其余字段取最后一次"""
+        samples = []
+        result = {}
+        for _ in range(self.args.repeat):
+            elapsed, result = self._measure(run_once)
+            samples.append(elapsed)
+        result['elapsed_seconds'] = statistics.median(samples)
+        result['samples_seconds'] = samples
+        return result
+
+    def bench_listing(self, video_filter=None):
+        def run_once():
+            handler = self.make_file_handler()
+            files = 0
+            for camera in self.cameras:
+                files += len(handler.list_video_files(camera, video_filter))
+            return {'files': files, 'remote_ops': handler.stats['ops']}
+        result = self._repeat(run_once)
+        result['files_per_second'] = result['files'] / result['elapsed_seconds']
+        return result
+
+    def bench_extract(self, mode):
+        from ..extract_video_frames import ExtractVideoFrames
+
+        output_dir = os.path.join(self.work_dir, f'frames_{mode}')
+        handler_stats = {}
+
+        def run_once():
+            handler = self.make_file_handler()
+            extractor = ExtractVideoFrames()
+            extractor.file_handler = handler
+            extractor.camera_configs = self.camera_configs
+            extractor.output_dir = output_dir
+            self.apply_decode_config(extractor)
+            if self.args.workers:
+                extractor.concurrent_config = dict(extractor.concurrent_config, max_workers=self.args.workers)
+                extractor.async_config = dict(extractor.async_config, max_workers=self.args.workers)
+                extractor.process_config = dict(extractor.process_config, workers=self.args.workers)
+            extractor.autotune = self.args.autotune and mode in ('concurrent', 'async')
+            error = None
+            with self._quiet():
+                try:
+                    if mode == 'concurrent':
+                        extractor.concurrent_download_video_frames()
+                    elif mode == 'async':
+                        asyncio.run(extractor.async_download_video_frames())
+                    elif mode == 'process':
+                        extractor.process_download_video_frames()
+                    else:
+                        extractor.download_video_frames()
+                except Exception as e:
+                    error = str(e)
+                finally:
+                    handler.shutdown()
+            if mode == 'process':
+                # 解码进程各自重建模拟后端，读取统计按写入清单的视频计算
+                handler_stats.update(self._extracted_stats(output_dir))
+            else:
+                handler_stats.update(handler.stats)
+            result = {'frames': _count_files(output_dir, '.jpg'), 'videos_read': handler_stats['reads']}
+            if extractor.autotune:
+                result['autotune'] = {'limit': extractor.tuner.limit, 'best_limit': extractor.tuner.best[1]}
+            if error:
+                result['error'] = error
+            return result
+
+        result = self._repeat(run_once)
+        result.update(bytes_read=handler_stats['bytes_read'], injected_errors=handler_stats['injected_errors'],
+                      injected_stalls=handler_stats['injected_stalls'], abandoned_reads=handler_stats['abandoned_reads'])
+        result['videos_per_second'] = result['videos_read'] / result['elapsed_seconds']
+        result['mb_per_second'] = result['bytes_read'] / 1024 / 1024 / result['elapsed_seconds']
+        return result
+
+    def _extracted_stats(self, output_dir):
+        """按帧目录中的清单统计已读取的视频数和字节数，其余统计在子进程中无法汇总"""
+        from ..utils.frame_store import scan_frame_directories
+
+        directories, _ = scan_frame_directories(output_dir)
+        return {'reads': len(directories),
+                'bytes_read': sum(os.path.getsize(os.path.join(self.corpus_root, directory.video_path.lstrip('/')))
+                                  for directory in directories),
+                'injected_errors': None, 'injected_stalls': None, 'abandoned_reads': None}
+
+    def bench_classify(self, corpus, processes=0):
+        """分类器吞吐，processes大于0时使用多进程解码"""
+        from ..video_classifier import VideoClassifier
+
+        list_file = os.path.join(self.work_dir, 'classify_list.txt')
+        output_file = os.path.join(self.work_dir, 'classify_result.csv')
+        video_paths = [os.path.join(self.corpus_root, path) for paths in corpus.values() for path in paths]
+        with open(list_file, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(video_paths))
+
+        def run_once():
+            classifier = VideoClassifier()
+            classifier.camera_configs = self.camera_configs
+            classifier.decode_processes = processes
+            self.apply_decode_config(classifier)
+            if self.args.null_model:
+                classifier._model = NullDetector()
+            with self._quiet():
+                classifier.batch_process_videos(list_file, output_file)
+            with open(output_file, encoding='utf-8') as file:
+                return {'videos': max(0, sum(1 for _ in file) - 1)}
+
+        try:
+            result = self._repeat(run_once)
+        except ImportError as e:
+            return {'skipped': f"缺少推理依赖: {e}，可使用--null-model只测量读取和解码"}
+        result['model'] = 'null' if self.args.null_model else 'yolov8n'
+        result['videos_per_second'] = result['videos'] / result['elapsed_seconds']
+        return result
+
+    def bench_pipeline(self):
+        from ..pipeline import StreamingPipeline
+        from ..video_classifier import VideoClassifier
+
+        output_file = os.path.join(self.work_dir, 'pipeline_result.csv')
+
+        def run_once():
+            classifier = VideoClassifier()
+            classifier.camera_configs = self.camera_configs
+            if self.args.null_model:
+                classifier._model = NullDetector()
+            handler = self.make_file_handler()
+            pipeline = StreamingPipeline(detector=classifier)
+            pipeline.file_handler = handler
+            pipeline.camera_configs = self.camera_configs
+            self.apply_decode_config(pipeline)
+            with self._quiet():
+                summary = pipeline.run(output_file)
+            return {'videos': summary['processed'], 'failed': len(summary['failed']),
+                    'bytes_read': handler.stats['bytes_read']}
+
+        try:
+            result = self._repeat(run_once)
+        except ImportError as e:
+            return {'skipped': f"缺少推理依赖: {e}，可使用--null-model只测量读取和解码"}
+        result['model'] = 'null' if self.args.null_model else 'yolov8n'
+        result['videos_per_second'] = result['videos'] / result['elapsed_seconds']
+        return result
+
+    def bench_decode(self, corpus):
+        """直接解码本地语料，对比各解码后端在原分辨率和缩放输出下的吞吐"""
+        from ..utils.decode import DECODER_BACKENDS, IntervalSampler, create_decoder
+
+        video_paths = [os.path.join(self.corpus_root, path) for paths in corpus.values() for path in paths]
+        widths = [None, self.args.decode_width or 640]
+        results = {}
+        for backend in DECODER_BACKENDS:
+            for width in widths:
+                options = {'backend': backend, 'width': width, 'threads': self.args.decode_threads or 0}
+
+                def run_once():
+                    retrieved = decoded = 0
+                    for path in video_paths:
+                        with create_decoder(path, IntervalSampler(self.args.sample_interval), options) as decoder:
+                            for _ in decoder:
+                                pass
+                            retrieved += decoder.frames_retrieved
+                            decoded += decoder.frames_decoded
+                    return {'frames_decoded': decoded, 'frames_sampled': retrieved}
+
+                name = f"decode_{backend}_{width or 'full'}"
+                try:
+                    result = self._repeat(run_once)
+                except ImportError as e:
+                    results[name] = {'skipped': f"缺少解码依赖: {e}"}
+                    continue
+                result['videos_per_second'] = len(video_paths) / result['elapsed_seconds']
+                baseline = results.get(f"decode_opencv_{width or 'full'}")
+                if baseline and 'elapsed_seconds' in baseline:
+                    result['speedup_vs_opencv'] = baseline['elapsed_seconds'] / result['elapsed_seconds']
+                results[name] = result
+        return results
+
+    def run(self, corpus, scenarios):
+        results = {}
+        if 'listing' in scenarios:
+            results['listing'] = self.bench_listing()
+            results['listing_filtered_pm'] = self.bench_listing(VideoFilter(halves={'PM'}))
+        for mode in EXTRACT_MODES:
+            if f'extract_{mode}' in scenarios:
+                results[f'extract_{mode}'] = self.bench_extract(mode)
+        if 'classify' in scenarios:
+            results['classify'] = self.bench_classify(corpus)
+        if 'classify_process' in scenarios:
+            results['classify_process'] = self.bench_classify(corpus, self.args.workers or 2)
+        if 'pipeline' in scenarios:
+            results['pipeline'] = self.bench_pipeline()
+        if 'decode' in scenarios:
+            results.update(self.bench_decode(corpus))
+        return results
+
+
+def compare_results(results, baseline):
+    """与基线结果对比各场景耗时，返回 {场景: 变化百分比}"""
+    changes = {}
+    for name, result in results.items():
+        previous = baseline.get('scenarios', {}).get(name, {})
+        if 'elapsed_seconds' in result and previous.get('elapsed_seconds'):
+            changes[name] = (result['elapsed_seconds'] / previous['elapsed_seconds'] - 1) * 100
+    return changes
+
+
+def main():
+    all_scenarios = (['listing'] + [f'extract_{mode}' for mode in EXTRACT_MODES]
+                     + ['classify', 'classify_process', 'pipeline', 'decode'])
+    parser = argparse.ArgumentParser(description='在合成语料和模拟NAS上测量抽帧、列目录和分类吞吐')
+    parser.add_argument('--corpus', type=str, default=None,
+                        help="已有的语料目录，不指定则在临时目录中生成")
+    add_corpus_arguments(parser)
+    parser.add_argument('--scenarios', type=str, default=','.join(all_scenarios),
+                        help=f"要运行的场景，逗号分隔，可选：{','.join(all_scenarios)}")
+    parser.add_argument('--latency', type=float, default=0.005, help="每次远程操作的延迟（秒），默认0.005")
+    parser.add_argument('--bandwidth', type=float, default=100, help="读取带宽（MB/s），0表示不限速，默认100")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="读取失败的概率，默认0")
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help="读取卡住的概率，卡住的读取直到其句柄被放弃才返回，默认0")
+    parser.add_argument('--op-timeout', type=float, default=None,
+                        help="模拟NAS单次读取的期限（秒），超时后放弃该读取的句柄，默认不限制")
+    parser.add_argument('--sessions', type=int, default=8, help="模拟的会话数，默认8")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="覆盖concurrent/async模式配置的max_workers，以及process模式的解码进程数")
+    parser.add_argument('--autotune', action='store_true',
+                        help="concurrent/async抽帧场景自动调整并发数")
+    parser.add_argument('--sample-interval', type=int, default=15, help="抽帧间隔，默认15")
+    parser.add_argument('--decode-backend', type=str, choices=['opencv', 'pyav'], default=None,
+                        help="覆盖配置文件中的解码后端")
+    parser.add_argument('--decode-width', type=int, default=None,
+                        help="解码输出宽度；decode场景默认对比原分辨率和640")
+    parser.add_argument('--decode-threads', type=int, default=None,
+                        help="pyav解码线程数，0表示自动")
+    parser.add_argument('--null-model', action='store_true',
+                        help="分类场景不加载YOLO模型，只测量读取和解码")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子，默认0")
+    parser.add_argument('--trace-alloc', action='store_true',
+                        help="使用tracemalloc记录每个场景的内存分配峰值（会降低吞吐）")
+    parser.add_argument('-r', '--repeat', type=int, default=1, help="每个场景的重复次数，默认1")
+    parser.add_argument('-b', '--baseline', type=str, default=None,
+                        help="用于对比的历史结果JSON文件")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出被测代码的日志")
+    parser.add_argument('-o', '--output', type=str, default='data/benchmarks/throughput.json',
+                        help="结果JSON文件路径，相对路径基于项目根目录")
+    args = parser.parse_args()
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(all_scenarios)
+    if unknown:
+        parser.error(f"未知场景: {','.join(sorted(unknown))}")
+
+    # 基准测试总是记录运行指标，用于统计帧缓冲分配和解码帧数
+    Metrics().enabled = True
+    with tempfile.TemporaryDirectory(prefix='kidwatch_bench_') as work_dir:
+        if args.corpus:
+            corpus_root = args.corpus
+            cameras = [camera for camera in args.cameras.split(',') if camera]
+            handler = FakeFileHandler(corpus_root, latency=0)
+            corpus = {camera: handler.list_video_files(camera) for camera in cameras}
+        else:
+            corpus_root = os.path.join(work_dir, 'corpus')
+            corpus = generate_corpus_from_args(corpus_root, args, args.seed)
+            cameras = list(corpus)
+        print(f"语料: {sum(len(paths) for paths in corpus.values())} 个视频，{len(cameras)} 个摄像头")
+
+        benchmark = ThroughputBenchmark(corpus_root, work_dir, cameras, args)
+        scenario_results = benchmark.run(corpus, scenarios)
+
+    for name, result in scenario_results.items():
+        if 'skipped' in result:
+            print(f"{name}: 跳过，{result['skipped']}")
+        else:
+            print(f"{name}: {result['elapsed_seconds']:.2f}s" + (f"，错误: {result['error']}" if 'error' in result else ''))
+
+    results = {
+        'python': sys.version.split()[0],
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'parameters': {key: value for key, value in vars(args).items()
+                       if key not in ('output', 'baseline', 'verbose')},
+        'corpus_videos': sum(len(paths) for paths in corpus.values()),
+        'scenarios': scenario_results,
+    }
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        results['baseline_commit'] = baseline.get('commit')
+        results['change_percent'] = compare_results(scenario_results, baseline)
+        for name, change in results['change_percent'].items():
+            print(f"{name}: 相比基线 {baseline.get('commit')} 耗时变化 {change:+.1f}%")
+
+    output = args.output if os.path.isabs(args.output) else os.path.join(get_root_path(), args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"结果保存至 {output}")
+
+
+if __name__ == "__main__":
+    main()
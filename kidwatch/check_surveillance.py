@@ -1,53 +1,126 @@
 import argparse
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-import requests
 from .utils.base_handler import BaseHandler
+from .utils.file_count_history import FileCountHistory
+from .utils.profiler import Profiler, add_profile_arguments
+from .utils.fileHandler.file_handler import DirSummary
+
+# 摄像头根目录下按半天划分的日期目录，如 20240301AM
+DATE_FOLDER_PATTERN = re.compile(r'^(\d{8})(AM|PM)$')
 
 class CheckerSurveillance(BaseHandler):
     def __init__(self):
         super().__init__()
         self.notify_config = self.config_reader.get_config('notify')
+        # 通知发送器（及requests）只在需要发送通知时才加载
+        self._notifier = None
+        self.check_config = self.config_reader.get_config('check') or {}
+        # 每日文件数历史记录
+        history_path = self.check_config.get('history_path', 'data/intermediate/surveillance_history.db')
+        if not os.path.isabs(history_path):
+            history_path = os.path.join(self.config_reader.get_root_path(), history_path)
+        self.history = FileCountHistory(history_path)
 
-    def get_camera_files_count(self, camera, date_str):
-        """获取指定摄像头在指定日期的文件数量"""
-        am_path = f"{camera}/{date_str}AM"
-        pm_path = f"{camera}/{date_str}PM"
-        # print(f"Checking {am_path} and {pm_path}")
-        
-        am_exists = self.file_handler.path_exists(am_path)
-        pm_exists = self.file_handler.path_exists(pm_path)
+    def list_date_folders(self, camera):
+        """列出摄像头根目录一次，解析出按日期分组的AM/PM目录
         
-        if not am_exists and not pm_exists:
-            return 0
-        
-        total_files = 0
-        if am_exists:
-            try:
-                am_files = len(self.file_handler.list_video_files(am_path))
-                total_files += am_files
-            except FileNotFoundError:
-                self.log_print(f"Error accessing AM directory: {am_path}")
+        Returns:
+            dict: {日期字符串: [目录名, ...]}，如 {'20240301': ['20240301AM', '20240301PM']}
+        """
+        date_folders = defaultdict(list)
+        try:
+            names = self.file_handler.list_files(path=camera, excludes=['.DS_Store'])
+        except Exception:
+            self.log_print(f"Error accessing camera directory: {camera}")
+            return date_folders
+        for name in names:
+            match = DATE_FOLDER_PATTERN.match(name)
+            if match:
+                date_folders[match.group(1)].append(name)
+        return date_folders
+
+    def get_camera_files_summary(self, camera, date_str, date_folders):
+        """获取指定摄像头在指定日期的文件数和总大小，已记录的日期直接读取历史
         
-        if pm_exists:
-            try:
-                pm_files = len(self.file_handler.list_video_files(pm_path))
-                total_files += pm_files
-            except FileNotFoundError:
-                self.log_print(f"Error accessing PM directory: {pm_path}")
+        Args:
+            camera: 摄像头目录
+            date_str: 日期字符串，格式YYYYMMDD
+            date_folders: list_date_folders 的结果
+        Returns:
+            DirSummary: 文件数和总字节数
+        """
+        recorded = self.recorded_summary(camera, date_str)
+        if recorded is not None:
+            return recorded
+        summaries = [self.file_handler.summarize_video_files(f"{camera}/{name}")
+                     for name in date_folders.get(date_str, [])]
+        summary = DirSummary(sum(item.file_count for item in summaries),
+                             sum(item.total_bytes for item in summaries))
+        self._record_history(camera, date_str, summary)
+        return summary
+
+    def find_last_files_date(self, camera, start_date, date_folders=None):
+        """查找最近一次有文件的日期，最多往前查30天
         
-        return total_files
-
-    def find_last_files_date(self, camera, start_date):
-        """查找最近一次有文件的日期，最多往前查30天"""
-        current_date = start_date
-        for i in range(30):
-            date_str = current_date.strftime('%Y%m%d')
-            files_count = self.get_camera_files_count(camera, date_str)
+        先查询历史记录，只扫描比历史记录更新、且实际存在的日期目录。
+        """
+        if date_folders is None:
+            date_folders = self.list_date_folders(camera)
+        start_str = start_date.strftime('%Y%m%d')
+        earliest_str = (start_date - timedelta(days=29)).strftime('%Y%m%d')
+        recorded_date_str, recorded_files = self.history.last_date_with_files(camera, earliest_str, start_str)
+        candidates = sorted((date_str for date_str in date_folders
+                             if earliest_str <= date_str <= start_str
+                             and (recorded_date_str is None or date_str > recorded_date_str)),
+                            reverse=True)
+        for date_str in candidates:
+            files_count = self.get_camera_files_summary(camera, date_str, date_folders).file_count
             if files_count > 0:
-                return current_date, files_count
-            current_date -= timedelta(days=1)
+                return datetime.strptime(date_str, '%Y%m%d'), files_count
+        if recorded_date_str:
+            return datetime.strptime(recorded_date_str, '%Y%m%d'), recorded_files
         return None, 0
 
+    def recorded_summary(self, camera, date_str):
+        """获取已记录且同步完整的日期的历史记录
+
+        没有文件或文件数明显偏少（同步不完整）的记录可能在之后补齐，返回None，需要重新扫描。
+        """
+        recorded = self.history.get(camera, date_str)
+        if recorded is None or recorded.file_count == 0:
+            return None
+        if self.partial_sync_median(camera, date_str, recorded.file_count) is not None:
+            return None
+        return recorded
+
+    def partial_sync_median(self, camera, date_str, files_count):
+        """文件数明显低于近期中位数时返回该中位数，否则返回None"""
+        median = self.history.rolling_median(camera, date_str, self.check_config.get('median_window', 7))
+        if median is None or files_count >= median * self.check_config.get('partial_ratio', 0.5):
+            return None
+        return median
+
+    def check_partial_sync(self, camera, date_str, files_count):
+        """根据历史中位数判断同步是否不完整
+        
+        Returns:
+            文件数明显低于近期中位数时返回该中位数，否则返回None
+        """
+        median = self.partial_sync_median(camera, date_str, files_count)
+        if median is not None:
+            self.log_print(f"摄像头：{camera} 同步nas可能不完整，{date_str}文件数：{files_count}，"
+                           f"近{self.check_config.get('median_window', 7)}天中位数：{median:g}")
+        return median
+
+    def _record_history(self, camera, date_str, summary):
+        """只记录已经结束的日期，当天文件仍在增加，不写入历史"""
+        if date_str < datetime.now().strftime('%Y%m%d'):
+            self.history.record(camera, date_str, summary)
+
     def check_files(self, check_date=None):
         """检查指定日期或昨天的文件"""
         if check_date:
@@ -66,66 +139,161 @@ class CheckerSurveillance(BaseHandler):
         
         # 检查所有摄像头目录
         cameras = self.file_handler.list_files(path='', excludes=['.DS_Store'])
+        if not cameras:
+            return
         
-        for camera in cameras:
-            # 获取目标日期的文件数
-            target_files = self.get_camera_files_count(camera, target_date_str)
+        with ThreadPoolExecutor(max_workers=self._get_max_workers(len(cameras))) as executor:
+            # 并发列出每个摄像头的根目录，后续查询都基于该结果
+            camera_folders = dict(zip(cameras, executor.map(self.list_date_folders, cameras)))
+            self.profiler.mark_stage('listed')
             
-            # 如果目标日期有文件，继续检查下一个摄像头
-            if target_files > 0:
-                self.log_print(f"摄像头：{camera} 同步nas正常，{target_date_str}文件数：{target_files}")
-                continue
-                
-            # 检查下一天的文件数
-            next_day_files = self.get_camera_files_count(camera, next_date_str)
+            # 目标日期已有完整历史记录的摄像头无需再次扫描，同步不完整的记录重新扫描，可能已补齐
+            recorded_targets = {}
+            for camera in cameras:
+                recorded = self.recorded_summary(camera, target_date_str)
+                if recorded is not None:
+                    recorded_targets[camera] = recorded
             
-            # 如果下一天已经有文件了，说明问题已修复，继续检查下一个摄像头
-            if next_day_files > 0:
-                self.log_print(f"摄像头：{camera} 同步nas已恢复正常，{next_date_str}文件数：{next_day_files}")
-                continue
+            # 把所有摄像头目标日期和下一天的AM/PM目录分散到会话池中并发统计
+            folder_paths = [f"{camera}/{name}"
+                            for camera in cameras
+                            for date_str in (target_date_str, next_date_str)
+                            if not (date_str == target_date_str and camera in recorded_targets)
+                            for name in camera_folders[camera].get(date_str, [])]
+            folder_summaries = dict(zip(folder_paths,
+                                        executor.map(self.file_handler.summarize_video_files, folder_paths)))
+            self.profiler.mark_stage('counted')
             
-            self.log_print(f"摄像头：{camera} 同步nas中断，{target_date_str}文件数：{target_files}")
-            # 如果目标日期和下一天都没有文件，查找最近一次有文件的日期并发送通知
-            last_date, last_files = self.find_last_files_date(camera, target_date - timedelta(days=1))
-            last_date_str = last_date.strftime('%Y%m%d') if last_date else "未找到"
-            self._send_notification(target_date_str, target_files, [camera], last_date_str, last_files)
-
-    def _send_notification(self, date, total_files, missing_cameras, last_date_str, last_files):
-        url = self.notify_config['url']
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-Token': self.notify_config['api_token']
-        }
+            # 各摄像头并发判断，同步中断的摄像头还需查找最近一次有文件的日期
+            futures = {executor.submit(self.check_camera, camera, target_date, next_date_str,
+                                       camera_folders[camera], folder_summaries,
+                                       recorded_targets.get(camera)): camera
+                       for camera in cameras}
+            broken_details = []
+            partial_cameras = []
+            for future in as_completed(futures):
+                try:
+                    broken_detail, partial = future.result()
+                except Exception as e:
+                    self.log_print(f"摄像头：{futures[future]} 检查失败: {str(e)}")
+                    continue
+                if broken_detail is not None:
+                    broken_details.append(broken_detail)
+                if partial is not None:
+                    partial_cameras.append(partial)
         
-        missing_cameras_str = '、'.join(missing_cameras)
-        content = (f"监控同步nas中断\n"
-                  f"异常摄像头：{missing_cameras_str}\n"
-                  f"日期：{date}\n"
-                  f"当天文件数：{total_files}\n"
-                  f"最近有文件日期：{last_date_str}\n"
-                  f"最近日期文件数：{last_files}")
+        self.profiler.mark_stage('checked')
+        # 本次检查的所有异常摄像头合并为一条通知，交给后台线程发送
+        if broken_details or partial_cameras:
+            # 按摄像头排序，通知内容不受各摄像头完成顺序影响
+            self._send_notification(target_date_str, sorted(broken_details), sorted(partial_cameras))
+
+    def check_camera(self, camera, target_date, next_date_str, date_folders, folder_summaries, recorded=None):
+        """根据已统计的目录结果判断单个摄像头的同步状态
+        
+        Args:
+            camera: 摄像头目录
+            target_date: 检查日期
+            next_date_str: 下一天的日期字符串，目标日期没有文件时用于判断是否已恢复
+            date_folders: list_date_folders 的结果
+            folder_summaries: {目录路径: DirSummary}，目标日期和下一天各目录的统计
+            recorded: 目标日期已有的完整历史记录，为None时使用 folder_summaries
+        Returns:
+            tuple: (同步中断详情 (摄像头, 最近有文件日期, 最近日期文件数) 或None,
+                    同步不完整详情 (摄像头, 当天文件数, 近期中位数) 或None)
+        """
+        target_date_str = target_date.strftime('%Y%m%d')
+        target_summary = recorded
+        if target_summary is None:
+            target_summary = self._sum_folder_summaries(camera, target_date_str, date_folders, folder_summaries)
+            self._record_history(camera, target_date_str, target_summary)
+        target_files = target_summary.file_count
         
-        data = {
-            "platform": "wechat",
-            "summary": "监控同步nas中断",
-            "content": content,
-            "extra": {
-                "topic_id": self.notify_config['topic_id']
-            }
-        }
+        # 如果目标日期有文件，检查是否明显少于往常
+        if target_files > 0:
+            self.log_print(f"摄像头：{camera} 同步nas正常，{target_date_str}文件数：{target_files}")
+            median = self.check_partial_sync(camera, target_date_str, target_files)
+            return None, (None if median is None else (camera, target_files, median))
         
-        try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            self.log_print(f"通知发送成功: {response.status_code}， 通知内容：{content}")
-        except requests.exceptions.RequestException as e:
-            self.log_print(f"通知发送失败: {str(e)}， 通知内容：{content}")
+        # 检查下一天的文件数
+        next_summary = self._sum_folder_summaries(camera, next_date_str, date_folders, folder_summaries)
+        self._record_history(camera, next_date_str, next_summary)
+        
+        # 如果下一天已经有文件了，说明问题已修复
+        if next_summary.file_count > 0:
+            self.log_print(f"摄像头：{camera} 同步nas已恢复正常，{next_date_str}文件数：{next_summary.file_count}")
+            return None, None
+        
+        self.log_print(f"摄像头：{camera} 同步nas中断，{target_date_str}文件数：{target_files}")
+        # 目标日期和下一天都没有文件，查找最近一次有文件的日期
+        last_date, last_files = self.find_last_files_date(camera, target_date - timedelta(days=1), date_folders)
+        last_date_str = last_date.strftime('%Y%m%d') if last_date else "未找到"
+        return (camera, last_date_str, last_files), None
+
+    def _get_max_workers(self, camera_count):
+        """并发检查的线程数：配置值、SMB连接池限制和摄像头数取较小值"""
+        max_workers = self.check_config.get('max_workers', 4)
+        return max(1, min(max_workers, self.file_handler.get_safe_connections_limit(), camera_count))
+
+    @staticmethod
+    def _sum_folder_summaries(camera, date_str, date_folders, folder_summaries):
+        """汇总某摄像头某日期所有AM/PM目录的文件数和总大小"""
+        summaries = [folder_summaries[f"{camera}/{name}"] for name in date_folders.get(date_str, [])
+                     if f"{camera}/{name}" in folder_summaries]
+        return DirSummary(sum(item.file_count for item in summaries),
+                          sum(item.total_bytes for item in summaries))
+
+    def _send_notification(self, date, broken_details, partial_cameras):
+        """汇总同步中断和同步不完整的摄像头，生成一条通知并异步发送
+        
+        Args:
+            date: 检查日期
+            broken_details: [(摄像头, 最近有文件日期, 最近日期文件数), ...]
+            partial_cameras: [(摄像头, 当天文件数, 近期中位数), ...]
+        """
+        summary = "监控同步nas中断" if broken_details else "监控同步nas不完整"
+        lines = [summary, f"日期：{date}"]
+        if broken_details:
+            lines.append(f"异常摄像头：{'、'.join(camera for camera, _, _ in broken_details)}")
+            for camera, last_date_str, last_files in broken_details:
+                lines.append(f"{camera}：当天文件数：0，最近有文件日期：{last_date_str}，"
+                             f"最近日期文件数：{last_files}")
+        if partial_cameras:
+            lines.append(f"同步不完整摄像头：{'、'.join(camera for camera, _, _ in partial_cameras)}")
+            for camera, files_count, median in partial_cameras:
+                lines.append(f"{camera}：当天文件数：{files_count}，近期中位数：{median:g}")
+        self.notifier.submit(summary, '\n'.join(lines))
+
+    @property
+    def notifier(self):
+        """懒加载通知发送器"""
+        if self._notifier is None:
+            from .utils.notifier import NotificationDispatcher
+            self._notifier = NotificationDispatcher(self.notify_config, log=self.log_print)
+        return self._notifier
+
+    @notifier.setter
+    def notifier(self, notifier):
+        self._notifier = notifier
+
+    def close(self):
+        """等待通知发送完毕并关闭历史记录"""
+        if self._notifier is not None:
+            self._notifier.close()
+        self.history.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='检查监控文件同步状态')
     parser.add_argument('-d', '--date', type=str, 
                        help='指定检查日期，格式为YYYYMMDD，例如：20240301。不指定则检查昨天的文件。')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     checker = CheckerSurveillance()
-    checker.check_files(args.date) 
+    checker.start_profiler(Profiler.from_args(args))
+    try:
+        checker.check_files(args.date)
+    finally:
+        checker.close()
+        checker.stop_profiler()
+        checker.export_metrics('check_surveillance') 
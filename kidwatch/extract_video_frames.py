@@ -1,14 +1,23 @@
 import argparse
+import csv
 import itertools
 import os
 import cv2
 import tempfile
 import threading
 import asyncio
-import aiofiles
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from .utils.autotune import AdaptiveLimiter, AsyncAdaptiveLimiter, ConcurrencyTuner, add_autotune_arguments
 from .utils.base_handler import BaseHandler
-import pandas as pd
+from .utils.deadline import DeadlineExceeded
+from .utils.frame_store import write_manifest
+from .utils.decode import DecodeTask, FramePool, IntervalSampler, ProcessDecodePool, create_decoder
+from .utils.decode.process_pool import FRAME, OVERSIZED, DecodeWorkerError
+from .utils.profiler import Profiler, add_profile_arguments
+from .utils.schedule import add_schedule_arguments
+from .utils.work_queue import add_work_arguments
+from .utils.video_filter import VideoFilter, add_filter_arguments
 from queue import Queue, Empty
 from threading import Semaphore, Lock
 
@@ -16,37 +25,102 @@ from threading import Semaphore, Lock
 class ExtractVideoFrames(BaseHandler):
     def __init__(self):
         super().__init__()
-        # 创建信号量，限制并发数为session池的安全限制数
-        self.smb_semaphore = Semaphore(self.file_handler.get_safe_connections_limit())
+        # 限制并发数为session池安全限制数的信号量，首次使用时创建
+        self._smb_semaphore = None
+        self._smb_semaphore_lock = Lock()
         # 异步模式的信号量
         self._async_semaphore = None
+        # 自动调整并发数，启用时用可调整的限流器代替上面的信号量
+        self.autotune = False
+        self.autotune_config = self.config_reader.get_config().get('autotune') or {}
+        self._tuner = None
+        # 使用任务队列时整个运行累计的 [视频数, 失败数]，各批次结束时不单独检查失败率
+        self._queue_totals = None
+        self._limiter = None
+        self._async_limiter = None
+        # 异步模式下解码视频帧的线程池
+        self._decode_executor = None
+        # 解码输出缓冲池，各视频之间复用帧内存
+        self.frame_pool = FramePool()
         # 从配置文件获取视频帧处理参数
         self.video_frames_config = self.config_reader.get_config().get('video_frames', {})
         # 获取不同模式的配置
         self.concurrent_config = self.video_frames_config.get('concurrent_mode', {})
         self.async_config = self.video_frames_config.get('async_mode', {})
+        self.process_config = self.config_reader.get_config().get('process_decode') or {}
         # 获取共用的内存限制
         self.max_memory_gb = self.video_frames_config.get('max_memory_gb', 1.5)
         # 获取帧存储路径
-        frames_path = self.video_frames_config.get('frames_path', 'data/raw/frames')
-        self.output_dir = os.path.join(self.config_reader.get_root_path(), frames_path)
+        self.output_dir = self.get_frames_dir()
+
+    @property
+    def smb_semaphore(self):
+        """懒加载信号量，避免构造时就创建文件处理器"""
+        if self._smb_semaphore is None:
+            with self._smb_semaphore_lock:
+                if self._smb_semaphore is None:
+                    self._smb_semaphore = Semaphore(self.file_handler.get_safe_connections_limit())
+        return self._smb_semaphore
 
     @property
     def async_semaphore(self):
         """懒加载异步信号量"""
         if self._async_semaphore is None:
-            # 使用异步模式的并发数限制
-            async_max_workers = self.async_config.get('max_workers', 2)
-            max_workers = min(
-                async_max_workers,
-                self.file_handler.get_safe_connections_limit() // 2,  # SMB连接池限制
-            )
+            max_workers = self._get_async_max_workers()
             self._async_semaphore = asyncio.Semaphore(max_workers)
             self.log_print(f"使用协程数: {max_workers}, "
                            f"SMB连接限制: {self.file_handler.get_safe_connections_limit()}, "
                            f"批处理大小: {self.concurrent_config.get('batch_size', 10)}")
         return self._async_semaphore
 
+    @property
+    def decode_executor(self):
+        """懒加载异步模式的解码线程池，大小与协程并发数一致，自动调整时为并发数上限"""
+        if self._decode_executor is None:
+            max_workers = self.tuner.maximum if self.autotune else self._get_async_max_workers()
+            self._decode_executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix='frame-decode')
+        return self._decode_executor
+
+    @property
+    def tuner(self):
+        """懒加载并发数调节器，上限为SMB连接池限制的一半，与固定并发数的计算方式一致"""
+        if self._tuner is None:
+            maximum = max(1, self.file_handler.get_safe_connections_limit() // 2)
+            initial = self.concurrent_config.get('max_workers', 2)
+            self._tuner = ConcurrencyTuner.from_config(self.autotune_config, initial, maximum, self.log_print)
+            self.log_print(f"自动调整并发数: 初始 {self._tuner.limit}, "
+                           f"范围 {self._tuner.minimum}-{self._tuner.maximum}")
+        return self._tuner
+
+    @property
+    def limiter(self):
+        """懒加载并发模式的可调整限流器"""
+        if self._limiter is None:
+            self._limiter = AdaptiveLimiter(self.tuner)
+        return self._limiter
+
+    @property
+    def async_limiter(self):
+        """懒加载异步模式的可调整限流器"""
+        if self._async_limiter is None:
+            self._async_limiter = AsyncAdaptiveLimiter(self.tuner)
+        return self._async_limiter
+
+    def _async_slot(self, video_path):
+        """异步模式的并发名额：自动调整时使用可调整限流器，否则使用固定大小的信号量"""
+        if self.autotune:
+            return self.async_limiter.slot(self.video_costs.get(video_path, 1))
+        return self.async_semaphore
+
+    def _get_async_max_workers(self):
+        """异步模式的并发数：配置的max_workers与SMB连接池限制取较小值"""
+        async_max_workers = self.async_config.get('max_workers', 2)
+        return max(1, min(
+            async_max_workers,
+            self.file_handler.get_safe_connections_limit() // 2,  # SMB连接池限制
+        ))
+
     def clear_frames_directory(self, directory):
         """清空frames目录"""
         if os.path.exists(directory):
@@ -60,8 +134,39 @@ class ExtractVideoFrames(BaseHandler):
         else:
             os.makedirs(directory)
 
+    def _finish_run(self, total_count, failed_videos, timed_out_videos, total_frames):
+        """输出最终统计信息，失败率过高时抛出异常"""
+        self.profiler.mark_stage('processed')
+        if self._tuner is not None:
+            self.log_print(self._tuner.summary())
+        self.log_print("\n=== 处理完成 ===")
+        self.log_print(f"总视频数: {total_count}")
+        self.log_print(f"成功处理: {total_count - len(failed_videos)}")
+        self.log_print(f"失败数量: {len(failed_videos)}")
+        self.log_print(f"其中超时: {len(timed_out_videos)}")
+        self.log_print(f"总提取帧数: {total_frames}")
+        self.log_cache_stats()
+
+        if failed_videos:
+            self.log_print("\n失败的视频:")
+            for video_path, error in failed_videos:
+                self.log_print(f"{video_path}: {error}")
+
+        if self._queue_totals is not None:
+            # 任务队列模式下一批失败过多不能中断领取，所有批次处理完后按整个运行统计
+            self._queue_totals[0] += total_count
+            self._queue_totals[1] += len(failed_videos)
+            return
+        self._check_failure_rate(total_count, len(failed_videos))
+
+    @staticmethod
+    def _check_failure_rate(total_count, failed_count):
+        """失败率超过30%时抛出异常"""
+        if failed_count > total_count * 0.3:
+            raise RuntimeError(f"处理失败率过高: {failed_count}/{total_count}")
+
     def capture_frames(self, video_path, output_dir):
-        """从视频中按配置的间隔截取帧"""
+        """从视频中按配置的间隔截取帧，完成后在帧目录写入清单，供分类器直接读取"""
         camera_type = self.get_camera_type(video_path)
         sample_interval = self.camera_configs[camera_type]['sample_interval']
         
@@ -70,38 +175,35 @@ class ExtractVideoFrames(BaseHandler):
         video_frame_dir = os.path.join(output_dir, base_name)
         os.makedirs(video_frame_dir, exist_ok=True)
         
-        # 创建临时文件来存储视频数据
-        with tempfile.NamedTemporaryFile(suffix='.mp4') as temp_file:
-            # 从NAS读取视频数据到临时文件
-            video_data = self.file_handler.read(video_path)
-            temp_file.write(video_data)
-            temp_file.flush()
-            
-            # 打开视频文件
-            cap = cv2.VideoCapture(temp_file.name)
-            frame_count = 0
-            saved_count = 0
-            
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                if frame_count % sample_interval == 0:
-                    # 构造输出文件名，保存到视频专属文件夹中
-                    frame_file = f"{video_frame_dir}/frame_{frame_count}.jpg"
-                    cv2.imwrite(frame_file, frame)
-                    saved_count += 1
-                
-                frame_count += 1
-            
-            cap.release()
-            return saved_count
+        # 文件已在本地（如NAS挂载盘）时直接解码，无需拷贝
+        local_path = self.file_handler.get_local_path(video_path)
+        if local_path:
+            frames_count = self._process_video_frames(local_path, video_frame_dir, sample_interval,
+                                                      self.get_decode_options(camera_type))
+        else:
+            # 创建临时文件来存储视频数据
+            with tempfile.NamedTemporaryFile(suffix='.mp4') as temp_file:
+                # 从NAS读取视频数据到临时文件
+                video_data = self.file_handler.read(video_path)
+                temp_file.write(video_data)
+                temp_file.flush()
+
+                frames_count = self._process_video_frames(temp_file.name, video_frame_dir, sample_interval,
+                                                          self.get_decode_options(camera_type))
+        write_manifest(video_frame_dir, video_path, camera_type, sample_interval, frames_count)
+        return frames_count
 
     def capture_frames_with_semaphore(self, video_path, output_dir):
-        """使用信号量保护的帧捕获方法"""
+        """使用信号量保护的帧捕获方法，自动调整时由可调整限流器控制并发数
+
+        视频在看门狗监视下处理，卡住时放弃该视频并立即释放并发名额。
+        """
+        if self.autotune:
+            # 吞吐按估算开销计算，未扫描元数据时按视频个数计算
+            with self.limiter.slot(self.video_costs.get(video_path, 1)):
+                return self.run_watched(video_path, self.capture_frames, video_path, output_dir)
         with self.smb_semaphore:
-            return self.capture_frames(video_path, output_dir)
+            return self.run_watched(video_path, self.capture_frames, video_path, output_dir)
 
     def list_video_files_from_file(self, video_list_path):
         """从文件中读取视频文件列表
@@ -112,85 +214,74 @@ class ExtractVideoFrames(BaseHandler):
             list: 视频文件路径列表
         """
         try:
-            df = pd.read_csv(video_list_path)
-            if 'video_path' not in df.columns:
-                raise ValueError("视频列表文件必须包含'video_path'列")
-            return df['video_path'].tolist()
+            with open(video_list_path, newline='', encoding='utf-8') as file:
+                reader = csv.DictReader(file)
+                if 'video_path' not in (reader.fieldnames or []):
+                    raise ValueError("视频列表文件必须包含'video_path'列")
+                return [row['video_path'] for row in reader if row['video_path']]
         except Exception as e:
             self.log_print(f"读取视频列表文件失败: {str(e)}")
             return []
 
-    def download_video_frames(self, camera=None, date=None, video_list_path=None):
+    def download_video_frames(self, camera=None, date=None, video_list_path=None, video_filter=None,
+                              remote_file_paths=None):
         """下载视频帧到本地
         
         Args:
             camera: 摄像头配置key
             date: 日期字符串
             video_list_path: 视频列表文件路径，如果提供则优先使用列表文件中的视频
+            video_filter: VideoFilter，按日期范围、AM/PM和小时窗口过滤视频
+            remote_file_paths: 已确定的视频列表，提供时不再列目录也不清空输出目录
         """
-        if video_list_path:
-            remote_file_paths = self.list_video_files_from_file(video_list_path)
-            if not remote_file_paths:
-                raise FileNotFoundError(f'视频列表文件 {video_list_path} 中未找到有效的视频文件路径')
-        else:
-            remote_file_paths = self.list_video_files(camera, date)
-            
-        # 清空输出目录
-        self.clear_frames_directory(self.output_dir)
+        if remote_file_paths is None:
+            remote_file_paths = self.resolve_video_files(camera, date, video_list_path, video_filter)
+            self.profiler.mark_stage('listed')
+            # 清空输出目录
+            self.clear_frames_directory(self.output_dir)
         
         # 初始化计数器
         total_count = len(remote_file_paths)
-        processed_count = 0
+        progress = self.create_progress(remote_file_paths)
         failed_videos = []
+        timed_out_videos = []
         total_frames = 0
         
         for remote_file_path in remote_file_paths:
             try:
-                frames_count = self.capture_frames(remote_file_path, self.output_dir)
+                frames_count = self.run_watched(remote_file_path, self.capture_frames,
+                                                remote_file_path, self.output_dir)
+                self.report_video(remote_file_path)
                 total_frames += frames_count
-                processed_count += 1
                 # 输出进度
-                progress = (processed_count / total_count) * 100
-                self.log_print(f"总体进度: {progress:.1f}% ({processed_count}/{total_count})")
+                self.log_print(progress.advance(remote_file_path))
             except Exception as e:
+                if isinstance(e, DeadlineExceeded):
+                    timed_out_videos.append(remote_file_path)
                 failed_videos.append((remote_file_path, str(e)))
+                self.report_video(remote_file_path, str(e))
                 self.log_print(f"处理 {remote_file_path} 时出错: {str(e)}")
-                processed_count += 1
+                progress.advance(remote_file_path)
         
-        # 输出最终统计信息
-        self.log_print("\n=== 处理完成 ===")
-        self.log_print(f"总视频数: {total_count}")
-        self.log_print(f"成功处理: {total_count - len(failed_videos)}")
-        self.log_print(f"失败数量: {len(failed_videos)}")
-        self.log_print(f"总提取帧数: {total_frames}")
-        
-        if failed_videos:
-            self.log_print("\n失败的视频:")
-            for video_path, error in failed_videos:
-                self.log_print(f"{video_path}: {error}")
-
-        # 如果失败太多，抛出异常
-        if len(failed_videos) > total_count * 0.3:  # 失败率超过30%
-            raise RuntimeError(f"处理失败率过高: {len(failed_videos)}/{total_count}")
+        self._finish_run(total_count, failed_videos, timed_out_videos, total_frames)
 
-    def concurrent_download_video_frames(self, camera=None, date=None, video_list_path=None):
+    def concurrent_download_video_frames(self, camera=None, date=None, video_list_path=None, video_filter=None,
+                                         remote_file_paths=None):
         """并发下载视频帧
         
         Args:
             camera: 摄像头配置key
             date: 日期字符串
             video_list_path: 视频列表文件路径
+            video_filter: VideoFilter，按日期范围、AM/PM和小时窗口过滤视频
+            remote_file_paths: 已确定的视频列表，提供时不再列目录也不清空输出目录
         """
         # 获取视频文件列表
-        if video_list_path:
-            remote_file_paths = self.list_video_files_from_file(video_list_path)
-            if not remote_file_paths:
-                raise FileNotFoundError(f'视频列表文件 {video_list_path} 中未找到有效的视频文件路径')
-        else:
-            remote_file_paths = self.list_video_files(camera, date)
-            
-        # 清空输出目录
-        self.clear_frames_directory(self.output_dir)
+        if remote_file_paths is None:
+            remote_file_paths = self.resolve_video_files(camera, date, video_list_path, video_filter)
+            self.profiler.mark_stage('listed')
+            # 清空输出目录
+            self.clear_frames_directory(self.output_dir)
 
         # 使用并发模式的配置参数
         concurrent_max_workers = self.concurrent_config.get('max_workers', 2)
@@ -199,6 +290,9 @@ class ExtractVideoFrames(BaseHandler):
             self.file_handler.get_safe_connections_limit() // 2,  # SMB连接池限制
             len(remote_file_paths)  # 不超过文件数
         )
+        if self.autotune:
+            # 按并发数上限创建线程，实际同时处理的视频数由限流器控制
+            max_workers = min(self.tuner.maximum, len(remote_file_paths))
         self.log_print(f"使用线程数: {max_workers}, SMB连接限制: {self.file_handler.get_safe_connections_limit()}, 批处理大小: {self.concurrent_config.get('batch_size', 10)}")
 
         # 初始化任务队列和结果统计
@@ -206,9 +300,10 @@ class ExtractVideoFrames(BaseHandler):
         for file_path in remote_file_paths:
             task_queue.put(file_path)
         
-        processed_count = 0
         total_count = len(remote_file_paths)
+        progress = self.create_progress(remote_file_paths)
         failed_videos = []
+        timed_out_videos = []
         total_frames = 0
         # 使用并发模式的批处理大小
         batch_size = self.concurrent_config.get('batch_size', 10)
@@ -216,12 +311,6 @@ class ExtractVideoFrames(BaseHandler):
 
         def process_batch():
             """处理一批文件"""
-            batch_results = {
-                'processed': 0,
-                'frames': 0,
-                'failed': []
-            }
-
             while True:
                 # 获取一批任务
                 batch = []
@@ -235,28 +324,38 @@ class ExtractVideoFrames(BaseHandler):
                 if not batch:  # 没有更多任务了
                     break
 
+                # 每批单独统计，合并到总体结果后不再重复计入
+                batch_results = {
+                    'processed': 0,
+                    'frames': 0,
+                    'failed': [],
+                    'timed_out': []
+                }
+
                 # 处理这批文件
                 for video_path in batch:
                     try:
                         frames_count = self.capture_frames_with_semaphore(video_path, self.output_dir)
+                        self.report_video(video_path)
                         batch_results['frames'] += frames_count
                         batch_results['processed'] += 1
                     except Exception as e:
+                        if isinstance(e, DeadlineExceeded):
+                            batch_results['timed_out'].append(video_path)
                         batch_results['failed'].append((video_path, str(e)))
+                        self.report_video(video_path, str(e))
                         self.log_print(f"处理视频 {video_path} 失败: {str(e)}")
                     finally:
+                        progress.advance(video_path)  # 成功和失败的都计入进度
                         task_queue.task_done()
 
                 # 更新总体进度
                 with results_lock:
-                    nonlocal processed_count, total_frames
-                    processed_count += len(batch)  # 使用批次大小更新进度，包括成功和失败的
+                    nonlocal total_frames
                     total_frames += batch_results['frames']
                     failed_videos.extend(batch_results['failed'])
-                    progress = (processed_count / total_count) * 100
-                    self.log_print(f"总体进度: {progress:.1f}% ({processed_count}/{total_count})")
-
-            return batch_results
+                    timed_out_videos.extend(batch_results['timed_out'])
+                    self.log_print(progress.format())
 
         # 使用线程池处理文件
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -269,28 +368,188 @@ class ExtractVideoFrames(BaseHandler):
                 except Exception as e:
                     self.log_print(f"处理批次时发生错误: {str(e)}")
 
-        # 输出最终统计信息
-        self.log_print("\n=== 处理完成 ===")
-        self.log_print(f"总视频数: {total_count}")
-        self.log_print(f"成功处理: {total_count - len(failed_videos)}")
-        self.log_print(f"失败数量: {len(failed_videos)}")
-        self.log_print(f"总提取帧数: {total_frames}")
-        
-        if failed_videos:
-            self.log_print("\n失败的视频:")
-            for video_path, error in failed_videos:
-                self.log_print(f"{video_path}: {error}")
+        self._finish_run(total_count, failed_videos, timed_out_videos, total_frames)
+
+    def process_download_video_frames(self, camera=None, date=None, video_list_path=None, video_filter=None,
+                                      remote_file_paths=None):
+        """多进程解码抽帧
+
+        解码进程读取和解码视频，不受GIL限制；采样帧写入共享内存帧槽，本进程的编码线程直接读取帧槽写成JPEG，
+        帧数据不经过pickle。适合解码占满单核、CPU核数较多时使用。
+
+        Args:
+            camera: 摄像头配置key
+            date: 日期字符串
+            video_list_path: 视频列表文件路径
+            video_filter: VideoFilter，按日期范围、AM/PM和小时窗口过滤视频
+            remote_file_paths: 已确定的视频列表，提供时不再列目录也不清空输出目录
+        """
+        if remote_file_paths is None:
+            remote_file_paths = self.resolve_video_files(camera, date, video_list_path, video_filter)
+            self.profiler.mark_stage('listed')
+            # 清空输出目录
+            self.clear_frames_directory(self.output_dir)
 
-        # 如果失败太多，抛出异常
-        if len(failed_videos) > total_count * 0.3:  # 失败率超过30%
-            raise RuntimeError(f"处理失败率过高: {len(failed_videos)}/{total_count}")
+        total_count = len(remote_file_paths)
+        progress = self.create_progress(remote_file_paths)
+        failed_videos = []
+        timed_out_videos = []
+        total_frames = 0
+
+        tasks = []
+        videos = []
+        for index, video_path in enumerate(remote_file_paths):
+            camera_type = self.get_camera_type(video_path)
+            sample_interval = self.camera_configs[camera_type]['sample_interval']
+            base_name = os.path.splitext(os.path.basename(video_path))[0]
+            video_frame_dir = os.path.join(self.output_dir, base_name)
+            os.makedirs(video_frame_dir, exist_ok=True)
+            tasks.append(DecodeTask(index, video_path, sample_interval, self.get_decode_options(camera_type), True))
+            videos.append((video_frame_dir, camera_type, sample_interval))
+
+        # 每个解码进程各自建立NAS连接，进程数不超过SMB连接池安全限制的一半
+        workers = max(1, min(self.process_config.get('workers', 2),
+                             self.file_handler.get_safe_connections_limit() // 2))
+        encode_workers = self.process_config.get('encode_workers', 4)
+        self.log_print(f"使用解码进程数: {min(workers, total_count)}, 编码线程数: {encode_workers}, "
+                       f"帧槽数: {self.process_config.get('slots', 16)}")
+
+        # 各视频已提交的编码任务，视频解码结束后等待其完成再写入清单
+        encoding = {}
+        finished = set()
+        encoder = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix='frame-encode')
+        pool = ProcessDecodePool.from_config(self.process_config, self.file_handler.for_subprocess(), workers)
+        try:
+            pool.start(tasks)
+            for slot, frame, (kind, index, value, error) in pool.messages():
+                video_frame_dir, camera_type, sample_interval = videos[index]
+                if kind == FRAME:
+                    encoding.setdefault(index, []).append(encoder.submit(
+                        self._encode_slot, pool, slot, frame, f"{video_frame_dir}/frame_{value}.jpg"))
+                    continue
+                video_path = tasks[index].video_path
+                finished.add(index)
+                try:
+                    for future in encoding.pop(index, []):
+                        future.result()
+                    if kind == OVERSIZED:
+                        # 帧放不进帧槽（分辨率超过 max_width x max_height），在本进程中重新抽取整个视频
+                        value = self._capture_in_process(video_path, error)
+                    elif error is not None:
+                        raise RuntimeError(error)
+                    else:
+                        write_manifest(video_frame_dir, video_path, camera_type, sample_interval, value)
+                        self.metrics.inc('videos_processed_total')
+                    self.report_video(video_path)
+                    total_frames += value
+                    self.log_print(progress.advance(video_path))
+                except Exception as e:
+                    if isinstance(e, DeadlineExceeded):
+                        timed_out_videos.append(video_path)
+                    failed_videos.append((video_path, str(e)))
+                    self.report_video(video_path, str(e))
+                    self.log_print(f"处理 {video_path} 时出错: {str(e)}")
+                    progress.advance(video_path)
+        except (DeadlineExceeded, DecodeWorkerError) as e:
+            # 解码进程卡住时尚未完成的视频都记为失败和超时；异常退出时只有其正在解码的视频记为失败，
+            # 尚未开始解码的视频在本进程中继续抽取
+            self.log_print(f"多进程解码中止: {str(e)}")
+            for task in tasks:
+                if task.index in finished:
+                    continue
+                failure = e
+                if isinstance(e, DecodeWorkerError) and task.index not in pool.started:
+                    try:
+                        total_frames += self._capture_in_process(task.video_path, "解码进程已退出")
+                        self.report_video(task.video_path)
+                        self.log_print(progress.advance(task.video_path))
+                        continue
+                    except Exception as video_error:
+                        failure = video_error
+                if isinstance(failure, DeadlineExceeded):
+                    timed_out_videos.append(task.video_path)
+                failed_videos.append((task.video_path, str(failure)))
+                self.report_video(task.video_path, str(failure))
+                self.log_print(f"处理 {task.video_path} 时出错: {str(failure)}")
+                progress.advance(task.video_path)
+        finally:
+            # 编码线程仍在读取帧槽，须先于共享内存释放前结束
+            encoder.shutdown(wait=True)
+            pool.close()
+
+        self._finish_run(total_count, failed_videos, timed_out_videos, total_frames)
+
+    def _capture_in_process(self, video_path, reason):
+        """多进程解码无法处理的视频改在本进程中抽帧
+
+        Returns:
+            int: 提取的帧数
+        """
+        self.metrics.inc('process_decode_fallbacks_total')
+        self.log_print(f"{video_path}: {reason}，改为在本进程中解码")
+        return self.run_watched(video_path, self.capture_frames, video_path, self.output_dir)
 
-    def list_video_files(self, camera=None, date=None):
+    def _encode_slot(self, pool, slot, frame, frame_file):
+        """把帧槽中的帧写成JPEG，完成后归还帧槽"""
+        try:
+            with self.metrics.timer('encode_seconds'):
+                if not cv2.imwrite(frame_file, frame):
+                    raise OSError(f"写入帧失败: {frame_file}")
+            self.metrics.inc('frames_saved_total')
+        finally:
+            pool.release(slot)
+
+    def resolve_video_files(self, camera=None, date=None, video_list_path=None, video_filter=None):
+        """确定要处理的视频列表：优先使用列表文件，否则列目录，再按分片筛选并安排处理顺序"""
+        if video_list_path:
+            remote_file_paths = self.list_video_files_from_file(video_list_path)
+            if not remote_file_paths:
+                raise FileNotFoundError(f'视频列表文件 {video_list_path} 中未找到有效的视频文件路径')
+        else:
+            remote_file_paths = self.list_video_files(camera, date, video_filter)
+        return self.schedule_videos(self.select_videos(remote_file_paths))
+
+    def process_work_queue(self, mode, camera=None, date=None, video_list_path=None, video_filter=None):
+        """从共享任务队列逐批领取视频并按指定模式处理，多个节点可同时运行
+
+        Args:
+            mode: normal / concurrent / async / process
+            其余参数同 download_video_frames
+        """
+        remote_file_paths = self.resolve_video_files(camera, date, video_list_path, video_filter)
+        self.profiler.mark_stage('listed')
+        self.clear_frames_directory(self.output_dir)
+        self._queue_totals = [0, 0]
+        try:
+            # 出错退出时立即关闭生成器，停止续约并归还未完成的任务
+            with closing(self.iter_work_batches(remote_file_paths)) as batches:
+                if mode == 'async':
+                    async def run_batches():
+                        for batch in batches:
+                            await self.async_download_video_frames(remote_file_paths=batch)
+                    asyncio.run(run_batches())
+                elif mode == 'concurrent':
+                    for batch in batches:
+                        self.concurrent_download_video_frames(remote_file_paths=batch)
+                elif mode == 'process':
+                    for batch in batches:
+                        self.process_download_video_frames(remote_file_paths=batch)
+                else:
+                    for batch in batches:
+                        self.download_video_frames(remote_file_paths=batch)
+            total_count, failed_count = self._queue_totals
+        finally:
+            self._queue_totals = None
+        self.log_print(f"本节点各批次共处理 {total_count} 个视频（含重试），失败 {failed_count} 个")
+        self._check_failure_rate(total_count, failed_count)
+
+    def list_video_files(self, camera=None, date=None, video_filter=None):
         """列出符合条件的视频文件
         
         Args:
             camera: 摄像头配置key，如 'bedroom', 'living_room' 等
             date: 日期字符串，格式如：20240101
+            video_filter: VideoFilter，遍历时按目录和文件名中的时间剪枝
         """
         if camera and camera not in self.camera_configs:
             raise ValueError(f'{camera} is not a valid camera type in config')
@@ -310,9 +569,10 @@ class ExtractVideoFrames(BaseHandler):
                 
             subfiles = self.file_handler.list_files(path=folder, excludes=['.DS_Store'])
             if date:
-                paths += [f'{folder}/{subfile}' for subfile in subfiles if subfile.startswith(date)]
-            else:
-                paths += [f'{folder}/{subfile}' for subfile in subfiles]
+                subfiles = [subfile for subfile in subfiles if subfile.startswith(date)]
+            if video_filter:
+                subfiles = [subfile for subfile in subfiles if video_filter.accept_dir(subfile)]
+            paths += [f'{folder}/{subfile}' for subfile in subfiles]
         
         if not paths:
             camera_name = self.camera_configs[camera]['name'] if camera else "所有摄像头"
@@ -320,7 +580,7 @@ class ExtractVideoFrames(BaseHandler):
         
         video_files = []
         for path in paths:
-            sub_video_files = self.file_handler.list_video_files(path)
+            sub_video_files = self.file_handler.list_video_files(path, video_filter)
             video_files = list(itertools.chain(video_files, sub_video_files))
         return video_files
 
@@ -333,7 +593,7 @@ class ExtractVideoFrames(BaseHandler):
         Returns:
             int: 提取的帧数
         """
-        async with self.async_semaphore:
+        async with self._async_slot(video_path):
             camera_type = self.get_camera_type(video_path)
             sample_interval = self.camera_configs[camera_type]['sample_interval']
             
@@ -342,117 +602,114 @@ class ExtractVideoFrames(BaseHandler):
             video_frame_dir = os.path.join(output_dir, base_name)
             os.makedirs(video_frame_dir, exist_ok=True)
             
-            # 创建临时文件来存储视频数据
-            async with aiofiles.tempfile.NamedTemporaryFile(suffix='.mp4', delete=True) as temp_file:
-                # 从NAS异步读取视频数据到临时文件
-                video_data = await self.file_handler.async_read(video_path)
-                await temp_file.write(video_data)
-                await temp_file.flush()
-                
-                # 由于OpenCV不支持异步操作，使用线程池处理视频帧提取
-                loop = asyncio.get_event_loop()
-                return await loop.run_in_executor(None, self._process_video_frames,
-                                               temp_file.name, video_frame_dir, sample_interval)
+            loop = asyncio.get_running_loop()
+            
+            # 文件已在本地（如NAS挂载盘）时直接解码，无需拷贝
+            local_path = self.file_handler.get_local_path(video_path)
+            if local_path:
+                frames_count = await loop.run_in_executor(
+                    self.decode_executor, self.run_watched, video_path, self._process_video_frames,
+                    local_path, video_frame_dir, sample_interval, self.get_decode_options(camera_type))
+            else:
+                # aiofiles只有异步模式使用，按需导入
+                import aiofiles
+
+                # 创建临时文件来存储视频数据
+                async with aiofiles.tempfile.NamedTemporaryFile(suffix='.mp4', delete=True) as temp_file:
+                    # 从NAS异步读取视频数据到临时文件
+                    video_data = await self.file_handler.async_read(video_path)
+                    await temp_file.write(video_data)
+                    await temp_file.flush()
+
+                    # 由于OpenCV不支持异步操作，使用线程池处理视频帧提取，解码卡住时由看门狗放弃
+                    frames_count = await loop.run_in_executor(
+                        self.decode_executor, self.run_watched, video_path, self._process_video_frames,
+                        temp_file.name, video_frame_dir, sample_interval, self.get_decode_options(camera_type))
+            write_manifest(video_frame_dir, video_path, camera_type, sample_interval, frames_count)
+            return frames_count
 
-    def _process_video_frames(self, video_path, output_dir, sample_interval):
+    def _process_video_frames(self, video_path, output_dir, sample_interval, decode_options=None):
         """在线程池中处理视频帧提取
         
         Args:
             video_path: 视频文件路径
             output_dir: 输出目录
             sample_interval: 采样间隔
+            decode_options: 解码配置，见 get_decode_options
         Returns:
             int: 提取的帧数
         """
-        cap = cv2.VideoCapture(video_path)
-        frame_count = 0
+        metrics = self.metrics
         saved_count = 0
         
-        try:
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                if frame_count % sample_interval == 0:
-                    frame_file = f"{output_dir}/frame_{frame_count}.jpg"
+        # 只有需要保存的帧才转换为图像，且写入从缓冲池获取的复用缓冲区
+        with create_decoder(video_path, IntervalSampler(sample_interval), decode_options,
+                            self.frame_pool) as decoder:
+            for frame_index, frame in decoder:
+                frame_file = f"{output_dir}/frame_{frame_index}.jpg"
+                with metrics.timer('encode_seconds'):
                     cv2.imwrite(frame_file, frame)
-                    saved_count += 1
-                
-                frame_count += 1
-        finally:
-            cap.release()
-            
+                saved_count += 1
+        
+        metrics.inc('videos_processed_total')
+        metrics.inc('frames_saved_total', saved_count)
         return saved_count
 
-    async def async_download_video_frames(self, camera=None, date=None, video_list_path=None):
+    async def async_download_video_frames(self, camera=None, date=None, video_list_path=None,
+                                          video_filter=None, remote_file_paths=None):
         """异步方式下载视频帧
         
         Args:
             camera: 摄像头配置key
             date: 日期字符串
             video_list_path: 视频列表文件路径
+            video_filter: VideoFilter，按日期范围、AM/PM和小时窗口过滤视频
+            remote_file_paths: 已确定的视频列表，提供时不再列目录也不清空输出目录
         """
-        if video_list_path:
-            remote_file_paths = self.list_video_files_from_file(video_list_path)
-            if not remote_file_paths:
-                raise FileNotFoundError(f'视频列表文件 {video_list_path} 中未找到有效的视频文件路径')
-        else:
-            remote_file_paths = self.list_video_files(camera, date)
-            
-        # 清空输出目录
-        self.clear_frames_directory(self.output_dir)
+        if remote_file_paths is None:
+            remote_file_paths = self.resolve_video_files(camera, date, video_list_path, video_filter)
+            self.profiler.mark_stage('listed')
+            # 清空输出目录
+            self.clear_frames_directory(self.output_dir)
         
         # 初始化计数器
         total_count = len(remote_file_paths)
-        processed_count = 0
+        progress = self.create_progress(remote_file_paths)
         failed_videos = []
+        timed_out_videos = []
         total_frames = 0
         
-        # 使用异步模式的批处理大小
+        # 每完成 batch_size 个视频输出一次进度
         batch_size = self.async_config.get('batch_size', 10)
-        
-        # 处理所有视频文件
-        for i in range(0, len(remote_file_paths), batch_size):
-            batch = remote_file_paths[i:i + batch_size]
-            tasks = []
-            
-            for video_path in batch:
-                task = asyncio.create_task(self._process_single_video(
-                    video_path, self.output_dir, processed_count, total_count))
-                tasks.append(task)
-            
-            # 等待当前批次完成
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 处理结果
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    failed_videos.append((batch[len(failed_videos)], str(result)))
-                    self.log_print(f"处理视频失败: {str(result)}")
-                else:
-                    total_frames += result
-                processed_count += 1
-                
-            # 输出进度
-            progress = (processed_count / total_count) * 100
-            self.log_print(f"总体进度: {progress:.1f}% ({processed_count}/{total_count})")
-        
-        # 输出最终统计信息
-        self.log_print("\n=== 处理完成 ===")
-        self.log_print(f"总视频数: {total_count}")
-        self.log_print(f"成功处理: {total_count - len(failed_videos)}")
-        self.log_print(f"失败数量: {len(failed_videos)}")
-        self.log_print(f"总提取帧数: {total_frames}")
-        
-        if failed_videos:
-            self.log_print("\n失败的视频:")
-            for video_path, error in failed_videos:
-                self.log_print(f"{video_path}: {error}")
+        # 视频从队列中连续领取，不按批等待：实际同时处理的视频数由信号量或限流器控制，
+        # 协程数按并发数上限创建，自动调整调高并发时有足够的协程可用
+        max_workers = self.tuner.maximum if self.autotune else self._get_async_max_workers()
+        task_queue = asyncio.Queue()
+        for video_path in remote_file_paths:
+            task_queue.put_nowait(video_path)
+
+        async def process_queue():
+            nonlocal total_frames
+            while not task_queue.empty():
+                video_path = task_queue.get_nowait()
+                try:
+                    total_frames += await self._process_single_video(
+                        video_path, self.output_dir, progress.done_count, total_count)
+                    self.report_video(video_path)
+                except Exception as e:
+                    if isinstance(e, DeadlineExceeded):
+                        timed_out_videos.append(video_path)
+                    failed_videos.append((video_path, str(e)))
+                    self.report_video(video_path, str(e))
+                    self.log_print(f"处理视频失败: {str(e)}")
+                progress.advance(video_path)
+                if progress.done_count % batch_size == 0:
+                    self.log_print(progress.format())
+
+        await asyncio.gather(*(process_queue() for _ in range(min(max_workers, total_count))))
+        self.log_print(progress.format())
 
-        # 如果失败太多，抛出异常
-        if len(failed_videos) > total_count * 0.3:  # 失败率超过30%
-            raise RuntimeError(f"处理失败率过高: {len(failed_videos)}/{total_count}")
+        self._finish_run(total_count, failed_videos, timed_out_videos, total_frames)
 
     async def _process_single_video(self, video_path, output_dir, processed_count, total_count):
         """处理单个视频文件
@@ -468,12 +725,14 @@ class ExtractVideoFrames(BaseHandler):
         try:
             frames_count = await self.async_capture_frames(video_path, output_dir)
             return frames_count
+        except DeadlineExceeded as e:
+            # 保留超时类型，汇总时单独统计
+            raise DeadlineExceeded(f"处理视频 {video_path} 失败: {str(e)}") from e
         except Exception as e:
             raise Exception(f"处理视频 {video_path} 失败: {str(e)}")
 
 
 if __name__ == "__main__":
-    download_video_file = ExtractVideoFrames()
     parser = argparse.ArgumentParser(description='根据输入参数从视频中提取帧')
     
     parser.add_argument('-camera', '--camera', type=str, default=None,
@@ -482,16 +741,38 @@ if __name__ == "__main__":
                       help="日期，格式如：20240101，处理指定日期的视频文件，若不设置则不限日期")
     parser.add_argument('-c', '--concurrent', action='store_true',
                       help="是否使用并发处理")
-    parser.add_argument('-m', '--mode', type=str, choices=['normal', 'concurrent', 'async'], default='normal',
-                      help="处理模式：normal(普通模式)、concurrent(并发模式)、async(异步模式)，默认normal")
+    parser.add_argument('-m', '--mode', type=str, choices=['normal', 'concurrent', 'async', 'process'],
+                      default='normal',
+                      help="处理模式：normal(普通模式)、concurrent(并发模式)、async(异步模式)、"
+                           "process(多进程解码，帧经共享内存交给编码线程)，默认normal")
     parser.add_argument('-l', '--list', type=str, default=None,
                       help="视频列表文件路径（CSV格式，需包含video_path列），如果提供则优先使用列表文件中的视频")
+    add_filter_arguments(parser)
+    add_profile_arguments(parser)
+    add_work_arguments(parser)
+    add_schedule_arguments(parser)
+    add_autotune_arguments(parser)
     
     args = parser.parse_args()
+    video_filter = VideoFilter.from_args(args)
+    download_video_file = ExtractVideoFrames()
+    download_video_file.configure_work(args, 'extract')
+    download_video_file.configure_schedule(args)
+    download_video_file.autotune = args.autotune
+    download_video_file.start_profiler(Profiler.from_args(args))
     
-    if args.mode == 'concurrent':
-        download_video_file.concurrent_download_video_frames(args.camera, args.date, args.list)
-    elif args.mode == 'async':
-        asyncio.run(download_video_file.async_download_video_frames(args.camera, args.date, args.list))
-    else:
-        download_video_file.download_video_frames(args.camera, args.date, args.list)
\ No newline at end of file
+    try:
+        if download_video_file.work_queue is not None:
+            download_video_file.process_work_queue(args.mode, args.camera, args.date, args.list, video_filter)
+        elif args.mode == 'concurrent':
+            download_video_file.concurrent_download_video_frames(args.camera, args.date, args.list, video_filter)
+        elif args.mode == 'async':
+            asyncio.run(download_video_file.async_download_video_frames(args.camera, args.date, args.list,
+                                                                        video_filter))
+        elif args.mode == 'process':
+            download_video_file.process_download_video_frames(args.camera, args.date, args.list, video_filter)
+        else:
+            download_video_file.download_video_frames(args.camera, args.date, args.list, video_filter)
+    finally:
+        download_video_file.stop_profiler()
+        download_video_file.export_metrics('extract_video_frames')
\ No newline at end of file
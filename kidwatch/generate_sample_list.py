@@ -1,60 +1,92 @@
 import argparse
 import csv
 import random
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from .utils.base_handler import BaseHandler
+from .utils.reservoir_sampler import StratifiedReservoirSampler
+from .utils.video_filter import VideoFilter, add_filter_arguments
+
+# 固定随机种子以确保可重复性
+SAMPLE_SEED = 20240819
+
 
 class GenerateSampleList(BaseHandler):
     def __init__(self):
         super().__init__()
         self.camera_configs = self.config_reader.get_config('cameras')
 
+    def sample_camera(self, camera_type, config, stratify=False, video_filter=None):
+        """对单个摄像头的视频做单遍蓄水池采样
+
+        Args:
+            camera_type: 摄像头配置key
+            config: 摄像头配置
+            stratify: 是否按日期AM/PM目录分层采样
+            video_filter: VideoFilter，只在满足时间条件的目录和文件中采样
+        Returns:
+            tuple: (采样结果列表, 视频总数)
+        """
+        sample_size = config.get('sample_size', 0)
+        folder = config.get('folder', '')
+        # 每个摄像头使用独立的随机数生成器，并发采样时结果仍可复现
+        rng = random.Random(f"{SAMPLE_SEED}:{camera_type}")
+        key_func = (lambda path: path[len(folder) + 1:].split('/', 1)[0]) if stratify else None
+        sampler = StratifiedReservoirSampler(sample_size, rng, key_func)
+        sampler.extend(self.file_handler.iter_video_files(folder, video_filter))
+        return sampler.result(), sampler.total
+
     # 采样
-    def generate_sample_list(self, outfile):
+    def generate_sample_list(self, outfile, stratify=False, video_filter=None):
         """
         按摄像头分别采样视频文件，采样数量从配置文件读取
+
+        Args:
+            outfile: 输出文件相对路径
+            stratify: 是否按日期AM/PM目录分层采样，使样本覆盖整个时间段
+            video_filter: VideoFilter，按日期范围、AM/PM和小时窗口限制采样范围
         """
-        
+        cameras = [(camera_type, config) for camera_type, config in self.camera_configs.items()
+                   if config.get('sample_size', 0) > 0 and config.get('folder')]
+
         # 采样并记录结果
         sampled_files = []
-        random.seed(20240819)  # 固定随机种子以确保可重复性
-        
-        for config in self.camera_configs.values():
-            sample_size = config.get('sample_size', 0)
-            folder = config.get('folder', '')
-            camera_name = config.get('name', '')
-            
-            if sample_size > 0:
-                files = self.file_handler.list_video_files(folder)
-                # 确保采样数量不超过实际文件数量
-                actual_sample_size = min(sample_size, len(files))
-                camera_samples = random.sample(files, actual_sample_size)
-                sampled_files.extend(camera_samples)
-                
-                self.log_print(f"{camera_name}摄像头: 总计 {len(files)} 个视频，"
-                             f"计划采样 {sample_size} 个，实际采样 {actual_sample_size} 个")
-        
+        if cameras:
+            max_workers = max(1, min(len(cameras), self.file_handler.get_safe_connections_limit()))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    lambda item: self.sample_camera(item[0], item[1], stratify, video_filter), cameras)
+                for (camera_type, config), (camera_samples, total) in zip(cameras, results):
+                    sampled_files.extend(camera_samples)
+                    self.log_print(f"{config.get('name', '')}摄像头: 总计 {total} 个视频，"
+                                   f"计划采样 {config['sample_size']} 个，实际采样 {len(camera_samples)} 个")
+
         # 将采样结果写入CSV文件
         project_path = self.config_reader.get_root_path()
         filename = f'{project_path}/data/intermediate/{outfile}'
-        
+
         with open(filename, mode='w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             # 添加header
             writer.writerow(['video_path'])
             for file_path in sampled_files:
                 writer.writerow([file_path])
-        
+
         self.log_print(f"\n总计采样 {len(sampled_files)} 个视频，结果保存至 {filename}")
 
 
 if __name__ == "__main__":
-    file_op = GenerateSampleList()
     parser = argparse.ArgumentParser(description='采样视频文件用于训练和评估')
 
     parser.add_argument('-o', '--outfile', type=str,
                         default='sample_video_list.csv',
                         help="输出文件相对路径，文件保存在data/intermediate目录下")
+    parser.add_argument('-s', '--stratify', action='store_true',
+                        help="按日期AM/PM目录分层采样，使样本均匀覆盖整个时间段")
+    add_filter_arguments(parser)
 
     args = parser.parse_args()
-    file_op.generate_sample_list(args.outfile)
+    file_op = GenerateSampleList()
+    try:
+        file_op.generate_sample_list(args.outfile, args.stratify, VideoFilter.from_args(args))
+    finally:
+        file_op.export_metrics('generate_sample_list')
@@ -0,0 +1,140 @@
+import argparse
+import http.client
+import json
+import socket
+import time
+
+from .utils.base_handler import BaseHandler
+from .utils.classification_results import format_camera_stats, write_results
+
+
+class ServiceUnavailable(RuntimeError):
+    """推理服务队列已满（503），稍后重试可能成功"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """通过Unix socket发送HTTP请求"""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class InferenceClient(BaseHandler):
+    """推理服务的客户端
+
+    把视频列表分批发送给常驻的 inference_server，不导入任何推理依赖，
+    输出与 video_classifier 的 batch_process_videos 相同的CSV和统计信息。
+    """
+
+    def __init__(self, host=None, port=None, socket_path=None, timeout=None):
+        """
+        Args:
+            host, port: 服务地址，默认使用配置文件inference_server段
+            socket_path: Unix socket路径，指定时优先使用
+            timeout: 单个请求的超时（秒）
+        """
+        super().__init__()
+        config = self.config_reader.get_config().get('inference_server') or {}
+        self.host = host or config.get('host', '127.0.0.1')
+        self.port = port or config.get('port', 8765)
+        self.socket_path = socket_path or config.get('socket')
+        # 请求在服务端最多等待request_timeout，客户端多留一些余量
+        self.timeout = timeout or config.get('request_timeout', 600) + 30
+        self.chunk_size = config.get('client_chunk_size', 32)
+        # 服务繁忙（503）时的重试次数和退避系数，第n次重试前等待 backoff * 2^(n-1) 秒
+        self.retries = config.get('client_retries', 3)
+        self.backoff = config.get('client_backoff', 1)
+
+    def _connection(self):
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        connection = self._connection()
+        try:
+            body = json.dumps(payload).encode('utf-8') if payload is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b'{}')
+        finally:
+            connection.close()
+        if response.status == 503:
+            raise ServiceUnavailable(f"推理服务繁忙: {data.get('error')}")
+        if response.status != 200:
+            raise RuntimeError(f"推理服务返回 {response.status}: {data.get('error')}")
+        return data
+
+    def health(self):
+        """查询服务状态"""
+        return self._request('GET', '/health')
+
+    def classify(self, video_paths):
+        """发送一批视频，返回 {'results': [...], 'failed': [[视频路径, 错误], ...]}
+
+        服务繁忙（503）时按指数退避重试，最多重试 retries 次。
+
+        Raises:
+            ServiceUnavailable: 重试后服务仍然繁忙
+        """
+        payload = {'video_paths': list(video_paths)}
+        for attempt in range(self.retries + 1):
+            try:
+                return self._request('POST', '/classify', payload)
+            except ServiceUnavailable as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                self.log_print(f"{str(e)}，{delay}s 后重试（{attempt + 1}/{self.retries}）")
+                time.sleep(delay)
+
+    def batch_process_videos(self, video_list_file, output_file):
+        """
+        批量处理视频文件并输出结果，输出与 VideoClassifier.batch_process_videos 一致；
+        请求失败中止时，已得到的结果仍写入输出文件
+        """
+        with open(video_list_file, 'r') as f:
+            video_paths = [line.strip() for line in f.readlines() if line.strip()]
+        results = []
+        try:
+            for start in range(0, len(video_paths), self.chunk_size):
+                try:
+                    response = self.classify(video_paths[start:start + self.chunk_size])
+                except Exception as e:
+                    self.log_print(f"请求推理服务失败，剩余 {len(video_paths) - start} 个视频未处理: {str(e)}")
+                    raise
+                for result in response['results']:
+                    results.append(result)
+                    self.log_print(f"处理视频 {result['video_path']} ({result['camera_name']}): "
+                                   f"{'有' if result['has_child'] else '无'}小孩")
+                for video_path, error in response['failed']:
+                    self.log_print(f"处理视频 {video_path} 时出错: {error}")
+                self.log_print(f"总体进度: {min(start + self.chunk_size, len(video_paths))}/{len(video_paths)}")
+        finally:
+            self.log_print("\n=== 处理统计 ===")
+            for line in format_camera_stats(results, self.camera_configs):
+                self.log_print(line)
+            write_results(output_file, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='通过常驻推理服务检测视频中是否包含小孩')
+    parser.add_argument('-i', '--input', required=True,
+                        help='包含视频文件路径的列表文件')
+    parser.add_argument('-o', '--output', required=True,
+                        help='结果输出文件路径')
+    parser.add_argument('--host', type=str, default=None, help="服务地址，默认使用配置文件inference_server.host")
+    parser.add_argument('--port', type=int, default=None, help="服务端口，默认使用配置文件inference_server.port")
+    parser.add_argument('--socket', type=str, default=None, help="服务的Unix socket路径")
+
+    args = parser.parse_args()
+    client = InferenceClient(args.host, args.port, args.socket)
+    client.batch_process_videos(args.input, args.output)
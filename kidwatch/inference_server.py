@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue, Empty, Full
+
+from .utils.base_handler import BaseHandler
+from .utils.classification_results import make_result
+from .utils.decode import IntervalSampler, create_decoder
+from .utils.profiler import Profiler, add_profile_arguments
+
+# 帧队列中的消息类型
+FRAME, VIDEO_END = 'frame', 'video_end'
+
+
+class VideoJob:
+    """推理服务中的单个视频任务"""
+
+    def __init__(self, video_path, camera_type):
+        self.video_path = video_path
+        self.camera_type = camera_type
+        self.has_child = False
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class ServiceBusy(Exception):
+    """任务队列已满"""
+
+
+class InferenceServer(BaseHandler):
+    """常驻的推理服务
+
+    启动时加载一次模型并预热，之后通过本地HTTP端口或Unix socket接收分类请求，
+    省去每次运行 video_classifier 时导入torch/ultralytics和加载模型的开销。
+    请求中的视频进入有界队列，多个解码线程并发解码，
+    推理线程把来自不同请求的帧凑成一批做一次推理。
+    """
+
+    def __init__(self, detector=None):
+        """
+        Args:
+            detector: 提供 detect_batch(frames, configs) 的检测器，默认使用 VideoClassifier
+        """
+        super().__init__()
+        self.server_config = self.config_reader.get_config().get('inference_server') or {}
+        self._detector = detector
+        self._stop = threading.Event()
+        self._video_queue = Queue(maxsize=self.server_config.get('queue_size', 64))
+        self._frame_queue = Queue(maxsize=self.server_config.get('frame_queue_size', 64))
+        self._threads = []
+        self._httpd = None
+
+    @property
+    def detector(self):
+        """懒加载检测器，避免--help或参数错误时导入推理依赖"""
+        if self._detector is None:
+            from .video_classifier import VideoClassifier
+            self._detector = VideoClassifier()
+        return self._detector
+
+    def warm_up(self):
+        """加载模型并做一次推理，使第一个请求不必等待模型初始化"""
+        import numpy as np
+        started = time.perf_counter()
+        config = self.camera_configs.get('default') or next(iter(self.camera_configs.values()))
+        self.detector.detect_batch([np.zeros((64, 64, 3), dtype=np.uint8)], [config])
+        # 级联检测的复核模型只在出现候选帧时才会用到，也预先加载
+        load_cascade_models = getattr(self.detector, 'load_cascade_models', None)
+        if load_cascade_models is not None:
+            for camera_config in self.camera_configs.values():
+                load_cascade_models(camera_config)
+        self.log_print(f"模型已加载，耗时 {time.perf_counter() - started:.1f}s")
+
+    def submit(self, video_paths):
+        """把一个请求的视频加入任务队列
+
+        Args:
+            video_paths: 视频路径列表
+        Returns:
+            list: VideoJob列表
+        Raises:
+            ServiceBusy: 队列在 queue_timeout 内一直是满的
+        """
+        timeout = self.server_config.get('queue_timeout', 5)
+        jobs = []
+        for video_path in video_paths:
+            job = VideoJob(video_path, self.get_camera_type(video_path))
+            try:
+                self._video_queue.put(job, timeout=timeout)
+            except Full:
+                for submitted in jobs:
+                    submitted.cancelled = True
+                self.metrics.inc('inference_server_rejected_total')
+                raise ServiceBusy(f"任务队列已满（{self._video_queue.maxsize}）")
+            jobs.append(job)
+        return jobs
+
+    def classify(self, video_paths):
+        """处理一个分类请求并等待结果
+
+        Returns:
+            dict: {'results': [与 batch_process_videos 输出相同字段的结果], 'failed': [[视频路径, 错误], ...]}
+        """
+        started = time.perf_counter()
+        jobs = self.submit(video_paths)
+        deadline = time.monotonic() + self.server_config.get('request_timeout', 600)
+        results, failed = [], []
+        for job in jobs:
+            if not job.done.wait(max(0, deadline - time.monotonic())):
+                job.cancelled = True
+                failed.append([job.video_path, '处理超时'])
+            elif job.error:
+                failed.append([job.video_path, job.error])
+            else:
+                camera_name = self.camera_configs[job.camera_type].get('name', job.camera_type)
+                results.append(make_result(job.video_path, job.camera_type, camera_name, job.has_child))
+        self.metrics.observe('inference_server_request_seconds', time.perf_counter() - started)
+        self.log_print(f"请求完成: {len(results)} 个成功, {len(failed)} 个失败, "
+                       f"耗时 {time.perf_counter() - started:.1f}s")
+        return {'results': results, 'failed': failed}
+
+    def _put_frame(self, item):
+        while not self._stop.is_set():
+            try:
+                self._frame_queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _motion_gate(self, config):
+        """为单个视频创建检测器的运动过滤器，检测器不支持或未启用时返回None"""
+        motion_gate = getattr(self.detector, 'motion_gate', None)
+        return motion_gate(config) if motion_gate is not None else None
+
+    def _decode_videos(self):
+        """解码线程：逐个解码视频，按采样间隔把帧放入帧队列，已判定或已取消的视频提前停止"""
+        while not self._stop.is_set():
+            try:
+                job = self._video_queue.get(timeout=0.5)
+            except Empty:
+                continue
+            if job.cancelled:
+                job.done.set()
+                continue
+            try:
+                config = self.camera_configs[job.camera_type]
+                gate = self._motion_gate(config)
+                # 帧在队列中等待推理，不能复用缓冲区
+                with create_decoder(job.video_path, IntervalSampler.from_config(config),
+                                    self.get_decode_options(job.camera_type), reuse_buffer=False) as decoder:
+                    for _, frame in decoder:
+                        if job.has_child or job.cancelled:
+                            break
+                        # 没有变化的帧不进入帧队列，也不占用批次
+                        if gate is not None and self.detector.motion_skipped(gate, frame):
+                            continue
+                        if not self._put_frame((FRAME, job, frame)):
+                            break
+            except Exception as e:
+                job.error = str(e)
+            self._put_frame((VIDEO_END, job, None))
+
+    def _next_batch(self, batch_size, batch_timeout):
+        """凑一批消息：阻塞等待第一项，之后在超时内尽量凑满batch_size帧"""
+        while not self._stop.is_set():
+            try:
+                first = self._frame_queue.get(timeout=0.5)
+                break
+            except Empty:
+                continue
+        else:
+            return []
+        items = [first]
+        frames = 1 if first[0] == FRAME else 0
+        deadline = time.monotonic() + batch_timeout
+        while frames < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._frame_queue.get(timeout=remaining) if remaining > 0 else self._frame_queue.get_nowait()
+            except Empty:
+                break
+            items.append(item)
+            if item[0] == FRAME:
+                frames += 1
+        return items
+
+    def _run_inference(self):
+        """推理线程：跨请求凑批推理，视频结束时通知等待的请求"""
+        batch_size = self.server_config.get('batch_size', 16)
+        batch_timeout = self.server_config.get('batch_timeout', 0.05)
+        while not self._stop.is_set():
+            items = self._next_batch(batch_size, batch_timeout)
+            # 已判定的视频不再推理剩余的帧
+            frame_items = [item for item in items if item[0] == FRAME and not item[1].has_child]
+            if frame_items:
+                try:
+                    detections = self.detector.detect_batch(
+                        [frame for _, _, frame in frame_items],
+                        [self.camera_configs[job.camera_type] for _, job, _ in frame_items])
+                except Exception as e:
+                    for _, job, _ in frame_items:
+                        job.error = job.error or f"推理失败: {str(e)}"
+                    detections = [False] * len(frame_items)
+                self.metrics.observe('inference_server_batch_frames', len(frame_items))
+                for (_, job, _), has_child in zip(frame_items, detections):
+                    if has_child:
+                        job.has_child = True
+            for kind, job, _ in items:
+                if kind == VIDEO_END:
+                    self.metrics.inc('videos_processed_total')
+                    job.done.set()
+
+    def start_workers(self):
+        """启动解码线程和推理线程"""
+        decode_workers = self.server_config.get('decode_workers', 2)
+        # 解码线程会用到检测器的运动过滤，先在当前线程中创建检测器
+        self.detector
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._decode_videos, name=f'inference-decode-{index}',
+                                          daemon=True) for index in range(decode_workers)]
+        self._threads.append(threading.Thread(target=self._run_inference, name='inference-batch', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop_workers(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def make_http_server(self, host=None, port=None, socket_path=None):
+        """创建HTTP服务，指定socket_path时监听Unix socket，否则监听host:port"""
+        handler_class = _make_request_handler(self)
+        if socket_path:
+            if os.path.exists(socket_path):
+                _remove_stale_socket(socket_path)
+            return _UnixHTTPServer(socket_path, handler_class)
+        return ThreadingHTTPServer((host or self.server_config.get('host', '127.0.0.1'),
+                                    port or self.server_config.get('port', 8765)), handler_class)
+
+    def serve(self, host=None, port=None, socket_path=None):
+        """加载模型并启动服务，直到收到SIGINT/SIGTERM"""
+        socket_path = socket_path or self.server_config.get('socket')
+        self.warm_up()
+        self.start_workers()
+        self._httpd = self.make_http_server(host, port, socket_path)
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self._httpd.shutdown).start())
+        address = socket_path or '%s:%s' % self._httpd.server_address[:2]
+        self.log_print(f"推理服务已启动: {address}")
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.stop_workers()
+            self.log_print("推理服务已停止")
+
+
+def _remove_stale_socket(socket_path):
+    """删除上次未正常退出时残留的socket文件；仍有服务在监听时不删除
+
+    Raises:
+        RuntimeError: 已有服务在该socket上监听
+    """
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # 没有进程在监听，是残留的socket文件
+        pass
+    else:
+        raise RuntimeError(f"已有推理服务在监听 {socket_path}")
+    finally:
+        probe.close()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """监听Unix socket的多线程HTTP服务"""
+    daemon_threads = True
+
+
+def _make_request_handler(server):
+    """创建绑定到推理服务的请求处理类"""
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                payload = {'status': 'ok', 'queued': server._video_queue.qsize()}
+                cascade_stats = getattr(server._detector, 'cascade_stats', None)
+                if cascade_stats is not None:
+                    payload['cascade'] = cascade_stats.counts()
+                self._send_json(200, payload)
+            else:
+                self._send_json(404, {'error': f'未知路径: {self.path}'})
+
+        def do_POST(self):
+            if self.path != '/classify':
+                self._send_json(404, {'error': f'未知路径: {self.path}'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                video_paths = json.loads(self.rfile.read(length) or b'{}').get('video_paths') or []
+            except (ValueError, AttributeError) as e:
+                self._send_json(400, {'error': f'无效的请求: {str(e)}'})
+                return
+            if not isinstance(video_paths, list) or not all(isinstance(path, str) for path in video_paths):
+                self._send_json(400, {'error': 'video_paths 须为视频路径字符串的列表'})
+                return
+            try:
+                self._send_json(200, server.classify(video_paths))
+            except ServiceBusy as e:
+                self._send_json(503, {'error': str(e)})
+
+        def address_string(self):
+            # Unix socket 的客户端地址为空字符串
+            return self.client_address[0] if self.client_address else 'unix'
+
+        def log_message(self, format, *args):
+            pass
+
+    return RequestHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='常驻推理服务：保持模型加载，通过本地HTTP或Unix socket接收分类请求')
+    parser.add_argument('--host', type=str, default=None, help="监听地址，默认使用配置文件inference_server.host")
+    parser.add_argument('--port', type=int, default=None, help="监听端口，默认使用配置文件inference_server.port")
+    parser.add_argument('--socket', type=str, default=None, help="Unix socket路径，指定时不监听TCP端口")
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    inference_server = InferenceServer()
+    inference_server.start_profiler(Profiler.from_args(args))
+    try:
+        inference_server.serve(args.host, args.port, args.socket)
+    finally:
+        inference_server.stop_profiler()
+        inference_server.export_metrics('inference_server')
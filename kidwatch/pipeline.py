@@ -0,0 +1,300 @@
+import argparse
+import csv
+import os
+import threading
+import time
+from queue import Queue, Empty, Full
+
+from .utils.base_handler import BaseHandler
+from .utils.classification_results import RESULT_FIELDS, make_result
+from .utils.deadline import heartbeat
+from .utils.decode import IntervalSampler, create_decoder
+from .utils.profiler import Profiler, add_profile_arguments
+from .utils.video_filter import VideoFilter, add_filter_arguments
+
+# 队列中的消息类型
+FRAME, VIDEO_END, WORKER_DONE = 'frame', 'video_end', 'worker_done'
+
+
+class StreamingPipeline(BaseHandler):
+    """列目录 → 读取解码 → 批量推理 的流式处理管道
+
+    列目录线程边遍历边把视频路径放入有界队列，多个读取线程并发读取和解码视频，
+    按摄像头的采样间隔把帧放入有界帧队列，推理线程凑批后做一次推理，
+    每个视频处理完立即追加写入结果CSV。各阶段同时运行，不落地中间文件，
+    第一个视频处理完即可得到结果，内存占用由队列长度限定。
+    """
+
+    def __init__(self, detector=None):
+        """
+        Args:
+            detector: 提供 detect_batch(frames, configs) 的检测器，默认使用 VideoClassifier
+        """
+        super().__init__()
+        self.pipeline_config = self.config_reader.get_config().get('pipeline', {})
+        self._detector = detector
+        self._stop = threading.Event()
+        # 已判定包含小孩的视频，读取线程据此提前停止解码
+        self._decided = set()
+        self._decided_lock = threading.Lock()
+
+    @property
+    def detector(self):
+        """懒加载检测器，避免--help或参数错误时导入推理依赖"""
+        if self._detector is None:
+            from .video_classifier import VideoClassifier
+            self._detector = VideoClassifier()
+        return self._detector
+
+    def _get_fetch_workers(self):
+        """读取线程数：配置值与SMB连接池安全限制取较小值"""
+        return max(1, min(self.pipeline_config.get('fetch_workers', 4),
+                          self.file_handler.get_safe_connections_limit()))
+
+    def _spool_dir(self):
+        """远程视频解码前暂存的目录，默认使用内存文件系统"""
+        spool_dir = self.pipeline_config.get('spool_dir')
+        if spool_dir:
+            return spool_dir
+        return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+    def _put(self, queue, item):
+        """放入有界队列，管道停止时放弃"""
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                # 等待推理消费属于正常的背压，不应被看门狗视为卡住
+                heartbeat()
+                continue
+        return False
+
+    def _get(self, queue):
+        """从队列取出一项，管道停止时返回None"""
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout=0.5)
+            except Empty:
+                continue
+        return None
+
+    def iter_sources(self, camera=None, video_list_path=None, video_filter=None):
+        """流式产生待处理的视频路径
+
+        Args:
+            camera: 摄像头配置key，不指定则处理所有摄像头
+            video_list_path: 视频列表CSV文件（包含video_path列），提供时优先使用
+            video_filter: VideoFilter，遍历时按时间剪枝
+        """
+        if video_list_path:
+            with open(video_list_path, newline='', encoding='utf-8') as file:
+                for row in csv.DictReader(file):
+                    if row.get('video_path'):
+                        yield row['video_path']
+            return
+        if camera and camera not in self.camera_configs:
+            raise ValueError(f'{camera} is not a valid camera type in config')
+        cameras = [camera] if camera else [key for key in self.camera_configs if key != 'default']
+        for key in cameras:
+            folder = self.camera_configs[key].get('folder')
+            if folder:
+                yield from self.file_handler.iter_video_files(folder, video_filter)
+
+    def _list_videos(self, sources, path_queue, fetch_workers):
+        """列目录线程：把视频路径放入队列，结束后为每个读取线程放入一个结束标记"""
+        try:
+            for video_path in sources:
+                if not self._put(path_queue, video_path):
+                    return
+        except Exception as e:
+            self.log_print(f"列出视频文件失败: {str(e)}")
+        finally:
+            for _ in range(fetch_workers):
+                self._put(path_queue, None)
+
+    def _is_decided(self, video_path):
+        with self._decided_lock:
+            return video_path in self._decided
+
+    def _motion_gate(self, config):
+        """为单个视频创建检测器的运动过滤器，检测器不支持或未启用时返回None"""
+        motion_gate = getattr(self.detector, 'motion_gate', None)
+        return motion_gate(config) if motion_gate is not None else None
+
+    def _decode_video(self, video_path, camera_type, frame_queue):
+        """读取并解码单个视频，按采样间隔把帧放入帧队列"""
+        config = self.camera_configs[camera_type]
+        gate = self._motion_gate(config)
+        with self.open_local_video(video_path, self._spool_dir()) as local_path:
+            # 帧在队列中等待推理，不能复用缓冲区
+            with create_decoder(local_path, IntervalSampler.from_config(config),
+                                self.get_decode_options(camera_type), reuse_buffer=False) as decoder:
+                for _, frame in decoder:
+                    if self._is_decided(video_path):
+                        break
+                    # 没有变化的帧不进入帧队列，也不占用批次
+                    if gate is not None and self.detector.motion_skipped(gate, frame):
+                        continue
+                    if not self._put(frame_queue, (FRAME, video_path, frame, config)):
+                        break
+
+    def _fetch_videos(self, path_queue, frame_queue):
+        """读取线程：逐个读取解码视频，每个视频结束时放入结束标记"""
+        try:
+            while True:
+                video_path = self._get(path_queue)
+                if video_path is None:
+                    return
+                camera_type = self.get_camera_type(video_path)
+                error = None
+                try:
+                    self.run_watched(video_path, self._decode_video, video_path, camera_type, frame_queue)
+                except Exception as e:
+                    error = str(e)
+                self._put(frame_queue, (VIDEO_END, video_path, camera_type, error))
+        finally:
+            self._put(frame_queue, (WORKER_DONE, None, None, None))
+
+    def _next_batch(self, frame_queue, batch_size, batch_timeout):
+        """凑一批消息：阻塞等待第一项，之后在超时内尽量凑满batch_size帧"""
+        first = self._get(frame_queue)
+        if first is None:
+            return []
+        items = [first]
+        frames = 1 if first[0] == FRAME else 0
+        deadline = time.monotonic() + batch_timeout
+        while frames < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = frame_queue.get(timeout=remaining) if remaining > 0 else frame_queue.get_nowait()
+            except Empty:
+                break
+            items.append(item)
+            if item[0] == FRAME:
+                frames += 1
+        return items
+
+    def run(self, output_file, camera=None, video_list_path=None, video_filter=None):
+        """运行管道，结果逐条追加写入CSV
+
+        Args:
+            output_file: 结果CSV路径，字段与 video_classifier 的输出一致
+            camera: 摄像头配置key
+            video_list_path: 视频列表CSV文件
+            video_filter: VideoFilter，按日期范围、AM/PM和小时窗口过滤视频
+        Returns:
+            dict: {'processed': 成功数, 'failed': [(视频路径, 错误), ...]}
+        """
+        fetch_workers = self._get_fetch_workers()
+        batch_size = self.pipeline_config.get('batch_size', 16)
+        batch_timeout = self.pipeline_config.get('batch_timeout', 0.05)
+        path_queue = Queue(maxsize=self.pipeline_config.get('path_queue_size', 32))
+        frame_queue = Queue(maxsize=self.pipeline_config.get('frame_queue_size', 64))
+        self.log_print(f"读取线程数: {fetch_workers}, 推理批大小: {batch_size}")
+
+        sources = self.iter_sources(camera, video_list_path, video_filter)
+        threads = [threading.Thread(target=self._list_videos, args=(sources, path_queue, fetch_workers),
+                                    name='pipeline-lister', daemon=True)]
+        threads += [threading.Thread(target=self._fetch_videos, args=(path_queue, frame_queue),
+                                     name=f'pipeline-fetch-{index}', daemon=True)
+                    for index in range(fetch_workers)]
+
+        camera_stats = {key: {'total': 0, 'with_child': 0}
+                        for key in self.camera_configs if key != 'default'}
+        failed = []
+        processed = 0
+        started_at = time.perf_counter()
+        done_workers = 0
+
+        # 读取线程会用到检测器的运动过滤，先在主线程中创建检测器
+        self.detector
+        self._stop.clear()
+        for thread in threads:
+            thread.start()
+        try:
+            with open(output_file, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
+                writer.writeheader()
+                while done_workers < fetch_workers:
+                    items = self._next_batch(frame_queue, batch_size, batch_timeout)
+                    if not items:
+                        break
+                    # 已判定的视频不再推理剩余的帧
+                    frame_items = [item for item in items
+                                   if item[0] == FRAME and not self._is_decided(item[1])]
+                    detections = self.detector.detect_batch([item[2] for item in frame_items],
+                                                            [item[3] for item in frame_items])
+                    for item, has_child in zip(frame_items, detections):
+                        if has_child:
+                            with self._decided_lock:
+                                self._decided.add(item[1])
+
+                    for kind, video_path, camera_type, error in items:
+                        if kind == WORKER_DONE:
+                            done_workers += 1
+                        elif kind == VIDEO_END:
+                            with self._decided_lock:
+                                has_child = video_path in self._decided
+                                self._decided.discard(video_path)
+                            if error:
+                                failed.append((video_path, error))
+                                self.log_print(f"处理视频 {video_path} 时出错: {error}")
+                                continue
+                            camera_name = self.camera_configs[camera_type]['name']
+                            writer.writerow(make_result(video_path, camera_type, camera_name, has_child))
+                            file.flush()
+                            processed += 1
+                            self.metrics.inc('videos_processed_total')
+                            if processed == 1:
+                                first_seconds = time.perf_counter() - started_at
+                                self.metrics.observe('pipeline_first_result_seconds', first_seconds)
+                                self.log_print(f"首个结果耗时 {first_seconds:.1f}s")
+                            if camera_type != 'default':
+                                camera_stats[camera_type]['total'] += 1
+                                if has_child:
+                                    camera_stats[camera_type]['with_child'] += 1
+                            self.log_print(f"处理视频 {video_path} ({camera_name}): "
+                                           f"{'有' if has_child else '无'}小孩")
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        self.profiler.mark_stage('processed')
+
+        elapsed = time.perf_counter() - started_at
+        self.log_print("\n=== 处理统计 ===")
+        for camera_type, stats in camera_stats.items():
+            if stats['total'] > 0:
+                camera_name = self.camera_configs[camera_type]['name']
+                child_ratio = (stats['with_child'] / stats['total']) * 100
+                self.log_print(f"{camera_name}摄像头: 总计 {stats['total']} 个视频, "
+                               f"包含小孩 {stats['with_child']} 个 ({child_ratio:.1f}%)")
+        self.log_print(f"成功处理: {processed}, 失败数量: {len(failed)}, 总耗时: {elapsed:.1f}s")
+        cascade_stats = getattr(self.detector, 'cascade_stats', None)
+        if cascade_stats is not None and cascade_stats.counts()['sampled']:
+            self.log_print(cascade_stats.format())
+        self.log_cache_stats()
+        return {'processed': processed, 'failed': failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='流式列出、读取视频并检测是否包含小孩，不落地中间文件')
+    parser.add_argument('-o', '--output', required=True,
+                        help='结果输出文件路径')
+    parser.add_argument('-camera', '--camera', type=str, default=None,
+                        help="摄像头配置名称(如：bedroom, living_room， dining_room)，若不设置则处理所有摄像头")
+    parser.add_argument('-l', '--list', type=str, default=None,
+                        help="视频列表文件路径（CSV格式，需包含video_path列），如generate_sample_list的输出")
+    add_filter_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    video_filter = VideoFilter.from_args(args)
+    pipeline = StreamingPipeline()
+    pipeline.start_profiler(Profiler.from_args(args))
+    try:
+        pipeline.run(args.output, args.camera, args.list, video_filter)
+    finally:
+        pipeline.stop_profiler()
+        pipeline.export_metrics('pipeline')
@@ -0,0 +1,201 @@
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from .metrics import Metrics
+
+
+class ConcurrencyTuner:
+    """根据实测吞吐、延迟和错误率在运行时调整并发数
+
+    每完成window个任务评估一次：
+    - 错误率超过阈值时按比例下调（AIMD的乘性减）；
+    - 否则做爬山：吞吐比上一窗口提升超过tolerance时沿当前方向继续调整一步，
+      下降超过tolerance时反向，持平时若延迟明显上升则下调一步（已到拐点，增加并发只会排队）。
+    并发数始终在 [minimum, maximum] 内，maximum 应不超过连接池限制。
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, window=8, tolerance=0.05,
+                 error_threshold=0.2, decrease=0.5, latency_factor=1.5, log=print):
+        """
+        Args:
+            initial: 初始并发数
+            minimum: 最小并发数
+            maximum: 最大并发数
+            window: 每完成多少个任务评估一次
+            tolerance: 吞吐变化小于该比例时视为持平
+            error_threshold: 窗口内错误率超过该值时下调并发数
+            decrease: 错误率过高时的下调比例
+            latency_factor: 持平时平均延迟超过上一窗口的该倍数则下调一步
+            log: 输出调整记录的函数
+        """
+        maximum = max(minimum, maximum or initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.window = window
+        self.tolerance = tolerance
+        self.error_threshold = error_threshold
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.log = log
+        self.metrics = Metrics()
+        self.best = (0.0, self.limit)  # (最佳吞吐, 对应并发数)
+        self._direction = 1
+        self._previous = None  # 上一窗口的 (吞吐, 平均延迟)
+        self._lock = threading.Lock()
+        self._reset_window()
+
+    @classmethod
+    def from_config(cls, config, initial, maximum, log=print):
+        """根据配置文件的autotune段创建调节器，maximum为连接池允许的上限"""
+        return cls(initial, minimum=config.get('min_workers', 1),
+                   maximum=min(maximum, config.get('max_workers') or maximum),
+                   window=config.get('window', 8), tolerance=config.get('tolerance', 0.05),
+                   error_threshold=config.get('error_threshold', 0.2), decrease=config.get('decrease', 0.5),
+                   latency_factor=config.get('latency_factor', 1.5), log=log)
+
+    def _reset_window(self):
+        self._window_started = time.monotonic()
+        self._work = 0.0
+        self._latency = 0.0
+        self._completed = 0
+        self._errors = 0
+
+    def record(self, seconds, work=1.0, error=False):
+        """记录一个任务的结果，窗口满时评估并返回新的并发数
+
+        Args:
+            seconds: 任务耗时
+            work: 任务工作量（如字节数或估算开销），吞吐按工作量/秒计算
+            error: 任务是否失败
+        Returns:
+            int: 当前并发数
+        """
+        with self._lock:
+            self._completed += 1
+            self._latency += seconds
+            if error:
+                self._errors += 1
+            else:
+                self._work += work
+            if self._completed >= self.window:
+                self._adjust()
+            return self.limit
+
+    def _adjust(self):
+        elapsed = max(time.monotonic() - self._window_started, 1e-6)
+        throughput = self._work / elapsed
+        latency = self._latency / self._completed
+        error_rate = self._errors / self._completed
+        old_limit = self.limit
+
+        if error_rate > self.error_threshold:
+            self.limit = max(self.minimum, math.floor(self.limit * self.decrease))
+            self._direction = 1
+            # 错误导致的吞吐下降不作为爬山的比较基准
+            throughput_base = None
+        else:
+            if throughput > self.best[0]:
+                self.best = (throughput, self.limit)
+            if self._previous is None:
+                step = self._direction
+            else:
+                previous_throughput, previous_latency = self._previous
+                if throughput > previous_throughput * (1 + self.tolerance):
+                    step = self._direction
+                elif throughput < previous_throughput * (1 - self.tolerance):
+                    self._direction = -self._direction
+                    step = self._direction
+                elif latency > previous_latency * self.latency_factor:
+                    step = -1
+                else:
+                    step = 0
+            new_limit = min(max(self.limit + step, self.minimum), self.maximum)
+            if new_limit == self.limit and step:
+                # 到达边界时掉头，继续探测
+                self._direction = -self._direction
+            self.limit = new_limit
+            throughput_base = (throughput, latency)
+
+        self._previous = throughput_base
+        self.metrics.set('autotune_concurrency', self.limit)
+        if self.limit != old_limit:
+            self.metrics.inc('autotune_adjustments_total')
+            self.log(f"自动调整并发数: {old_limit} -> {self.limit} "
+                     f"(吞吐 {throughput:.2f}/s, 平均延迟 {latency:.2f}s, 错误率 {error_rate * 100:.0f}%)")
+        self._reset_window()
+
+    def summary(self):
+        return f"自动调整后的并发数: {self.limit}，最佳吞吐 {self.best[0]:.2f}/s（并发数 {self.best[1]}）"
+
+
+class AdaptiveLimiter:
+    """并发数可在运行时调整的线程限流器，替代固定大小的信号量"""
+
+    def __init__(self, tuner):
+        self.tuner = tuner
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self, work=1.0):
+        """占用一个并发名额，退出时记录耗时和是否出错
+
+        Args:
+            work: 任务工作量，用于计算吞吐
+        """
+        with self._condition:
+            while self._in_flight >= self.tuner.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        started = time.monotonic()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.tuner.record(time.monotonic() - started, work, error)
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+
+class AsyncAdaptiveLimiter:
+    """并发数可在运行时调整的协程限流器，替代固定大小的asyncio信号量，需在同一事件循环中使用"""
+
+    def __init__(self, tuner):
+        self.tuner = tuner
+        self._in_flight = 0
+        self._condition = None
+
+    @asynccontextmanager
+    async def slot(self, work=1.0):
+        """占用一个并发名额，退出时记录耗时和是否出错"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.tuner.limit)
+            self._in_flight += 1
+        started = time.monotonic()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.tuner.record(time.monotonic() - started, work, error)
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+
+def add_autotune_arguments(parser):
+    """为命令行添加自动调整并发数参数"""
+    parser.add_argument('--autotune', action='store_true',
+                        help="根据实测吞吐、延迟和错误率自动调整并发数，不超过SMB连接池限制，参数见配置文件autotune段")
@@ -1,14 +1,54 @@
+import os
+from contextlib import contextmanager
 from .config_reader import ConfigReader
+from .deadline import Watchdog
 from .fileHandler import FileHandlerFactory
+from .fileHandler.file_handler import local_video_file
+from .metrics import Metrics
+from .profiler import Profiler
+from .schedule import MetadataCache, MetadataScanner, ProgressTracker, VideoScheduler
+from .work_queue import Shard, LeaseQueue
 from datetime import datetime, timedelta
 
 class BaseHandler:
     def __init__(self):
         self.config_reader = ConfigReader()
-        method = self.config_reader.get_config('nas_connect_method')
-        self.file_handler = FileHandlerFactory.get_file_handler(method)
+        # 文件处理器在首次使用时才创建，避免参数错误或--help时也建立NAS连接
+        self._file_handler = None
         # 从配置文件读取摄像头配置
         self.camera_configs = self.config_reader.get_config('cameras')
+        # 运行指标，未在配置中启用时记录操作几乎没有开销
+        self.metrics = Metrics()
+        # 性能剖析器，默认禁用，命令行指定--profile时替换
+        self.profiler = Profiler()
+        # 多节点分片和共享任务队列，命令行指定--shard/--queue时设置
+        self.shard = None
+        self.work_queue = None
+        # 从任务队列逐批领取时整个运行共用的进度跟踪器，各批次不单独计算进度和剩余时间
+        self._queue_progress = None
+        # 解码配置，摄像头配置中的decode可单独覆盖
+        self.decode_config = self.config_reader.get_config('decode')
+        # 处理顺序调度器，命令行或配置指定时设置；video_costs为本次各视频的估算开销
+        self.schedule_config = self.config_reader.get_config().get('schedule') or {}
+        self.scheduler = None
+        self.video_costs = {}
+        # 看门狗，处理单个视频卡住或超时时放弃该视频及其NAS文件句柄，配置未启用时为None
+        watchdog_config = self.config_reader.get_config().get('watchdog') or {}
+        self.watchdog = None
+        if watchdog_config.get('enabled'):
+            self.watchdog = Watchdog.from_config(watchdog_config, self._on_video_timeout, self.log_print)
+
+    @property
+    def file_handler(self):
+        """懒加载文件处理器"""
+        if self._file_handler is None:
+            method = self.config_reader.get_config('nas_connect_method')
+            self._file_handler = FileHandlerFactory.get_file_handler(method)
+        return self._file_handler
+
+    @file_handler.setter
+    def file_handler(self, file_handler):
+        self._file_handler = file_handler
     
     def get_camera_type(self, video_path):
         """
@@ -27,10 +67,171 @@ class BaseHandler:
                     return camera_type
         return 'default'
     
+    @contextmanager
+    def open_local_video(self, video_path, spool_dir=None):
+        """返回可交给解码器的本地路径，远程文件读取到暂存目录后使用完即删除
+
+        Args:
+            video_path: 视频路径
+            spool_dir: 暂存目录，默认使用系统临时目录
+        """
+        with local_video_file(self.file_handler, video_path, spool_dir) as local_path:
+            yield local_path
+
+    def run_watched(self, video_path, func, *args):
+        """在看门狗监视下处理单个视频，未启用看门狗时直接调用
+
+        Raises:
+            DeadlineExceeded: 视频处理卡住或超时，已被放弃
+        """
+        if self.watchdog is None:
+            return func(*args)
+        return self.watchdog.run(video_path, func, *args)
+
+    def _on_video_timeout(self, task):
+        """视频处理卡住时放弃该任务线程打开的NAS文件句柄，其他视频的读取不受影响"""
+        self.file_handler.abandon(task.thread)
+
+    def get_frames_dir(self):
+        """抽帧输出目录（video_frames.frames_path），相对路径基于项目根目录"""
+        video_frames_config = self.config_reader.get_config().get('video_frames') or {}
+        return os.path.join(self.config_reader.get_root_path(),
+                            video_frames_config.get('frames_path', 'data/raw/frames'))
+
+    def get_decode_options(self, camera_type):
+        """获取摄像头的解码配置（后端、输出宽度、解码线程数等）"""
+        from .decode import decoder_options
+        return decoder_options(self.decode_config, self.camera_configs.get(camera_type))
+
     def get_formatted_datetime(self):
         """Returns current datetime formatted as string"""
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     def log_print(self, message):
         """Print message with timestamp"""
-        print(f"[{self.get_formatted_datetime()}] {message}")
\ No newline at end of file
+        print(f"[{self.get_formatted_datetime()}] {message}")
+
+    def export_metrics(self, job):
+        """运行结束时导出指标汇总（JSON及Prometheus文本文件）"""
+        for path in self.metrics.export(job):
+            self.log_print(f"运行指标已导出: {path}")
+
+    def start_profiler(self, profiler):
+        """替换并启动性能剖析器"""
+        self.profiler = profiler
+        self.profiler.start()
+
+    def stop_profiler(self):
+        """停止性能剖析并输出写入的文件"""
+        for path in self.profiler.stop():
+            self.log_print(f"性能剖析结果已写入: {path}")
+
+    def configure_work(self, args, queue_name):
+        """根据命令行参数设置分片和共享任务队列"""
+        self.shard = Shard.from_args(args)
+        self.work_queue = LeaseQueue.from_args(args, queue_name, log=self.log_print)
+
+    def configure_schedule(self, args):
+        """根据命令行参数和配置文件设置处理顺序"""
+        self.scheduler = VideoScheduler.from_args(args, self.schedule_config)
+
+    def scan_metadata(self, video_paths, reader=None):
+        """预扫描视频元数据，结果缓存在配置的SQLite文件中
+
+        Args:
+            video_paths: 视频路径列表
+            reader: 提供 stat / read_range 的读取器，默认使用文件处理器
+        Returns:
+            dict: {路径: VideoMetadata}
+        """
+        cache_path = self.schedule_config.get('metadata_cache')
+        cache = None
+        if cache_path:
+            if not os.path.isabs(cache_path):
+                cache_path = os.path.join(self.config_reader.get_root_path(), cache_path)
+            cache = MetadataCache(cache_path, self.schedule_config.get('stable_seconds', 600))
+        scanner = MetadataScanner(reader or self.file_handler, cache, self.schedule_config.get('scan_workers', 8))
+        try:
+            metadata = scanner.scan(video_paths)
+        finally:
+            if cache is not None:
+                cache.close()
+        self.log_print(f"视频元数据: {len(metadata)}/{len(video_paths)} 个，"
+                       f"总时长 {sum(item.duration or 0 for item in metadata.values()) / 3600:.1f} 小时")
+        return metadata
+
+    def schedule_videos(self, video_paths, reader=None):
+        """按调度器安排处理顺序，并记录各视频的估算开销用于进度和剩余时间
+
+        未设置调度器时原样返回；按列表顺序处理且未开启scan_metadata时不扫描元数据。
+
+        Args:
+            video_paths: 视频路径列表
+            reader: 提供 stat / read_range 的读取器，默认使用文件处理器
+        Returns:
+            list: 排序后的视频路径列表
+        """
+        if self.scheduler is None or not video_paths:
+            return video_paths
+        metadata = {}
+        if self.scheduler.needs_metadata or self.schedule_config.get('scan_metadata'):
+            metadata = self.scan_metadata(video_paths, reader)
+        sample_intervals = {path: self.camera_configs[self.get_camera_type(path)].get('sample_interval', 1)
+                            for path in video_paths}
+        ordered, self.video_costs = self.scheduler.plan(video_paths, metadata, sample_intervals)
+        self.log_print(f"处理顺序: {self.scheduler}")
+        return ordered
+
+    def create_progress(self, video_paths):
+        """创建进度跟踪器，有估算开销时按开销计算进度和剩余时间；从任务队列领取的批次返回整个运行的跟踪器"""
+        if self._queue_progress is not None:
+            return self._queue_progress
+        return ProgressTracker(video_paths, self.video_costs)
+
+    def select_videos(self, video_paths):
+        """按分片筛选本节点处理的视频，未分片时原样返回"""
+        if self.shard is None:
+            return video_paths
+        selected = self.shard.filter(video_paths)
+        self.log_print(f"分片 {self.shard}: 共 {len(video_paths)} 个视频，本节点处理 {len(selected)} 个")
+        return selected
+
+    def iter_work_batches(self, video_paths):
+        """逐批产生本节点要处理的视频
+
+        未使用任务队列时整个列表作为一批；使用任务队列时先把视频加入队列，
+        再逐批领取，直到队列中没有可领取的任务，期间后台线程为已领取的任务续约。
+        """
+        if self.work_queue is None:
+            yield video_paths
+            return
+        # 设置了调度器时按调度后的顺序设置优先级，各节点按该顺序领取
+        added = self.work_queue.enqueue(video_paths, ordered=self.scheduler is not None)
+        self.log_print(f"任务队列新加入 {added} 个视频，当前状态: {self.work_queue.counts()}")
+        # 进度和剩余时间按整个队列计算，而不是每领取一批重新开始
+        self._queue_progress = ProgressTracker(video_paths, self.video_costs)
+        try:
+            with self.work_queue.heartbeat():
+                while True:
+                    batch = self.work_queue.claim()
+                    if not batch:
+                        break
+                    yield batch
+        finally:
+            self._queue_progress = None
+        self.log_print(f"任务队列状态: {self.work_queue.counts()}")
+
+    def report_video(self, video_path, error=None):
+        """向任务队列报告单个视频的处理结果，未使用任务队列时不做任何事"""
+        if self.work_queue is None:
+            return
+        if error is None:
+            self.work_queue.complete(video_path)
+        else:
+            self.work_queue.fail(video_path, error)
+
+    def log_cache_stats(self):
+        """输出视频缓存的命中统计，未启用缓存时不输出"""
+        cache = getattr(self.file_handler, 'cache', None)
+        if cache is not None:
+            self.log_print(cache.format_stats())
\ No newline at end of file
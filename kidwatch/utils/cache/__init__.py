@@ -0,0 +1,3 @@
+from .video_cache import VideoCache
+
+__all__ = ['VideoCache']
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Event, Lock
+
+
+class VideoCache:
+    """NAS视频文件的本地磁盘读穿缓存
+
+    缓存以 (路径, 文件大小, 修改时间) 为键，文件在NAS上被修改后自动失效。
+    总大小超过上限时按最近最少使用(LRU)淘汰；写入先落到临时文件再原子替换；
+    同一文件的并发请求只会触发一次远程读取，其余请求等待结果。
+    """
+    TMP_SUFFIX = '.tmp'
+
+    def __init__(self, cache_dir, max_size_bytes):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = Lock()
+        self._entries = OrderedDict()  # 缓存文件名 -> 文件大小，按访问时间排序
+        self._total_size = 0
+        self._inflight = {}  # 缓存文件名 -> Event，正在从远程读取的文件
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'bytes_saved': 0,
+            'bytes_fetched': 0,
+            'evictions': 0,
+        }
+        self._load_entries()
+
+    @classmethod
+    def from_config(cls, config, root_path):
+        """根据 video_cache 配置创建缓存，未启用时返回None"""
+        if not config or not config.get('enabled', False):
+            return None
+        cache_dir = config.get('path', 'data/cache/videos')
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(root_path, cache_dir)
+        max_size_bytes = int(float(config.get('max_size_gb', 20)) * 1024 ** 3)
+        return cls(cache_dir, max_size_bytes)
+
+    def _load_entries(self):
+        """启动时扫描缓存目录，按修改时间重建LRU顺序并清理残留的临时文件"""
+        existing = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(self.TMP_SUFFIX):
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+                    continue
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._total_size += size
+        with self._lock:
+            self._evict_locked()
+
+    @staticmethod
+    def make_key(path, size, mtime):
+        """由路径、大小和修改时间生成缓存文件名"""
+        digest = hashlib.sha1(f"{path}\0{size}\0{int(mtime)}".encode('utf-8')).hexdigest()
+        ext = os.path.splitext(path)[1]
+        return f"{digest}{ext}"
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get_or_fetch(self, path, size, mtime, fetch):
+        """读取缓存内容，未命中时调用fetch从远程读取并写入缓存
+
+        Args:
+            path: 远程文件路径
+            size: 远程文件大小
+            mtime: 远程文件修改时间
+            fetch: 无参可调用对象，返回文件内容bytes
+        Returns:
+            bytes: 文件内容
+        """
+        key = self.make_key(path, size, mtime)
+        while True:
+            with self._lock:
+                hit = key in self._entries
+                if hit:
+                    self._entries.move_to_end(key)
+                    is_leader = False
+                else:
+                    event = self._inflight.get(key)
+                    is_leader = event is None
+                    if is_leader:
+                        event = Event()
+                        self._inflight[key] = event
+
+            if hit:
+                data = self._read_entry(key)
+                if data is None:  # 缓存文件被外部删除，重新获取
+                    continue
+                with self._lock:
+                    self._stats['hits'] += 1
+                    self._stats['bytes_saved'] += len(data)
+                return data
+
+            if not is_leader:
+                # 其他线程正在读取同一文件，等待其完成后重新查找
+                event.wait()
+                continue
+
+            try:
+                data = fetch()
+                self._store(key, data)
+                with self._lock:
+                    self._stats['misses'] += 1
+                    self._stats['bytes_fetched'] += len(data)
+                return data
+            finally:
+                with self._lock:
+                    self._inflight.pop(key).set()
+
+    def _read_entry(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as file:
+                data = file.read()
+            os.utime(entry_path)  # 记录访问时间，重启后仍能保持LRU顺序
+            return data
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_size -= size
+            return None
+
+    def _store(self, key, data):
+        """原子写入缓存文件：先写临时文件，再重命名为最终文件名"""
+        size = len(data)
+        if size > self.max_size_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=self.TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_size -= previous
+            self._entries[key] = size
+            self._total_size += size
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """淘汰最久未使用的缓存文件，直到总大小不超过上限（调用方需持有锁）"""
+        while self._total_size > self.max_size_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_size -= size
+            self._stats['evictions'] += 1
+            try:
+                os.unlink(self._entry_path(key))
+            except OSError:
+                pass
+
+    def get_stats(self):
+        """获取缓存统计信息，包括命中率、未命中率和节省的字节数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['size_bytes'] = self._total_size
+        requests = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / requests if requests else 0.0
+        stats['miss_ratio'] = stats['misses'] / requests if requests else 0.0
+        return stats
+
+    def format_stats(self):
+        """格式化缓存统计信息用于日志输出"""
+        stats = self.get_stats()
+        return (f"视频缓存: 命中 {stats['hits']} 次 ({stats['hit_ratio'] * 100:.1f}%), "
+                f"未命中 {stats['misses']} 次 ({stats['miss_ratio'] * 100:.1f}%), "
+                f"节省下载 {stats['bytes_saved'] / 1024 ** 2:.1f} MB, "
+                f"缓存占用 {stats['size_bytes'] / 1024 ** 2:.1f} MB / {stats['entries']} 个文件")
@@ -0,0 +1,92 @@
+import threading
+
+import cv2
+import numpy as np
+
+from .metrics import Metrics
+
+# 级联检测的默认配置：初筛用小模型低分辨率、低置信度保证召回，复核用大模型高分辨率
+DEFAULT_CASCADE = {
+    'enabled': False,
+    'screen_model': 'yolov8n.pt',
+    'screen_imgsz': 320,
+    'screen_conf': 0.2,
+    'confirm_model': 'yolov8m.pt',
+    'confirm_imgsz': 960,
+    'motion': False,
+    'motion_threshold': 0.002,
+}
+
+
+def cascade_options(cascade_config, camera_config=None):
+    """合并默认值、全局级联配置和摄像头级别的级联配置，摄像头配置优先"""
+    options = dict(DEFAULT_CASCADE)
+    options.update(cascade_config or {})
+    if camera_config:
+        options.update(camera_config.get('cascade') or {})
+    return options
+
+
+class MotionGate:
+    """按相邻采样帧的差异判断画面是否变化
+
+    画面未变化时检测结果与上一帧相同，无需再做推理。
+    比较对象是上一个判定为变化（即做了推理）的帧，缓慢的渐变累积到阈值后仍会触发推理；
+    比较在缩小的灰度图上进行，开销远小于一次模型推理。
+    """
+
+    def __init__(self, threshold=0.002, size=64, pixel_delta=25):
+        """
+        Args:
+            threshold: 变化像素占比超过该值视为有变化
+            size: 比较用灰度图的宽度
+            pixel_delta: 单个像素灰度差超过该值视为变化
+        """
+        self.threshold = threshold
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self._previous = None
+
+    def changed(self, frame):
+        """判断帧与上一个通过的帧相比是否有变化，第一帧总是视为变化；只有通过的帧才成为新的比较对象"""
+        height = max(1, int(frame.shape[0] * self.size / frame.shape[1]))
+        gray = cv2.cvtColor(cv2.resize(frame, (self.size, height), interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+        previous = self._previous
+        if previous is None or previous.shape != gray.shape:
+            self._previous = gray
+            return True
+        moving = np.count_nonzero(cv2.absdiff(gray, previous) > self.pixel_delta)
+        if moving / gray.size > self.threshold:
+            self._previous = gray
+            return True
+        return False
+
+
+class CascadeStats:
+    """统计各级处理的帧数：采样、运动过滤跳过、初筛、进入复核、确认有小孩"""
+
+    STAGES = ('sampled', 'motion_skipped', 'screened', 'candidates', 'confirmed')
+
+    def __init__(self):
+        self.metrics = Metrics()
+        self._counts = dict.fromkeys(self.STAGES, 0)
+        self._lock = threading.Lock()
+
+    def add(self, stage, count=1):
+        if not count:
+            return
+        with self._lock:
+            self._counts[stage] += count
+        self.metrics.inc(f'cascade_{stage}_total', count)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def format(self):
+        counts = self.counts()
+        sampled = counts['sampled'] or 1
+        return (f"级联检测: 采样 {counts['sampled']} 帧，运动过滤跳过 {counts['motion_skipped']} 帧，"
+                f"初筛 {counts['screened']} 帧，复核 {counts['candidates']} 帧"
+                f"（{counts['candidates'] / sampled * 100:.1f}%），确认有小孩 {counts['confirmed']} 帧")
@@ -0,0 +1,50 @@
+import csv
+from datetime import datetime
+
+# 分类结果CSV的字段，video_classifier、pipeline和推理服务客户端的输出一致
+RESULT_FIELDS = ['video_path', 'camera_type', 'camera_name', 'has_child', 'processed_time']
+
+
+def make_result(video_path, camera_type, camera_name, has_child):
+    """构建一条分类结果"""
+    return {
+        'video_path': video_path,
+        'camera_type': camera_type,
+        'camera_name': camera_name,
+        'has_child': has_child,
+        'processed_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def format_camera_stats(results, camera_configs):
+    """按摄像头统计包含小孩的视频比例（不包括default配置）
+
+    Args:
+        results: 分类结果列表
+        camera_configs: 摄像头配置
+    Returns:
+        list: 每个摄像头一行统计文字
+    """
+    stats = {camera: {'total': 0, 'with_child': 0} for camera in camera_configs if camera != 'default'}
+    for result in results:
+        camera_stats = stats.get(result['camera_type'])
+        if camera_stats is None:
+            continue
+        camera_stats['total'] += 1
+        if result['has_child']:
+            camera_stats['with_child'] += 1
+    lines = []
+    for camera_type, camera_stats in stats.items():
+        if camera_stats['total'] > 0:
+            child_ratio = (camera_stats['with_child'] / camera_stats['total']) * 100
+            lines.append(f"{camera_configs[camera_type]['name']}摄像头: 总计 {camera_stats['total']} 个视频, "
+                         f"包含小孩 {camera_stats['with_child']} 个 ({child_ratio:.1f}%)")
+    return lines
+
+
+def write_results(output_file, results):
+    """将分类结果写入CSV文件"""
+    with open(output_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
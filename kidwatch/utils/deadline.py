@@ -0,0 +1,261 @@
+import threading
+import time
+from queue import Empty, Queue
+
+from .metrics import Metrics
+
+# 当前线程正在处理的受监视任务，供解码循环和分块读取报告进度
+_current = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """单次操作或单个视频的处理超过期限"""
+
+
+def heartbeat():
+    """报告当前线程仍在推进
+
+    解码循环每帧、分块读取每块调用一次；不在看门狗监视下时几乎没有开销。
+
+    Raises:
+        DeadlineExceeded: 当前任务已被看门狗放弃，卡住的线程恢复后借此尽快退出
+    """
+    task = getattr(_current, 'task', None)
+    if task is not None:
+        task.beat()
+
+
+class _Call:
+    """提交给 TimeoutCaller 的单次调用"""
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.finished = False
+        self.abandoned = False
+        self.result = None
+        self.error = None
+
+
+class TimeoutCaller:
+    """用少量常驻守护线程执行带期限的阻塞调用
+
+    线程执行完一次调用后留在池中复用，空闲超过 idle_seconds 才退出，不再每次调用新建线程。
+    超时的调用被放弃，其线程继续阻塞直到底层调用出错返回（如所在连接被关闭），之后回到池中；
+    仍未返回的被放弃调用达到 max_abandoned 时拒绝新的调用，避免卡住的线程无限累积。
+    不使用 ThreadPoolExecutor：其工作线程在解释器退出时会被等待，卡住的线程会让进程无法退出。
+    """
+
+    def __init__(self, max_abandoned=8, idle_seconds=60, name='deadline-call'):
+        """
+        Args:
+            max_abandoned: 仍未返回的被放弃调用数上限，为0则不限制
+            idle_seconds: 空闲线程保留的时间（秒）
+            name: 线程名
+        """
+        self.max_abandoned = max_abandoned
+        self.idle_seconds = idle_seconds
+        self.name = name
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._idle = 0
+        self._abandoned = 0
+
+    def abandoned_alive(self):
+        """仍未返回的被放弃调用数"""
+        with self._lock:
+            return self._abandoned
+
+    def call(self, timeout, func, *args, **kwargs):
+        """在池中线程执行阻塞调用，超时未返回时放弃该调用并抛出DeadlineExceeded
+
+        timeout为空或0时直接在当前线程执行。
+
+        Args:
+            timeout: 期限（秒）
+            func: 阻塞调用
+        Returns:
+            func的返回值
+        Raises:
+            DeadlineExceeded: 调用超过期限
+            RuntimeError: 被放弃的调用数已达上限
+        """
+        if not timeout:
+            return func(*args, **kwargs)
+        call = _Call(func, args, kwargs)
+        with self._lock:
+            if self.max_abandoned and self._abandoned >= self.max_abandoned:
+                raise RuntimeError(f"已有 {self.max_abandoned} 个超时的操作未返回，停止提交新的操作")
+            # 有空闲线程时占用其一，否则新建线程
+            start_worker = self._idle == 0
+            if not start_worker:
+                self._idle -= 1
+        self._queue.put(call)
+        if start_worker:
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+        if not call.done.wait(timeout):
+            with self._lock:
+                if not call.finished:
+                    call.abandoned = True
+                    self._abandoned += 1
+            if call.abandoned:
+                raise DeadlineExceeded(f"操作超过 {timeout}s 未完成")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _run(self):
+        while True:
+            try:
+                call = self._queue.get(timeout=self.idle_seconds)
+            except Empty:
+                with self._lock:
+                    # 超时的同时有调用占用了本线程时继续取任务，否则退出
+                    if self._idle > 0:
+                        self._idle -= 1
+                        return
+                continue
+            try:
+                call.result = call.func(*call.args, **call.kwargs)
+            except BaseException as e:
+                call.error = e
+            with self._lock:
+                call.finished = True
+                if call.abandoned:
+                    self._abandoned -= 1
+                self._idle += 1
+            call.done.set()
+
+
+_default_caller = TimeoutCaller(max_abandoned=0)
+
+
+def call_with_timeout(timeout, func, *args, **kwargs):
+    """使用进程共享的 TimeoutCaller 执行带期限的阻塞调用，不限制被放弃的调用数
+
+    需要限制卡住线程数的调用方（如SMB后端）应自行创建 TimeoutCaller。
+    """
+    return _default_caller.call(timeout, func, *args, **kwargs)
+
+
+class WatchedTask:
+    """看门狗监视下的单个任务"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.monotonic()
+        self.last_beat = self.started
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+        self.result = None
+        self.error = None
+
+    def beat(self):
+        if self.cancelled.is_set():
+            raise DeadlineExceeded(f"{self.label} 已被看门狗放弃")
+        self.last_beat = time.monotonic()
+
+
+class Watchdog:
+    """监视单个视频的处理，卡住或超过期限时放弃该任务
+
+    每个视频在独立的守护线程中处理，调用方线程等待其完成并定期检查：
+    - 距上次 heartbeat() 超过 stall_seconds（读取或解码卡住）；
+    - 总耗时超过 video_timeout（如损坏文件导致解码极慢）。
+    触发时标记任务取消（线程若恢复，会在下一次 heartbeat 时退出），调用 on_timeout（如放弃该任务的NAS文件句柄），
+    并抛出 DeadlineExceeded。调用方线程随即处理下一个视频，卡住的线程不再占用并发名额。
+    """
+
+    def __init__(self, stall_seconds=120, video_timeout=None, check_interval=1.0, max_abandoned=8,
+                 on_timeout=None, log=print):
+        """
+        Args:
+            stall_seconds: 任务多久没有进展视为卡住
+            video_timeout: 单个视频的最长处理时间（秒），为空则不限制
+            check_interval: 检查间隔（秒）
+            max_abandoned: 仍未退出的被放弃线程数上限，超过时停止处理，避免线程和连接无限累积
+            on_timeout: 放弃任务后的回调，参数为 WatchedTask
+            log: 输出日志的函数
+        """
+        self.stall_seconds = stall_seconds
+        self.video_timeout = video_timeout
+        self.check_interval = check_interval
+        self.max_abandoned = max_abandoned
+        self.on_timeout = on_timeout
+        self.log = log
+        self.metrics = Metrics()
+        self.timed_out = 0
+        self._abandoned = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, on_timeout=None, log=print):
+        """根据配置文件的watchdog段创建"""
+        return cls(stall_seconds=config.get('stall_seconds', 120), video_timeout=config.get('video_timeout'),
+                   check_interval=config.get('check_interval', 1.0), max_abandoned=config.get('max_abandoned', 8),
+                   on_timeout=on_timeout, log=log)
+
+    def abandoned_alive(self):
+        """仍未退出的被放弃线程数"""
+        with self._lock:
+            self._abandoned = [thread for thread in self._abandoned if thread.is_alive()]
+            return len(self._abandoned)
+
+    def _overdue(self, task):
+        """返回任务超期的原因，未超期返回None"""
+        now = time.monotonic()
+        if self.stall_seconds and now - task.last_beat > self.stall_seconds:
+            return f"已 {now - task.last_beat:.1f}s 没有进展"
+        if self.video_timeout and now - task.started > self.video_timeout:
+            return f"处理时间超过 {self.video_timeout}s"
+        return None
+
+    def run(self, label, func, *args):
+        """在监视下执行 func(*args)
+
+        Args:
+            label: 任务名称，通常为视频路径
+        Returns:
+            func的返回值
+        Raises:
+            DeadlineExceeded: 任务卡住或超过期限
+        """
+        if self.max_abandoned and self.abandoned_alive() >= self.max_abandoned:
+            raise RuntimeError(f"已有 {self.max_abandoned} 个卡住的任务未退出，停止处理")
+        task = WatchedTask(label)
+
+        def target():
+            _current.task = task
+            try:
+                task.result = func(*args)
+            except BaseException as e:
+                task.error = e
+            finally:
+                _current.task = None
+                task.done.set()
+
+        task.thread = threading.Thread(target=target, name=f'watched-{threading.current_thread().name}',
+                                       daemon=True)
+        task.thread.start()
+        while not task.done.wait(self.check_interval):
+            reason = self._overdue(task)
+            if reason is None:
+                continue
+            task.cancelled.set()
+            with self._lock:
+                self.timed_out += 1
+                self._abandoned.append(task.thread)
+            self.metrics.inc('watchdog_timeouts_total')
+            self.log(f"看门狗: {label} {reason}，放弃该任务")
+            if self.on_timeout is not None:
+                try:
+                    self.on_timeout(task)
+                except Exception as e:
+                    self.log(f"看门狗回调失败: {str(e)}")
+            raise DeadlineExceeded(f"处理超时: {reason}")
+        if task.error is not None:
+            raise task.error
+        return task.result
@@ -0,0 +1,10 @@
+from .decoder_factory import DECODER_BACKENDS, create_decoder, decoder_options
+from .frame_pool import FramePool
+from .frame_ring import FrameRing
+from .process_pool import DecodeTask, ProcessDecodePool
+from .sampling import SamplingPolicy, IntervalSampler, EveryFrameSampler
+from .video_decoder import VideoDecoder, OpenCVDecoder
+
+__all__ = ['DECODER_BACKENDS', 'create_decoder', 'decoder_options', 'FramePool', 'FrameRing', 'DecodeTask',
+           'ProcessDecodePool', 'SamplingPolicy', 'IntervalSampler', 'EveryFrameSampler', 'VideoDecoder',
+           'OpenCVDecoder']
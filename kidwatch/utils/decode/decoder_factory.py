@@ -0,0 +1,37 @@
+from .video_decoder import OpenCVDecoder
+
+DECODER_BACKENDS = ('opencv', 'pyav')
+
+
+def decoder_options(decode_config, camera_config=None):
+    """合并全局解码配置和摄像头级别的解码配置，摄像头配置优先"""
+    options = dict(decode_config or {})
+    if camera_config:
+        options.update(camera_config.get('decode') or {})
+    return options
+
+
+def create_decoder(path, sampler=None, options=None, pool=None, reuse_buffer=True):
+    """按解码配置创建解码器
+
+    Args:
+        path: 本地视频文件路径
+        sampler: SamplingPolicy
+        options: 解码配置，包含 backend(opencv/pyav)、width、threads、skip_nonref
+        pool: FramePool，仅OpenCV后端使用
+        reuse_buffer: 是否复用输出缓冲区
+    Returns:
+        VideoDecoder
+    """
+    options = options or {}
+    backend = options.get('backend') or 'opencv'
+    width = options.get('width')
+    # 按需导入后端，未使用的后端（如PyAV）不会被加载
+    if backend == 'opencv':
+        return OpenCVDecoder(path, sampler, pool, reuse_buffer, width)
+    elif backend == 'pyav':
+        from .pyav_decoder import PyAVDecoder
+        return PyAVDecoder(path, sampler, pool, reuse_buffer, width,
+                           threads=options.get('threads', 0), skip_nonref=options.get('skip_nonref', True))
+    else:
+        raise ValueError(f"Unsupported decode backend: {backend}")
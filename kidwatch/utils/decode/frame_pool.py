@@ -0,0 +1,64 @@
+from threading import Lock
+
+import numpy as np
+
+from ..metrics import Metrics
+
+
+class FramePool:
+    """预分配的帧缓冲池
+
+    解码器把帧直接写入池中的缓冲区，用完归还后可被下一帧复用，
+    避免每帧分配一块全分辨率的数组。池空时按需分配新的缓冲区，
+    不同分辨率的帧各自使用独立的缓冲区列表。
+    """
+
+    def __init__(self, size=8):
+        """
+        Args:
+            size: 每种分辨率最多保留的空闲缓冲区数
+        """
+        self.size = size
+        self._free = {}  # (shape, dtype) -> [ndarray]
+        self._lock = Lock()
+        self.metrics = Metrics()
+        self.allocated = 0
+        self.reused = 0
+
+    def preallocate(self, shape, dtype=np.uint8, count=None):
+        """为指定分辨率预先分配缓冲区"""
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            while len(free) < (count or self.size):
+                free.append(np.empty(shape, dtype=dtype))
+                self.allocated += 1
+
+    def acquire(self, shape, dtype=np.uint8):
+        """取一个指定形状的缓冲区，池空时新分配"""
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reused += 1
+                buffer = free.pop()
+            else:
+                self.allocated += 1
+                buffer = None
+        if buffer is not None:
+            self.metrics.inc('frame_buffers_reused_total')
+            return buffer
+        self.metrics.inc('frame_buffers_allocated_total')
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer):
+        """归还缓冲区，超过池大小时丢弃"""
+        key = (buffer.shape, buffer.dtype)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.size:
+                free.append(buffer)
+
+    def stats(self):
+        with self._lock:
+            return {'allocated': self.allocated, 'reused': self.reused}
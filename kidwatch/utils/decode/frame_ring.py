@@ -0,0 +1,100 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class FrameRing:
+    """进程间共享内存的帧环形缓冲区
+
+    共享内存划分为固定大小的帧槽，空闲槽的编号放在free队列中，写好的帧通过ready队列通知消费方，
+    队列中只传递槽编号、帧形状和少量元数据，帧数据本身不经过pickle。
+    生产方（解码进程）取空闲槽写入帧，消费方（推理或编码）直接在共享内存上读取，用完后归还槽；
+    空闲槽用完时生产方阻塞，解码领先消费的帧数不超过槽数。
+
+    用法：
+        ring = FrameRing(ctx, slots=16, slot_bytes=1920 * 1080 * 3)
+        # 作为 Process 参数传给子进程，子进程中自动连接到同一块共享内存
+        ring.put(frame, meta)                    # 生产方
+        slot, frame, meta = ring.get()           # 消费方，frame 是共享内存上的视图
+        ring.release(slot)                       # 用完后归还，之后不能再访问 frame
+    """
+
+    def __init__(self, ctx, slots, slot_bytes):
+        """
+        Args:
+            ctx: multiprocessing 上下文
+            slots: 帧槽数
+            slot_bytes: 每个帧槽的字节数，应不小于最大帧
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._owner = True
+        self._free = ctx.Queue()
+        self._ready = ctx.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def __getstate__(self):
+        # 传给子进程时只传共享内存的名称和队列
+        return {'slots': self.slots, 'slot_bytes': self.slot_bytes, 'name': self._shm.name,
+                'free': self._free, 'ready': self._ready}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slot_bytes = state['slot_bytes']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self._free = state['free']
+        self._ready = state['ready']
+
+    def _view(self, slot, shape, dtype=np.uint8):
+        return np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+
+    def put(self, frame, meta, timeout=None):
+        """把一帧拷贝到空闲槽并通知消费方，没有空闲槽时等待
+
+        Raises:
+            ValueError: 帧大于帧槽
+            queue.Empty: timeout内没有空闲槽
+        """
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"帧大小 {frame.shape} 超过帧槽容量 {self.slot_bytes} 字节")
+        slot = self._free.get(timeout=timeout)
+        np.copyto(self._view(slot, frame.shape, frame.dtype), frame)
+        self._ready.put((slot, frame.shape, frame.dtype.str, meta))
+
+    def put_message(self, meta):
+        """发送不带帧的消息（如视频结束）"""
+        self._ready.put((None, None, None, meta))
+
+    def get(self, timeout=None):
+        """取出一条消息
+
+        Returns:
+            tuple: (槽编号, 共享内存上的帧视图, 元数据)，不带帧的消息槽编号和帧为None
+        Raises:
+            queue.Empty: timeout内没有消息
+        """
+        slot, shape, dtype, meta = self._ready.get(timeout=timeout)
+        if slot is None:
+            return None, None, meta
+        return slot, self._view(slot, shape, np.dtype(dtype)), meta
+
+    def release(self, slot):
+        """归还帧槽，调用后不能再访问该槽的帧视图"""
+        self._free.put(slot)
+
+    def close(self):
+        """断开共享内存，创建方同时删除共享内存"""
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有帧视图引用共享内存时无法立即断开，由进程退出时回收
+            pass
+        if self._owner:
+            self._shm.unlink()
+        for queue in (self._free, self._ready):
+            queue.close()
+            queue.cancel_join_thread()
+
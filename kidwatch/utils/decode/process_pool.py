@@ -0,0 +1,237 @@
+import multiprocessing
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+from queue import Empty
+
+from ..deadline import DeadlineExceeded
+from ..fileHandler.file_handler import local_video_file
+from ..metrics import Metrics
+from .decoder_factory import create_decoder
+from .frame_pool import FramePool
+from .frame_ring import FrameRing
+from .sampling import IntervalSampler
+
+# 交给解码进程的视频：序号、路径、采样间隔、解码配置、是否为NAS路径（否则为本地文件，直接解码）
+DecodeTask = namedtuple('DecodeTask', ['index', 'video_path', 'sample_interval', 'decode_options', 'remote'])
+
+# 解码进程发出的消息类型，消息为 (类型, 视频序号, 帧序号或帧数, 错误信息)
+# 开始解码一个视频，由 messages 内部记录，不交给消费方
+VIDEO_START = 'video_start'
+FRAME = 'frame'
+VIDEO_END = 'video_end'
+# 视频的帧大于帧槽，解码进程放弃该视频，由消费方在本进程中重新解码整个视频
+OVERSIZED = 'oversized'
+WORKER_DONE = 'worker_done'
+
+
+class DecodeWorkerError(RuntimeError):
+    """解码进程异常退出（如被系统杀死），其正在解码的视频没有结果"""
+
+
+def _create_file_handler():
+    """子进程中按配置创建文件处理器"""
+    from ..config_reader import ConfigReader
+    from ..fileHandler import FileHandlerFactory
+    return FileHandlerFactory.get_file_handler(ConfigReader().get_config('nas_connect_method'))
+
+
+def _decode_worker(ring, tasks, file_handler, decided, metrics_enabled):
+    """解码进程：逐个领取视频，采样帧写入共享内存帧槽
+
+    Args:
+        ring: FrameRing
+        tasks: DecodeTask 队列，None 表示没有更多任务
+        file_handler: 父进程提供的文件处理器，为None时按配置创建
+        decided: 各视频是否已得出结论的共享数组，已得出结论的视频停止解码；为None时解码全部采样帧
+        metrics_enabled: 是否记录运行指标，结束时随 WORKER_DONE 消息交给父进程合并
+    """
+    metrics = Metrics()
+    metrics.enabled = metrics_enabled
+    file_handler = file_handler or _create_file_handler()
+    frame_pool = FramePool()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        ring.put_message((VIDEO_START, task.index, None, None))
+        frames = 0
+        error = None
+        oversized = None
+        try:
+            source = local_video_file(file_handler, task.video_path) if task.remote else nullcontext(task.video_path)
+            with source as local_path:
+                # 帧写入帧槽后即可复用解码缓冲区
+                with create_decoder(local_path, IntervalSampler(task.sample_interval), task.decode_options,
+                                    frame_pool) as decoder:
+                    for frame_index, frame in decoder:
+                        if decided is not None and decided[task.index]:
+                            break
+                        if frame.nbytes > ring.slot_bytes:
+                            oversized = f"帧大小 {frame.shape} 超过帧槽容量"
+                            break
+                        ring.put(frame, (FRAME, task.index, frame_index, None))
+                        frames += 1
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if oversized is not None and error is None:
+            ring.put_message((OVERSIZED, task.index, frames, oversized))
+        else:
+            ring.put_message((VIDEO_END, task.index, frames, error))
+    ring.put_message((WORKER_DONE, None, None, metrics.dump() if metrics_enabled else None))
+
+
+class ProcessDecodePool:
+    """多进程解码，采样帧经共享内存帧槽交给本进程消费
+
+    解码在独立进程中进行，不受GIL限制；帧数据写入 FrameRing 的帧槽，进程间只传递槽编号，
+    消费方（推理或JPEG编码）直接读取帧槽，用完调用 release 归还。帧槽用完时解码进程等待，
+    解码领先消费的帧数不超过帧槽数。帧大于帧槽的视频（如分辨率超过 max_width x max_height）
+    发出 OVERSIZED 消息，由消费方在本进程中解码；解码进程的运行指标在其结束时合并到本进程。
+
+    用法：
+        with ProcessDecodePool.from_config(config) as pool:
+            pool.start(tasks)
+            for slot, frame, message in pool.messages():
+                ...
+                pool.release(slot)
+    """
+
+    def __init__(self, workers=2, slots=16, slot_bytes=1920 * 1080 * 3, file_handler=None, start_method='spawn',
+                 stall_seconds=None):
+        """
+        Args:
+            workers: 解码进程数
+            slots: 帧槽数
+            slot_bytes: 每个帧槽的字节数，大于该值的帧无法传递，所在视频由消费方在本进程中解码
+            file_handler: 交给子进程的文件处理器（须可pickle），为None时子进程按配置创建
+            start_method: 子进程启动方式，默认spawn，避免把父进程的NAS连接状态复制到子进程
+            stall_seconds: 解码进程多久没有输出视为卡住，为空则不限制
+        """
+        self.workers = max(1, workers)
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.file_handler = file_handler
+        self.stall_seconds = stall_seconds
+        self._ctx = multiprocessing.get_context(start_method)
+        self._ring = None
+        self._tasks = None
+        self._decided = None
+        self._processes = []
+        # 已开始解码的视频序号，解码进程异常退出后，其中未结束的视频即为出事时正在解码的视频
+        self.started = set()
+
+    @classmethod
+    def from_config(cls, config, file_handler=None, workers=None, min_slots=0):
+        """根据配置文件的process_decode段创建
+
+        Args:
+            config: process_decode 配置
+            file_handler: 交给子进程的文件处理器
+            workers: 覆盖配置的解码进程数
+            min_slots: 帧槽数下限，消费方一次持有多个帧槽（如凑批推理）时须大于其持有数
+        """
+        workers = workers or config.get('workers', 2)
+        slots = max(config.get('slots', 16), min_slots + workers)
+        slot_bytes = config.get('max_width', 1920) * config.get('max_height', 1080) * 3
+        return cls(workers, slots, slot_bytes, file_handler, config.get('start_method', 'spawn'),
+                   config.get('stall_seconds'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self, tasks, track_decided=False):
+        """启动解码进程
+
+        Args:
+            tasks: [DecodeTask, ...]，index 为在列表中的序号
+            track_decided: 是否允许消费方通过 mark_decided 让解码进程跳过已得出结论的视频
+        """
+        self._ring = FrameRing(self._ctx, self.slots, self.slot_bytes)
+        self.started = set()
+        self._tasks = self._ctx.Queue()
+        if track_decided:
+            self._decided = self._ctx.RawArray('b', len(tasks))
+        workers = min(self.workers, len(tasks)) or 1
+        for task in tasks:
+            self._tasks.put(task)
+        for _ in range(workers):
+            self._tasks.put(None)
+        for number in range(workers):
+            process = self._ctx.Process(target=_decode_worker, name=f'frame-decode-{number}', daemon=True,
+                                        args=(self._ring, self._tasks, self.file_handler, self._decided,
+                                              Metrics().enabled))
+            process.start()
+            self._processes.append(process)
+
+    def messages(self, idle_timeout=None):
+        """按到达顺序产出解码进程的消息，直到所有解码进程结束
+
+        Args:
+            idle_timeout: 超过该时间没有消息时产出 (None, None, None)，供消费方处理已积攒的帧
+        Yields:
+            (槽编号, 帧, 消息)：FRAME 消息的帧是共享内存上的视图，处理完后须调用 release(槽编号)；
+            VIDEO_END 消息的帧数为该视频写入帧槽的帧数，错误信息为None表示解码成功；
+            OVERSIZED 消息表示该视频的帧放不进帧槽，在此之前写入帧槽的帧数为消息中的帧数
+        Raises:
+            DecodeWorkerError: 解码进程异常退出，其余解码进程已处理完；started 中尚未结束的视频为其正在解码的视频，
+                其余未结束的视频尚未开始解码
+            DeadlineExceeded: 超过 stall_seconds 没有收到任何消息
+        """
+        running = len(self._processes)
+        poll = min(idle_timeout or 1.0, 1.0)
+        last_message = time.monotonic()
+        while running:
+            try:
+                slot, frame, message = self._ring.get(timeout=poll)
+            except Empty:
+                now = time.monotonic()
+                if idle_timeout is not None and now - last_message >= idle_timeout:
+                    yield None, None, None
+                if self.stall_seconds and now - last_message > self.stall_seconds:
+                    raise DeadlineExceeded(f"解码进程已 {now - last_message:.1f}s 没有输出")
+                if any(process.is_alive() for process in self._processes):
+                    continue
+                # 进程被杀死等情况下不会再发出结束消息，不能一直等待；正常退出的进程发出的消息此时都已可读
+                try:
+                    slot, frame, message = self._ring.get(timeout=poll)
+                except Empty:
+                    exit_codes = [process.exitcode for process in self._processes]
+                    raise DecodeWorkerError(f"解码进程异常退出，退出码: {exit_codes}")
+            last_message = time.monotonic()
+            if message[0] == WORKER_DONE:
+                running -= 1
+                Metrics().merge(message[3])
+                continue
+            if message[0] == VIDEO_START:
+                self.started.add(message[1])
+                continue
+            yield slot, frame, message
+
+    def release(self, slot):
+        """归还帧槽"""
+        self._ring.release(slot)
+
+    def mark_decided(self, index):
+        """标记视频已得出结论，解码进程不再解码其剩余的帧"""
+        if self._decided is not None:
+            self._decided[index] = 1
+
+    def close(self):
+        """等待解码进程退出（提前结束时终止），并删除共享内存"""
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+        if self._tasks is not None:
+            self._tasks.close()
+            self._tasks.cancel_join_thread()
+            self._tasks = None
@@ -0,0 +1,51 @@
+class SamplingPolicy:
+    """帧采样策略：决定哪些帧需要转换为图像交给调用方
+
+    未被采样的帧只解码不转换，省去颜色空间转换和数组拷贝。
+    解码器可能跳过部分帧（如不解码非参考帧），因此帧序号不一定连续。
+    """
+
+    # 是否只需要少量的帧，解码器据此决定能否跳过非参考帧
+    sparse = False
+
+    def want(self, frame_index):
+        """判断第frame_index帧（从0开始）是否需要"""
+        raise NotImplementedError
+
+    def reset(self):
+        """开始处理新视频前调用"""
+        pass
+
+
+class IntervalSampler(SamplingPolicy):
+    """每隔interval帧取一帧，与摄像头配置中的sample_interval语义一致
+
+    帧序号连续时取第 0, interval, 2*interval ... 帧；
+    目标帧被解码器跳过时，取越过目标位置后的第一帧。
+    """
+
+    def __init__(self, interval):
+        self.interval = max(1, int(interval))
+        self.sparse = self.interval > 1
+        self._next = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """根据摄像头配置创建"""
+        return cls(config['sample_interval'])
+
+    def want(self, frame_index):
+        if frame_index < self._next:
+            return False
+        self._next = (frame_index // self.interval + 1) * self.interval
+        return True
+
+    def reset(self):
+        self._next = 0
+
+
+class EveryFrameSampler(SamplingPolicy):
+    """取所有帧"""
+
+    def want(self, frame_index):
+        return True
@@ -0,0 +1,158 @@
+import cv2
+import numpy as np
+
+from ..deadline import heartbeat
+from ..metrics import Metrics
+from .sampling import EveryFrameSampler
+
+
+def scaled_size(width, height, target_width):
+    """按目标宽度等比缩放，返回偶数的 (宽, 高)，目标宽度为空或不小于原宽度时返回None"""
+    if not target_width or not width or target_width >= width:
+        return None
+    target_height = int(round(height * target_width / width / 2)) * 2
+    return int(target_width) // 2 * 2, max(2, target_height)
+
+
+class VideoDecoder:
+    """视频解码器基类
+
+    用法：
+        with create_decoder(path, IntervalSampler(15), options, pool) as decoder:
+            for frame_index, frame in decoder:
+                ...
+
+    产出的帧为BGR格式的ndarray。复用缓冲区时帧只在下一次迭代前有效，
+    需要保留时调用方自行 copy()，或以 reuse_buffer=False 创建解码器。
+    子类每解码一帧调用一次 heartbeat()，看门狗据此判断解码是否卡住。
+    """
+    backend = None
+
+    def __init__(self, path, sampler=None, pool=None, reuse_buffer=True, width=None):
+        """
+        Args:
+            path: 本地视频文件路径
+            sampler: SamplingPolicy，默认取所有帧
+            pool: FramePool，提供时从池中获取缓冲区，关闭时归还
+            reuse_buffer: 是否把所有采样帧写入同一块缓冲区
+            width: 输出帧宽度，按比例缩放，为空时保持原分辨率
+        """
+        self.path = path
+        self.sampler = sampler or EveryFrameSampler()
+        self.pool = pool
+        self.reuse_buffer = reuse_buffer
+        self.width = width
+        self.metrics = Metrics()
+        self.frames_decoded = 0
+        self.frames_retrieved = 0
+        self.buffers_allocated = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
+
+    def __iter__(self):
+        """逐个产出 (帧序号, 帧)，只包含采样策略需要的帧"""
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def release(self):
+        """释放解码器，记录解码统计"""
+        if self._closed:
+            return
+        self._closed = True
+        self._close()
+        self.metrics.inc('frames_decoded_total', self.frames_decoded)
+        self.metrics.inc('frame_buffers_allocated_total', self.buffers_allocated)
+
+
+class OpenCVDecoder(VideoDecoder):
+    """基于 cv2.VideoCapture 的解码器
+
+    所有帧都通过 grab() 解码，只有采样策略需要的帧才调用 retrieve() 转换为BGR图像，
+    并写入复用的输出缓冲区，整个视频只占用一块帧内存。缓冲区可来自共享的 FramePool，
+    多个视频之间也不再重复分配。指定宽度时在转换后缩放。
+    """
+    backend = 'opencv'
+
+    def __init__(self, path, sampler=None, pool=None, reuse_buffer=True, width=None):
+        super().__init__(path, sampler, pool, reuse_buffer, width)
+        self._buffer = None
+        self._scaled = None
+        self._scaled_size = None
+        self._cap = cv2.VideoCapture(path)
+
+    def is_opened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def _frame_shape(self):
+        width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        return (height, width, 3) if width and height else None
+
+    def _acquire(self, shape):
+        """获取输出缓冲区，分辨率未知时返回None，由OpenCV自行分配"""
+        if shape is None:
+            return None
+        if self.pool is not None:
+            return self.pool.acquire(shape, np.uint8)
+        self.buffers_allocated += 1
+        return np.empty(shape, dtype=np.uint8)
+
+    def __iter__(self):
+        metrics = self.metrics
+        cap = self._cap
+        self.sampler.reset()
+        frame_index = 0
+        while cap.isOpened():
+            with metrics.timer('decode_seconds'):
+                if not cap.grab():
+                    break
+                frame = None
+                if self.sampler.want(frame_index):
+                    if self.reuse_buffer and self._buffer is None:
+                        self._buffer = self._acquire(self._frame_shape())
+                    buffer = self._buffer if self.reuse_buffer else None
+                    ok, frame = cap.retrieve(buffer)
+                    if not ok:
+                        break
+                    if frame is not buffer:
+                        # 未提供缓冲区或分辨率变化时OpenCV会新分配数组
+                        self.buffers_allocated += 1
+                        if self.reuse_buffer:
+                            self._buffer = frame
+                    frame = self._scale(frame)
+            frame_index += 1
+            self.frames_decoded = frame_index
+            # 向看门狗报告进度，任务已被放弃时在此退出
+            heartbeat()
+            if frame is not None:
+                self.frames_retrieved += 1
+                yield frame_index - 1, frame
+
+    def _scale(self, frame):
+        size = scaled_size(frame.shape[1], frame.shape[0], self.width)
+        if size is None:
+            return frame
+        if not self.reuse_buffer:
+            self.buffers_allocated += 1
+            return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if self._scaled is None or self._scaled_size != size:
+            self._scaled = self._acquire((size[1], size[0], 3))
+            self._scaled_size = size
+        return cv2.resize(frame, size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+
+    def _close(self):
+        self._cap.release()
+        if self.pool is not None:
+            for buffer in (self._buffer, self._scaled):
+                if buffer is not None:
+                    self.pool.release(buffer)
+        self._buffer = None
+        self._scaled = None
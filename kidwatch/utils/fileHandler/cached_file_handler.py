@@ -0,0 +1,92 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .file_handler import FileHandler
+from ..cache import VideoCache
+
+
+class CachedFileHandler(FileHandler):
+    """给任意文件处理器加上本地视频缓存的装饰器
+
+    二进制读取先按 (路径, 大小, 修改时间) 查找本地缓存，未命中时由被装饰的处理器读取并写入缓存；
+    其余操作（列目录、stat、范围读取等）原样交给被装饰的处理器。SMB、本地挂载和基准测试用的
+    模拟后端都可以用同一个缓存。文件已在本地时 get_local_path 仍直接返回原路径，解码器就地读取。
+    """
+
+    def __init__(self, inner, cache):
+        """
+        Args:
+            inner: 被装饰的文件处理器
+            cache: VideoCache
+        """
+        self.inner = inner
+        self.cache = cache
+        self._io_executor = None
+
+    @classmethod
+    def wrap(cls, inner, config, root_path):
+        """按 video_cache 配置装饰文件处理器，未启用缓存时原样返回"""
+        cache = VideoCache.from_config(config, root_path)
+        return inner if cache is None else cls(inner, cache)
+
+    def __getattr__(self, name):
+        # 后端特有的属性和方法（如会话池、get_safe_connections_limit）交给被装饰的处理器；
+        # 拷贝或反序列化时 inner 尚未设置，不能再转发
+        if name == 'inner':
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def read(self, path, mode='rb'):
+        """读取文件内容，二进制模式下优先从本地缓存读取"""
+        if 'b' not in mode:
+            return self.inner.read(path, mode)
+        file_stat = self.inner.stat(path)
+        return self.cache.get_or_fetch(path, file_stat.size, file_stat.mtime,
+                                       lambda: self.inner.read(path, mode))
+
+    async def async_read(self, path, mode='rb'):
+        """异步读取文件内容，缓存的查找、单飞读取和落盘都是阻塞操作，整体放入线程池执行"""
+        if 'b' not in mode:
+            return await self.inner.async_read(path, mode)
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=self.inner.get_safe_connections_limit(),
+                                                   thread_name_prefix='cache-io')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, self.read, path, mode)
+
+    def list_video_files(self, path='', video_filter=None):
+        return self.inner.list_video_files(path, video_filter)
+
+    def iter_video_files(self, path='', video_filter=None):
+        return self.inner.iter_video_files(path, video_filter)
+
+    def count_video_files(self, path=''):
+        return self.inner.count_video_files(path)
+
+    def summarize_video_files(self, path=''):
+        return self.inner.summarize_video_files(path)
+
+    def list_files(self, path='', excludes=[]):
+        return self.inner.list_files(path, excludes)
+
+    def path_exists(self, path):
+        return self.inner.path_exists(path)
+
+    def bulk_video_counts(self, paths):
+        return self.inner.bulk_video_counts(paths)
+
+    def stat(self, path):
+        return self.inner.stat(path)
+
+    def read_range(self, path, offset, length):
+        return self.inner.read_range(path, offset, length)
+
+    def get_local_path(self, path):
+        return self.inner.get_local_path(path)
+
+    def abandon(self, thread):
+        self.inner.abandon(thread)
+
+    def for_subprocess(self):
+        # 缓存索引不能跨进程共享；返回None时子进程经工厂创建处理器，同样按配置启用缓存
+        return self.inner.for_subprocess()
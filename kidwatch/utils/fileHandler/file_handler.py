@@ -1,13 +1,63 @@
+import tempfile
 from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import contextmanager
+
+# 文件元信息：大小(字节)和修改时间(时间戳)
+FileStat = namedtuple('FileStat', ['size', 'mtime'])
+# 目录汇总信息：视频文件数和总字节数
+DirSummary = namedtuple('DirSummary', ['file_count', 'total_bytes'])
+
+
+def group_paths_by_parent(paths):
+    """按父目录分组路径，返回 {父目录: [(路径, 名称), ...]}"""
+    groups = {}
+    for path in paths:
+        parent, _, name = path.rpartition('/')
+        groups.setdefault(parent, []).append((path, name))
+    return groups
+
+
+@contextmanager
+def local_video_file(file_handler, video_path, spool_dir=None):
+    """返回可交给解码器的本地路径，远程文件读取到暂存目录后使用完即删除
+
+    Args:
+        file_handler: 文件处理器
+        video_path: 视频路径
+        spool_dir: 暂存目录，默认使用系统临时目录
+    """
+    local_path = file_handler.get_local_path(video_path)
+    if local_path:
+        yield local_path
+        return
+    with tempfile.NamedTemporaryFile(suffix='.mp4', dir=spool_dir) as temp_file:
+        temp_file.write(file_handler.read(video_path))
+        temp_file.flush()
+        yield temp_file.name
 
 
 class FileHandler(ABC):
 
     # 列出目录及子目录下的所有video文件
+    # video_filter 为 VideoFilter 时，遍历过程中按目录名和文件名中的时间剪枝
     @abstractmethod
-    def list_video_files(self, path=''):
+    def list_video_files(self, path='', video_filter=None):
         pass
 
+    # 流式遍历目录及子目录下的video文件，逐个返回路径，同一目录内按名称排序
+    def iter_video_files(self, path='', video_filter=None):
+        yield from sorted(self.list_video_files(path, video_filter))
+
+    # 统计目录及子目录下的video文件数，只计数不构建路径列表
+    def count_video_files(self, path=''):
+        return len(self.list_video_files(path))
+
+    # 统计目录及子目录下的video文件数和总大小，返回DirSummary
+    def summarize_video_files(self, path=''):
+        files = self.list_video_files(path)
+        return DirSummary(len(files), sum(self.stat(file).size for file in files))
+
     # 列出目录下的所有文件，不包括子目录
     @abstractmethod
     def list_files(self, path='', excludes=[]):
@@ -21,6 +71,43 @@ class FileHandler(ABC):
     def path_exists(self, path):
         pass
 
+    # 批量查询多个目录是否存在及其中的视频文件数，每个父目录只列出一次
+    # 返回 {路径: 视频文件数}，不存在的目录值为None
+    def bulk_video_counts(self, paths):
+        counts = {}
+        for parent, items in group_paths_by_parent(paths).items():
+            try:
+                existing = set(self.list_files(parent))
+            except Exception:
+                existing = set()
+            for path, name in items:
+                counts[path] = self.count_video_files(path) if name in existing else None
+        return counts
+
+    # 获取文件大小和修改时间，返回FileStat
+    @abstractmethod
+    def stat(self, path):
+        pass
+
+    # 读取文件中从offset开始的最多length字节，用于只需文件头尾（如MP4元数据）的场景
+    # 默认读取整个文件后截取，后端应覆盖为真正的范围读取
+    def read_range(self, path, offset, length):
+        return self.read(path)[offset:offset + length]
+
+    # 文件已在本地文件系统时返回可直接交给解码器的路径，否则返回None
+    def get_local_path(self, path):
+        return None
+
+    # 看门狗放弃卡住的任务时调用：只放弃该线程正在使用的远程文件句柄，不影响其他线程的读取；
+    # 任务卡在解码等本地操作上时没有打开的句柄，不做任何事。本地后端无需处理
+    def abandon(self, thread):
+        pass
+
+    # 多进程解码时交给子进程使用的文件处理器，须可pickle；
+    # 返回None时子进程按配置自行创建（各自建立NAS连接，不共用父进程的连接状态）
+    def for_subprocess(self):
+        return None
+
     @abstractmethod
     async def async_read(self, path, mode='rb'):
         """异步读取文件内容
@@ -1,4 +1,3 @@
-from .smb_file_handler import SmbFileHandler
 from ..config_reader import ConfigReader
 
 
@@ -6,9 +5,29 @@ class FileHandlerFactory:
     def __init__(self):
         self.config_reader = ConfigReader()
 
+    # 各后端装饰后的处理器，同一进程中共用一个缓存索引
+    _handlers = {}
+
+    @classmethod
+    def get_file_handler(cls, method):
+        handler = cls._handlers.get(method)
+        if handler is None:
+            handler = cls._handlers[method] = cls._create_file_handler(method)
+        return handler
+
     @staticmethod
-    def get_file_handler(method):
+    def _create_file_handler(method):
+        # 按需导入后端，未使用的后端（如smbclient）不会在启动时加载
         if method == 'smb':
-            return SmbFileHandler()
+            from .smb_file_handler import SmbFileHandler
+            handler = SmbFileHandler()
+        elif method == 'local':
+            from .local_file_handler import LocalFileHandler
+            handler = LocalFileHandler()
         else:
-            raise ValueError(f"Unsupported method: {method}")
\ No newline at end of file
+            raise ValueError(f"Unsupported method: {method}")
+        # 启用video_cache时给后端加上本地视频缓存
+        from .cached_file_handler import CachedFileHandler
+        config_reader = ConfigReader()
+        return CachedFileHandler.wrap(handler, config_reader.get_config('video_cache'),
+                                      config_reader.get_root_path())
\ No newline at end of file
@@ -0,0 +1,185 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .file_handler import FileHandler, FileStat, DirSummary
+from ..config_reader import ConfigReader
+from ..metrics import Metrics
+
+
+class LocalFileHandler(FileHandler):
+    """本地文件系统后端，用于NAS已通过CIFS/NFS挂载到本机的场景
+
+    直接使用 os.scandir 遍历目录，并可将本地路径直接交给解码器，
+    省去下载和临时文件拷贝。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(LocalFileHandler, cls).__new__(cls, *args, **kwargs)
+            cls._instance._initialize(*args, **kwargs)
+        return cls._instance
+
+    def _initialize(self):
+        # 配置文件中只写了 local: 而没有子项时值为None
+        self.config = ConfigReader().get_config('local') or {}
+        self._root = self.config.get('root') or '/'
+        self._max_workers = self.config.get('max_workers') or (os.cpu_count() or 4)
+        self._io_executor = None
+        self.metrics = Metrics()
+
+    def _get_full_path(self, path):
+        """构建完整的本地路径"""
+        return os.path.join(self._root, path.lstrip('/'))
+
+    def get_local_path(self, path):
+        """文件已在本地，直接返回完整路径"""
+        return self._get_full_path(path)
+
+    def list_video_files(self, path='', video_filter=None):
+        """列出目录及子目录下的所有video文件，video_filter不为None时按时间剪枝"""
+        try:
+            return self._list_video_files(path, video_filter)
+        except Exception as e:
+            print(f"列出视频文件失败: {str(e)}")
+            raise
+
+    def _list_video_files(self, path, video_filter=None):
+        """内部方法：递归列出视频文件"""
+        file_list = []
+        try:
+            with os.scandir(self._get_full_path(path)) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or entry.name.startswith('@'):
+                        continue
+                    if entry.is_dir():
+                        if video_filter is None or video_filter.accept_dir(entry.name):
+                            file_list.extend(self._list_video_files(f"{path}/{entry.name}", video_filter))
+                    elif entry.name.endswith('.mp4'):
+                        if video_filter is None or video_filter.accept_file(entry.name):
+                            file_list.append(f"{path}/{entry.name}")
+        except OSError as e:
+            print(f"列出视频文件失败 {path}: {str(e)}")
+        return file_list
+
+    def iter_video_files(self, path='', video_filter=None):
+        """流式遍历目录及子目录下的video文件，同一目录内按名称排序"""
+        try:
+            with os.scandir(self._get_full_path(path)) as scanned:
+                entries = sorted((entry.name, entry.is_dir()) for entry in scanned)
+        except OSError as e:
+            print(f"列出视频文件失败 {path}: {str(e)}")
+            return
+        for name, is_dir in entries:
+            if name.startswith('.') or name.startswith('@'):
+                continue
+            if is_dir:
+                if video_filter is None or video_filter.accept_dir(name):
+                    yield from self.iter_video_files(f"{path}/{name}", video_filter)
+            elif name.endswith('.mp4'):
+                if video_filter is None or video_filter.accept_file(name):
+                    yield f"{path}/{name}"
+
+    def count_video_files(self, path=''):
+        """统计目录及子目录下的video文件数，只计数不构建路径列表"""
+        return self._count_video_files(self._get_full_path(path))
+
+    def _count_video_files(self, full_path):
+        """内部方法：递归统计视频文件数"""
+        count = 0
+        try:
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or entry.name.startswith('@'):
+                        continue
+                    if entry.is_dir():
+                        count += self._count_video_files(entry.path)
+                    elif entry.name.endswith('.mp4'):
+                        count += 1
+        except OSError as e:
+            print(f"统计视频文件失败 {full_path}: {str(e)}")
+        return count
+
+    def summarize_video_files(self, path=''):
+        """统计目录及子目录下的video文件数和总大小"""
+        return DirSummary(*self._summarize_video_files(self._get_full_path(path)))
+
+    def _summarize_video_files(self, full_path):
+        """内部方法：递归统计视频文件数和总大小"""
+        count = 0
+        total_bytes = 0
+        try:
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or entry.name.startswith('@'):
+                        continue
+                    if entry.is_dir():
+                        sub_count, sub_bytes = self._summarize_video_files(entry.path)
+                        count += sub_count
+                        total_bytes += sub_bytes
+                    elif entry.name.endswith('.mp4'):
+                        count += 1
+                        total_bytes += entry.stat().st_size
+        except OSError as e:
+            print(f"统计视频文件失败 {full_path}: {str(e)}")
+        return count, total_bytes
+
+    def list_files(self, path='', excludes=[]):
+        """列出目录下的所有文件，不包括子目录"""
+        try:
+            with os.scandir(self._get_full_path(path)) as entries:
+                return [entry.name for entry in entries if entry.name not in excludes]
+        except Exception as e:
+            print(f"列出文件失败: {str(e)}")
+            raise
+
+    def read(self, path, mode='rb'):
+        """读取文件内容，二进制模式下返回bytes
+
+        整个文件一次读入内存；解码器应优先使用 get_local_path 就地读取，只需部分内容时使用 read_range。
+        """
+        full_path = self._get_full_path(path)
+        if 'b' not in mode:
+            with open(full_path, mode, encoding='utf-8') as file:
+                return file.read()
+        with self.metrics.timer('local_read_seconds'), open(full_path, 'rb') as file:
+            data = file.read()
+        self.metrics.inc('local_read_bytes_total', len(data))
+        return data
+
+    def read_range(self, path, offset, length):
+        """读取文件中从offset开始的最多length字节，只读取该范围"""
+        with open(self._get_full_path(path), 'rb') as file:
+            file.seek(offset)
+            data = file.read(length)
+        self.metrics.inc('local_read_bytes_total', len(data))
+        return data
+
+    def path_exists(self, path):
+        """检查路径是否存在"""
+        return os.path.exists(self._get_full_path(path))
+
+    def stat(self, path):
+        """获取文件大小和修改时间"""
+        result = os.stat(self._get_full_path(path))
+        return FileStat(result.st_size, result.st_mtime)
+
+    def get_safe_connections_limit(self):
+        """本地文件系统没有会话限制，返回配置的并发数"""
+        return self._max_workers
+
+    async def async_read(self, path, mode='rb'):
+        """异步读取文件内容
+
+        Args:
+            path: 文件路径
+            mode: 读取模式，默认为'rb'
+        Returns:
+            bytes: 文件内容
+        """
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                   thread_name_prefix='local-io')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, self.read, path, mode)
@@ -2,15 +2,19 @@ import itertools
 from abc import ABC
 import smbclient
 from smbprotocol.exceptions import SMBException
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
 from ..smb.smb_session_pool import SMBSessionPool
+import threading
 import time
 from threading import Lock
 import random
 import asyncio
 
-from .file_handler import FileHandler
+from .file_handler import FileHandler, FileStat, DirSummary, group_paths_by_parent
 from ..config_reader import ConfigReader
+from ..deadline import DeadlineExceeded, TimeoutCaller, heartbeat
+from ..metrics import Metrics
 
 
 class AsyncLock:
@@ -26,6 +30,42 @@ class AsyncLock:
         self._lock.release()
 
 
+class PathLockRegistry:
+    """按路径分配的锁注册表
+
+    每个路径的锁带引用计数，最后一个使用者释放后即从字典中移除，
+    避免长时间运行后锁字典无限增长。
+    """
+    def __init__(self, lock_factory):
+        self._lock_factory = lock_factory
+        self._locks = {}  # path -> [lock, 引用计数]
+        self._guard = Lock()
+
+    def acquire_ref(self, path):
+        """获取路径对应的锁并增加引用计数"""
+        with self._guard:
+            entry = self._locks.get(path)
+            if entry is None:
+                entry = [self._lock_factory(), 0]
+                self._locks[path] = entry
+            entry[1] += 1
+            return entry[0]
+
+    def release_ref(self, path):
+        """减少引用计数，计数归零时回收该路径的锁"""
+        with self._guard:
+            entry = self._locks.get(path)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._locks[path]
+
+    def __len__(self):
+        with self._guard:
+            return len(self._locks)
+
+
 class SmbFileHandler(FileHandler, ABC):
     _instance = None
     _is_registered = None
@@ -34,10 +74,10 @@ class SmbFileHandler(FileHandler, ABC):
     _shared_folder = None
     _username = None
     _password = None
-    file_locks = {}  # 用于存储文件锁
-    locks_lock = Lock()  # 用于保护file_locks字典的锁
-    async_file_locks = {}  # 用于存储异步文件锁
-    async_locks_lock = Lock()  # 用于保护async_file_locks字典的锁
+    file_locks = PathLockRegistry(Lock)  # 用于存储文件锁
+    async_file_locks = PathLockRegistry(AsyncLock)  # 用于存储异步文件锁
+    _io_executor = None  # 异步读取专用的线程池
+    _io_executor_lock = Lock()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -52,40 +92,147 @@ class SmbFileHandler(FileHandler, ABC):
         self._shared_folder = self.config.get('shared_folder')
         self._username = self.config.get('username')
         self._password = self.config.get('password')
-        self.session_pool = SMBSessionPool(
-            host=self.config.get('host'),
-            username=self.config.get('username'),
-            password=self.config.get('password'),
-            port=self.config.get('port'),
-            max_sessions=self.config.get('max_sessions', 10)
-        )
+        # 会话池在首次访问NAS时才创建（会建立SMB会话并启动心跳线程）
+        self._session_pool = None
+        self._session_pool_lock = Lock()
+        self.metrics = Metrics()
+        # 单次SMB操作（打开、读取一块、stat、列目录）的期限，为空则不限制
+        self.op_timeout = self.config.get('op_timeout')
+        # 带期限的SMB调用在少量复用的线程中执行，超时未返回的调用数有上限
+        self._caller = TimeoutCaller(max_abandoned=self.config.get('max_abandoned_ops', 8), name='smb-call')
+        self.read_chunk_size = int(self.config.get('read_chunk_mb', 4) * 1024 * 1024)
+        # 各线程正在读取的文件句柄，看门狗放弃某个任务时只关闭该任务线程的句柄
+        self._open_files = {}
+        self._open_files_lock = Lock()
+
+    @property
+    def session_pool(self):
+        """懒加载SMB会话池"""
+        if self._session_pool is None:
+            with self._session_pool_lock:
+                if self._session_pool is None:
+                    self._session_pool = SMBSessionPool(
+                        host=self.config.get('host'),
+                        username=self.config.get('username'),
+                        password=self.config.get('password'),
+                        port=self.config.get('port'),
+                        max_sessions=self.config.get('max_sessions', 10)
+                    )
+        return self._session_pool
 
     def _get_full_path(self, path):
         """构建完整的SMB路径"""
         return f"{self._host}/{self._shared_folder}/{path}"
 
-    def _get_file_lock(self, path):
-        """获取指定路径的文件锁"""
-        with self.locks_lock:
-            if path not in self.file_locks:
-                self.file_locks[path] = Lock()
-            return self.file_locks[path]
-
-    def _get_async_file_lock(self, path):
-        """获取指定路径的异步文件锁"""
-        with self.async_locks_lock:
-            if path not in self.async_file_locks:
-                self.async_file_locks[path] = AsyncLock()
-            return self.async_file_locks[path]
-
-    def list_video_files(self, path=''):
-        """列出目录及子目录下的所有video文件"""
+    def _call(self, func, *args, **kwargs):
+        """在单次操作期限内执行阻塞的SMB调用，超时时放弃该调用并抛出DeadlineExceeded
+
+        只放弃卡住的这一次调用（及其文件句柄，见 _open_remote_file），
+        不重建同一主机上所有会话共用的连接，其他线程的读取继续进行。
+        """
+        try:
+            return self._caller.call(self.op_timeout, func, *args, **kwargs)
+        except DeadlineExceeded:
+            self.metrics.inc('smb_op_timeouts_total')
+            print(f"SMB操作超过 {self.op_timeout}s 未完成，放弃该操作")
+            raise
+
+    def _scandir(self, full_path):
+        """在操作期限内列出目录，返回目录项列表"""
+        return self._call(lambda: list(smbclient.scandir(full_path, port=self._port)))
+
+    @contextmanager
+    def _open_remote_file(self, path, mode):
+        """打开NAS上的文件并登记到当前线程，读取超时或被看门狗放弃时在后台关闭句柄"""
+        file = self._call(smbclient.open_file, self._get_full_path(path), mode=mode, port=self._port)
+        thread_id = threading.get_ident()
+        with self._open_files_lock:
+            self._open_files[thread_id] = file
+        timed_out = False
+        try:
+            yield file
+        except DeadlineExceeded:
+            timed_out = True
+            raise
+        finally:
+            with self._open_files_lock:
+                # 已被 abandon() 取走时句柄由其负责关闭
+                owned = self._open_files.get(thread_id) is file
+                if owned:
+                    del self._open_files[thread_id]
+            if owned:
+                if timed_out:
+                    self._abandon_file(file)
+                else:
+                    self._close_file(file)
+
+    def abandon(self, thread):
+        """放弃看门狗放弃的任务线程正在读取的文件句柄，其他线程的连接和读取不受影响"""
+        with self._open_files_lock:
+            file = self._open_files.pop(thread.ident, None)
+        if file is not None:
+            self.metrics.inc('smb_abandoned_files_total')
+            self._abandon_file(file)
+
+    def _abandon_file(self, file):
+        """在后台线程中关闭卡住的文件句柄，关闭本身也可能等待，不占用调用方线程"""
+        threading.Thread(target=self._close_file, args=(file,), name='smb-abandon', daemon=True).start()
+
+    @contextmanager
+    def _file_lock(self, path):
+        """持有指定路径的文件锁，释放后自动回收"""
+        lock = self.file_locks.acquire_ref(path)
+        try:
+            with lock:
+                yield
+        finally:
+            self.file_locks.release_ref(path)
+
+    @asynccontextmanager
+    async def _async_file_lock(self, path):
+        """持有指定路径的异步文件锁，释放后自动回收"""
+        lock = self.async_file_locks.acquire_ref(path)
+        try:
+            async with lock:
+                yield
+        finally:
+            self.async_file_locks.release_ref(path)
+
+    def get_io_executor(self):
+        """获取异步读取专用的线程池
+
+        线程数默认等于会话池上限（可通过 io_workers 配置覆盖），
+        保证异步模式的并发度只受会话池和 max_workers 限制，
+        而不是受事件循环默认线程池大小的限制。
+        """
+        with self._io_executor_lock:
+            if self._io_executor is None:
+                io_workers = self.config.get('io_workers') or self.config.get('max_sessions', 10)
+                self._io_executor = ThreadPoolExecutor(max_workers=max(1, io_workers),
+                                                       thread_name_prefix='smb-io')
+            return self._io_executor
+
+    def shutdown(self):
+        """关闭异步读取线程池"""
+        with self._io_executor_lock:
+            if self._io_executor is not None:
+                self._io_executor.shutdown(wait=False)
+                self._io_executor = None
+
+    def list_video_files(self, path='', video_filter=None):
+        """列出目录及子目录下的所有video文件
+
+        Args:
+            path: 要遍历的路径
+            video_filter: VideoFilter，遍历时跳过不满足时间条件的目录和文件
+        """
         session = None
         try:
             session = self.session_pool.get_session()
             # 添加随机延迟
             time.sleep(random.uniform(0.1, 0.3))
-            return self._list_video_files(path)
+            with self.metrics.timer('smb_list_seconds'):
+                return self._list_video_files(path, video_filter)
         except Exception as e:
             print(f"列出视频文件失败: {str(e)}")
             raise
@@ -93,6 +240,61 @@ class SmbFileHandler(FileHandler, ABC):
             if session:
                 self.session_pool.return_session(session)
 
+    def iter_video_files(self, path='', video_filter=None):
+        """流式遍历目录及子目录下的video文件
+
+        逐个目录列出并立即返回其中的视频路径，不在内存中累积整个目录树的列表。
+        同一目录内按名称排序，保证多次遍历顺序一致。
+        """
+        session = None
+        try:
+            session = self.session_pool.get_session()
+            yield from self._iter_video_files(path, video_filter)
+        finally:
+            if session:
+                self.session_pool.return_session(session)
+
+    def _iter_video_files(self, path, video_filter=None):
+        """内部方法：递归流式遍历视频文件"""
+        self.metrics.inc('smb_scandir_total')
+        try:
+            entries = sorted(((entry.name, entry.is_dir()) for entry in
+                              self._scandir(self._get_full_path(path))))
+        except Exception as e:
+            print(f"列出视频文件失败 {path}: {str(e)}")
+            return
+        for name, is_dir in entries:
+            if name.startswith('.') or name.startswith('@'):
+                continue
+            if is_dir:
+                if video_filter is None or video_filter.accept_dir(name):
+                    yield from self._iter_video_files(f"{path}/{name}", video_filter)
+            elif name.endswith('.mp4'):
+                if video_filter is None or video_filter.accept_file(name):
+                    yield f"{path}/{name}"
+
+    def count_video_files(self, path=''):
+        """统计目录及子目录下的video文件数，流式遍历目录项，不构建路径列表"""
+        session = None
+        try:
+            session = self.session_pool.get_session()
+            with self.metrics.timer('smb_list_seconds'):
+                return self._count_video_files(self._get_full_path(path))
+        finally:
+            if session:
+                self.session_pool.return_session(session)
+
+    def summarize_video_files(self, path=''):
+        """统计目录及子目录下的video文件数和总大小，大小取自目录项信息，无需额外stat"""
+        session = None
+        try:
+            session = self.session_pool.get_session()
+            with self.metrics.timer('smb_list_seconds'):
+                return DirSummary(*self._summarize_video_files(self._get_full_path(path)))
+        finally:
+            if session:
+                self.session_pool.return_session(session)
+
     def list_files(self, path='', excludes=[]):
         """列出目录下的所有文件，不包括子目录"""
         session = None
@@ -100,13 +302,15 @@ class SmbFileHandler(FileHandler, ABC):
             session = self.session_pool.get_session()
             # 添加随机延迟
             time.sleep(random.uniform(0.1, 0.3))
-            files = smbclient.scandir(self._get_full_path(path), port=self._port)
-            file_list = []
-            for file in files:
-                if file.name in excludes:
-                    continue
-                file_list.append(file.name)
-            return file_list
+            with self.metrics.timer('smb_list_seconds'):
+                self.metrics.inc('smb_scandir_total')
+                files = self._scandir(self._get_full_path(path))
+                file_list = []
+                for file in files:
+                    if file.name in excludes:
+                        continue
+                    file_list.append(file.name)
+                return file_list
         except Exception as e:
             print(f"列出文件失败: {str(e)}")
             raise
@@ -117,22 +321,20 @@ class SmbFileHandler(FileHandler, ABC):
     def read(self, path, mode='rb'):
         """读取文件内容"""
         session = None
-        file_lock = self._get_file_lock(path)  # 获取该文件的锁
         
         try:
             session = self.session_pool.get_session()
-            with file_lock:  # 使用文件锁
+            with self._file_lock(path):  # 使用文件锁
                 # 增加重试机制
                 for attempt in range(3):  # 最多重试3次
                     try:
                         # 添加随机延迟，避免多个线程同时请求
                         time.sleep(random.uniform(0.1, 0.5))
-                        with smbclient.open_file(self._get_full_path(path), mode=mode, port=self._port) as file:
-                            data = file.read()
-                            return data
+                        return self._sync_read_file(path, mode)
                     except Exception as e:
                         if attempt == 2:  # 最后一次尝试
                             raise
+                        self.metrics.inc('smb_read_retries_total')
                         # print(f"读取文件失败，尝试重试 ({attempt + 2}/3): {str(e)}")
                         time.sleep(random.uniform(1, 2))  # 随机等待1-2秒后重试
         except Exception as e:
@@ -142,12 +344,29 @@ class SmbFileHandler(FileHandler, ABC):
             if session:
                 self.session_pool.return_session(session)
 
+    def read_range(self, path, offset, length):
+        """读取文件中从offset开始的最多length字节，不经过视频缓存"""
+        session = None
+        try:
+            session = self.session_pool.get_session()
+            with self.metrics.timer('smb_read_seconds'):
+                with self._open_remote_file(path, 'rb') as file:
+                    file.seek(offset)
+                    data = self._call(file.read, length)
+            self.metrics.inc('smb_read_total')
+            self.metrics.inc('smb_read_bytes_total', len(data))
+            return data
+        finally:
+            if session:
+                self.session_pool.return_session(session)
+
     def path_exists(self, path):
         """检查路径是否存在"""
         session = None
         try:
             session = self.session_pool.get_session()
-            smbclient.stat(self._get_full_path(path), port=self._port)
+            with self.metrics.timer('smb_stat_seconds'):
+                self._call(smbclient.stat, self._get_full_path(path), port=self._port)
             return True
         except Exception as e:
             return False
@@ -155,62 +374,159 @@ class SmbFileHandler(FileHandler, ABC):
             if session:
                 self.session_pool.return_session(session)
 
-    def _list_video_files(self, path):
+    def bulk_video_counts(self, paths):
+        """批量查询多个目录是否存在及其中的视频文件数
+
+        整批查询只租用一次会话，每个父目录只做一次scandir，
+        代替逐个路径调用 path_exists 的多次stat往返。
+
+        Args:
+            paths: 目录路径列表
+        Returns:
+            dict: {路径: 视频文件数}，不存在的目录值为None
+        """
+        session = None
+        try:
+            session = self.session_pool.get_session()
+            with self.metrics.timer('smb_list_seconds'):
+                return self._bulk_video_counts(paths)
+        finally:
+            if session:
+                self.session_pool.return_session(session)
+
+    def _bulk_video_counts(self, paths):
+        """内部方法：在已租用的会话中批量统计"""
+        counts = {}
+        for parent, items in group_paths_by_parent(paths).items():
+            self.metrics.inc('smb_scandir_total')
+            try:
+                existing = {entry.name for entry in self._scandir(self._get_full_path(parent))}
+            except Exception:
+                existing = set()
+            for path, name in items:
+                counts[path] = self._count_video_files(self._get_full_path(path)) if name in existing else None
+        return counts
+
+    def stat(self, path):
+        """获取文件大小和修改时间"""
+        session = None
+        try:
+            session = self.session_pool.get_session()
+            with self.metrics.timer('smb_stat_seconds'):
+                result = self._call(smbclient.stat, self._get_full_path(path), port=self._port)
+            return FileStat(result.st_size, result.st_mtime)
+        finally:
+            if session:
+                self.session_pool.return_session(session)
+
+    def _list_video_files(self, path, video_filter=None):
         """内部方法：递归列出视频文件
         
         Args:
             path: 要遍历的路径
+            video_filter: VideoFilter，为None时不过滤
         """
+        self.metrics.inc('smb_scandir_total')
         try:
-            files = smbclient.scandir(self._get_full_path(path), port=self._port)
+            files = self._scandir(self._get_full_path(path))
             file_list = []
             for file in files:
                 if file.name.startswith('.') or file.name.startswith('@'):
                     continue
                 if file.is_dir():
-                    sub_file_list = self._list_video_files(f"{path}/{file.name}")
+                    if video_filter is not None and not video_filter.accept_dir(file.name):
+                        continue
+                    sub_file_list = self._list_video_files(f"{path}/{file.name}", video_filter)
                     file_list = list(itertools.chain(file_list, sub_file_list))
                 else:
                     if file.name.endswith('.mp4'):
+                        if video_filter is not None and not video_filter.accept_file(file.name):
+                            continue
                         file_list.append(f"{path}/{file.name}")
             return file_list
         except Exception as e:
             print(f"列出视频文件失败 {path}: {str(e)}")
             return []
         
+    def _count_video_files(self, full_path):
+        """内部方法：递归统计视频文件数
+
+        Args:
+            full_path: 完整的SMB路径
+        """
+        count = 0
+        self.metrics.inc('smb_scandir_total')
+        try:
+            for entry in self._scandir(full_path):
+                name = entry.name
+                if name.startswith('.') or name.startswith('@'):
+                    continue
+                if entry.is_dir():
+                    count += self._count_video_files(f"{full_path}/{name}")
+                elif name.endswith('.mp4'):
+                    count += 1
+        except Exception as e:
+            print(f"统计视频文件失败 {full_path}: {str(e)}")
+        return count
+
+    def _summarize_video_files(self, full_path):
+        """内部方法：递归统计视频文件数和总大小
+
+        Args:
+            full_path: 完整的SMB路径
+        Returns:
+            tuple: (文件数, 总字节数)
+        """
+        count = 0
+        total_bytes = 0
+        self.metrics.inc('smb_scandir_total')
+        try:
+            for entry in self._scandir(full_path):
+                name = entry.name
+                if name.startswith('.') or name.startswith('@'):
+                    continue
+                if entry.is_dir():
+                    sub_count, sub_bytes = self._summarize_video_files(f"{full_path}/{name}")
+                    count += sub_count
+                    total_bytes += sub_bytes
+                elif name.endswith('.mp4'):
+                    count += 1
+                    total_bytes += entry.stat().st_size
+        except Exception as e:
+            print(f"统计视频文件失败 {full_path}: {str(e)}")
+        return count, total_bytes
+
     def get_safe_connections_limit(self):
-        """获取安全的并发限制数"""
-        return self.session_pool.get_safe_sessions_limit()
+        """获取安全的并发限制数，只读取配置，不会触发会话池创建"""
+        return SMBSessionPool.safe_sessions_limit(self.config.get('max_sessions', 10))
 
     async def async_read(self, path, mode='rb'):
         """异步读取文件内容
         
+        会话租用和阻塞读取都在专用线程池中执行，不会阻塞事件循环。
+        
         Args:
             path: 文件路径
             mode: 读取模式，默认为'rb'
         Returns:
             bytes: 文件内容
         """
-        session = None
-        file_lock = self._get_async_file_lock(path)  # 获取该文件的异步锁
+        loop = asyncio.get_running_loop()
+        executor = self.get_io_executor()
         
         try:
-            session = self.session_pool.get_session()
-            async with file_lock:  # 使用异步文件锁
+            async with self._async_file_lock(path):  # 使用异步文件锁
                 # 增加重试机制
                 for attempt in range(3):  # 最多重试3次
                     try:
-                        # 添加随机延迟，避免多个线程同时请求
+                        # 添加随机延迟，避免多个协程同时请求
                         await asyncio.sleep(random.uniform(0.1, 0.5))
-                        # 使用事件循环执行同步操作
-                        loop = asyncio.get_event_loop()
-                        data = await loop.run_in_executor(
-                            None,
-                            self._sync_read_file,
+                        return await loop.run_in_executor(
+                            executor,
+                            self._leased_read_file,
                             path,
                             mode
                         )
-                        return data
                     except Exception as e:
                         if attempt == 2:  # 最后一次尝试
                             raise
@@ -218,18 +534,51 @@ class SmbFileHandler(FileHandler, ABC):
         except Exception as e:
             print(f"异步读取文件失败: {str(e)}")
             raise
+
+    def _leased_read_file(self, path, mode):
+        """租用会话后同步读取文件，供线程池调用
+        
+        Args:
+            path: 文件路径
+            mode: 读取模式
+        Returns:
+            bytes: 文件内容
+        """
+        session = self.session_pool.get_session()
+        try:
+            return self._sync_read_file(path, mode)
         finally:
-            if session:
-                self.session_pool.return_session(session)
+            self.session_pool.return_session(session)
 
     def _sync_read_file(self, path, mode):
         """同步读取文件的内部方法
-        
+
+        分块读取，每块都有单独的期限，并向看门狗报告进度，
+        大文件读取得慢但仍在推进时不会被误判为卡住。
+
         Args:
             path: 文件路径
             mode: 读取模式
         Returns:
             bytes: 文件内容
         """
-        with smbclient.open_file(self._get_full_path(path), mode=mode, port=self._port) as file:
-            return file.read()
+        with self.metrics.timer('smb_read_seconds'):
+            with self._open_remote_file(path, mode) as file:
+                chunks = []
+                while True:
+                    chunk = self._call(file.read, self.read_chunk_size)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    heartbeat()
+                data = (b'' if 'b' in mode else '').join(chunks)
+        self.metrics.inc('smb_read_total')
+        self.metrics.inc('smb_read_bytes_total', len(data))
+        return data
+
+    def _close_file(self, file):
+        """在操作期限内关闭文件，连接已断开时忽略关闭失败"""
+        try:
+            self._call(file.close)
+        except Exception:
+            pass
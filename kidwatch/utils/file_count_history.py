@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import statistics
+from datetime import datetime
+from threading import Lock
+
+from .fileHandler.file_handler import DirSummary
+
+
+class FileCountHistory:
+    """摄像头每日文件数历史记录
+
+    以SQLite保存每个摄像头每天的视频文件数和总大小，
+    已记录的日期无需再次扫描NAS，最近有文件日期的查找也变为索引查询。
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_counts (
+                    camera TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    file_count INTEGER NOT NULL,
+                    total_bytes INTEGER NOT NULL,
+                    checked_at TEXT NOT NULL,
+                    PRIMARY KEY (camera, date)
+                )
+            """)
+
+    def get(self, camera, date_str):
+        """获取某摄像头某天的记录，未记录返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_count, total_bytes FROM daily_counts WHERE camera = ? AND date = ?",
+                (camera, date_str)).fetchone()
+        return DirSummary(*row) if row else None
+
+    def record(self, camera, date_str, summary):
+        """记录（或覆盖）某摄像头某天的文件数和总大小"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO daily_counts VALUES (?, ?, ?, ?, ?)",
+                (camera, date_str, summary.file_count, summary.total_bytes,
+                 datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def last_date_with_files(self, camera, earliest_str, latest_str):
+        """查询日期区间内最近一次有文件的记录
+
+        Returns:
+            tuple: (日期字符串, 文件数)，没有记录时返回 (None, 0)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT date, file_count FROM daily_counts "
+                "WHERE camera = ? AND date BETWEEN ? AND ? AND file_count > 0 "
+                "ORDER BY date DESC LIMIT 1",
+                (camera, earliest_str, latest_str)).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def rolling_median(self, camera, before_str, window=7):
+        """计算某日期之前最近window个有文件日期的文件数中位数，没有记录时返回None"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_count FROM daily_counts "
+                "WHERE camera = ? AND date < ? AND file_count > 0 "
+                "ORDER BY date DESC LIMIT ?",
+                (camera, before_str, window)).fetchall()
+        if not rows:
+            return None
+        return statistics.median(row[0] for row in rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .metrics import Metrics
+
+# 每个视频的帧目录中的清单文件，抽帧成功后写入，记录来源视频和抽帧间隔
+MANIFEST_NAME = 'video.json'
+_FRAME_PATTERN = re.compile(r'^frame_(\d+)\.jpg$')
+
+# 已抽取帧的视频：来源视频路径、摄像头类型、抽帧间隔、帧目录
+FrameDirectory = namedtuple('FrameDirectory', ['video_path', 'camera_type', 'sample_interval', 'frame_dir'])
+
+
+def write_manifest(frame_dir, video_path, camera_type, sample_interval, frame_count):
+    """抽帧完成后写入清单，先写临时文件再替换，中途失败的目录不会被当作完整结果"""
+    manifest = {
+        'video_path': video_path,
+        'camera_type': camera_type,
+        'sample_interval': sample_interval,
+        'frame_count': frame_count,
+    }
+    path = os.path.join(frame_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def scan_frame_directories(root):
+    """列出抽帧输出目录下带清单的视频帧目录
+
+    Args:
+        root: 抽帧输出目录（video_frames.frames_path）
+    Returns:
+        tuple: ([FrameDirectory, ...], 缺少清单的目录数)
+    """
+    directories = []
+    missing = 0
+    if not os.path.isdir(root):
+        return directories, missing
+    with os.scandir(root) as entries:
+        for entry in sorted(entries, key=lambda item: item.name):
+            if not entry.is_dir():
+                continue
+            try:
+                with open(os.path.join(entry.path, MANIFEST_NAME), encoding='utf-8') as file:
+                    manifest = json.load(file)
+            except (OSError, ValueError):
+                missing += 1
+                continue
+            directories.append(FrameDirectory(manifest['video_path'], manifest.get('camera_type'),
+                                              manifest['sample_interval'], entry.path))
+    return directories, missing
+
+
+def list_frame_files(frame_dir):
+    """列出帧目录中的帧文件，返回按帧序号排序的 [(帧序号, 路径), ...]"""
+    frames = []
+    with os.scandir(frame_dir) as entries:
+        for entry in entries:
+            match = _FRAME_PATTERN.match(entry.name)
+            if match:
+                frames.append((int(match.group(1)), entry.path))
+    frames.sort()
+    return frames
+
+
+class FrameLoader:
+    """并行预读已抽取的帧
+
+    多个线程同时读取和解码JPEG（cv2.imread 会释放GIL），按视频顺序产出帧，
+    预读的帧数不超过 prefetch，限制内存占用。调用方提前结束某个视频时（如已检测到小孩），
+    该视频剩余的帧不再读取。
+    """
+
+    def __init__(self, workers=4, prefetch=64):
+        """
+        Args:
+            workers: 读取线程数
+            prefetch: 最多预读的帧数
+        """
+        self.workers = max(1, workers)
+        self.prefetch = max(1, prefetch)
+        self.metrics = Metrics()
+
+    def _load(self, path):
+        with self.metrics.timer('frame_load_seconds'):
+            frame = cv2.imread(path)
+        if frame is None:
+            self.metrics.inc('frames_unreadable_total')
+        else:
+            self.metrics.inc('frames_loaded_total')
+        return frame
+
+    def iter_videos(self, videos):
+        """按顺序产出每个视频的帧
+
+        Args:
+            videos: [(key, [帧文件路径, ...]), ...]
+        Yields:
+            (key, 帧迭代器)，帧迭代器按顺序产出已解码的帧，无法读取的帧被跳过；
+            取下一个视频时，上一个视频未读取的帧被丢弃
+        """
+        videos = list(videos)
+        current = [0]
+        # 只为当前及之后的视频提交读取任务
+        files = ((position, path) for position, (_, paths) in enumerate(videos) for path in paths
+                 if position >= current[0])
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='frame-load')
+
+        def fill():
+            while len(pending) < self.prefetch:
+                item = next(files, None)
+                if item is None:
+                    return
+                pending.append((item[0], executor.submit(self._load, item[1])))
+
+        def frames(position):
+            while True:
+                fill()
+                if not pending or pending[0][0] != position:
+                    return
+                frame = pending.popleft()[1].result()
+                if frame is not None:
+                    yield frame
+
+        try:
+            for position, (key, _) in enumerate(videos):
+                current[0] = position
+                while pending and pending[0][0] < position:
+                    pending.popleft()[1].cancel()
+                yield key, frames(position)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,241 @@
+import json
+import os
+import time
+from threading import Lock
+
+from .config_reader import ConfigReader
+
+# 延迟直方图的桶上界（秒），与Prometheus默认桶接近，并覆盖整段视频的读取时间
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """累积直方图"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def cumulative_counts(self):
+        """返回每个桶的累积计数（Prometheus le语义）"""
+        total = 0
+        counts = []
+        for count in self.bucket_counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': dict(zip([str(bound) for bound in self.buckets], self.cumulative_counts())),
+        }
+
+
+class _Timer:
+    """计时上下文，退出时把耗时记录到直方图"""
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._metrics.observe(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    """未启用指标时使用的空计时上下文"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """运行指标注册表
+
+    提供计数器、仪表值（如当前并发数）和延迟直方图，运行结束时导出JSON汇总和
+    node_exporter textfile collector 可读取的Prometheus文本文件。
+    未启用时所有记录方法直接返回，计时使用共享的空上下文，几乎没有开销。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls, *args, **kwargs)
+            cls._instance._initialize(*args, **kwargs)
+        return cls._instance
+
+    def _initialize(self):
+        config_reader = ConfigReader()
+        self.config = config_reader.get_config('metrics')
+        self.root_path = config_reader.get_root_path()
+        self.enabled = bool(self.config.get('enabled', False))
+        self._lock = Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._started_at = time.time()
+
+    def inc(self, name, value=1):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """设置仪表值，只保留最新值"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        """向直方图记录一个观测值（秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name):
+        """返回计时上下文，用法：with metrics.timer('smb_read_seconds'): ..."""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def dump(self):
+        """导出计数器、仪表值和直方图的原始状态，可在其他进程中用 merge 合并"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {name: (histogram.buckets, list(histogram.bucket_counts), histogram.count,
+                                      histogram.sum, histogram.max)
+                               for name, histogram in self._histograms.items()},
+            }
+
+    def merge(self, state):
+        """合并其他进程（如解码进程）dump 出的指标，仪表值以合并进来的为准"""
+        if not self.enabled or not state:
+            return
+        with self._lock:
+            for name, value in state['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            self._gauges.update(state.get('gauges') or {})
+            for name, (buckets, bucket_counts, count, total, maximum) in state['histograms'].items():
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = Histogram(tuple(buckets))
+                histogram.bucket_counts = [mine + theirs for mine, theirs in
+                                           zip(histogram.bucket_counts, bucket_counts)]
+                histogram.count += count
+                histogram.sum += total
+                histogram.max = max(histogram.max, maximum)
+
+    def snapshot(self):
+        """获取当前所有指标的快照"""
+        with self._lock:
+            return {
+                'started_at': self._started_at,
+                'duration_seconds': time.time() - self._started_at,
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {name: histogram.to_dict() for name, histogram in self._histograms.items()},
+            }
+
+    def _resolve_path(self, path):
+        return path if os.path.isabs(path) else os.path.join(self.root_path, path)
+
+    def export_json(self, path):
+        """导出JSON汇总"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, ensure_ascii=False, indent=2)
+
+    def export_prometheus(self, path, job):
+        """导出Prometheus文本格式，先写临时文件再重命名，避免被采集到半个文件"""
+        snapshot = self.snapshot()
+        labels = f'job="{job}"'
+        lines = [
+            '# TYPE kidwatch_run_duration_seconds gauge',
+            f'kidwatch_run_duration_seconds{{{labels}}} {snapshot["duration_seconds"]:.6f}',
+            '# TYPE kidwatch_run_finished_timestamp_seconds gauge',
+            f'kidwatch_run_finished_timestamp_seconds{{{labels}}} {time.time():.0f}',
+        ]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'# TYPE kidwatch_{name} counter')
+            lines.append(f'kidwatch_{name}{{{labels}}} {value}')
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f'# TYPE kidwatch_{name} gauge')
+            lines.append(f'kidwatch_{name}{{{labels}}} {value}')
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            for name, histogram in histograms:
+                lines.append(f'# TYPE kidwatch_{name} histogram')
+                for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                    lines.append(f'kidwatch_{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'kidwatch_{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'kidwatch_{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'kidwatch_{name}_count{{{labels}}} {histogram.count}')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+    def export(self, job):
+        """按配置导出本次运行的指标，未启用时不做任何事
+
+        Args:
+            job: 运行名称，如 extract_video_frames
+        Returns:
+            list: 写入的文件路径
+        """
+        if not self.enabled:
+            return []
+        written = []
+        json_dir = self.config.get('json_dir', 'data/metrics')
+        if json_dir:
+            path = os.path.join(self._resolve_path(json_dir),
+                                f"{job}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+            self.export_json(path)
+            written.append(path)
+        prometheus_dir = self.config.get('prometheus_dir')
+        if prometheus_dir:
+            path = os.path.join(self._resolve_path(prometheus_dir), f"kidwatch_{job}.prom")
+            self.export_prometheus(path, job)
+            written.append(path)
+        return written
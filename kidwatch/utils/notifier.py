@@ -0,0 +1,93 @@
+import threading
+from queue import Queue
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class NotificationDispatcher:
+    """通知发送器
+
+    复用同一个HTTP连接池发送通知，每次请求带超时，
+    遇到连接错误或5xx/429响应时按退避策略有限重试。
+    通知放入队列后由后台线程发送，调用方无需等待网络请求。
+    """
+
+    def __init__(self, notify_config, log=print):
+        self.url = notify_config.get('url')
+        self.api_token = notify_config.get('api_token')
+        self.topic_id = notify_config.get('topic_id')
+        self.timeout = notify_config.get('timeout', 10)
+        self.log = log
+
+        retry = Retry(
+            total=notify_config.get('retries', 3),
+            backoff_factor=notify_config.get('backoff_factor', 1),
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'X-API-Token': self.api_token or '',
+        })
+
+        self._queue = Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, summary, content):
+        """将通知放入发送队列，立即返回"""
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='notify-dispatcher', daemon=True)
+                self._worker.start()
+        self._queue.put((summary, content))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.send(*item)
+            finally:
+                self._queue.task_done()
+
+    def send(self, summary, content):
+        """同步发送一条通知
+
+        Returns:
+            bool: 是否发送成功
+        """
+        data = {
+            "platform": "wechat",
+            "summary": summary,
+            "content": content,
+            "extra": {
+                "topic_id": self.topic_id
+            }
+        }
+        try:
+            response = self.session.post(self.url, json=data, timeout=self.timeout)
+            response.raise_for_status()
+            self.log(f"通知发送成功: {response.status_code}， 通知内容：{content}")
+            return True
+        except requests.exceptions.RequestException as e:
+            self.log(f"通知发送失败: {str(e)}， 通知内容：{content}")
+            return False
+
+    def close(self, timeout=None):
+        """等待队列中的通知发送完毕并停止后台线程"""
+        with self._worker_lock:
+            worker = self._worker
+            self._worker = None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join(timeout)
+        self.session.close()
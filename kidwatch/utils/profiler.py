@@ -0,0 +1,246 @@
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+
+class Profiler:
+    """CPU和内存性能剖析
+
+    - deterministic 模式：每个线程各自一个 cProfile，同名线程的统计合并，按线程名输出 .prof 文件
+      （pstats / snakeviz 可读）；线程结束后其 cProfile 即并入合并结果并释放
+    - sampling 模式：按固定间隔采样所有线程的调用栈，输出 .folded 折叠栈文件
+      （speedscope / flamegraph.pl 可读），开销可通过采样间隔控制，适合生产规模的任务
+    - 可选 tracemalloc：在各阶段边界保存 .snapshot 文件（tracemalloc.Snapshot.load 可读）
+    - 后台按间隔采样进程RSS，输出CSV时间线和峰值
+
+    未指定输出目录时为禁用状态，所有方法直接返回。
+    """
+
+    def __init__(self, output_dir=None, mode='deterministic', interval=0.01, memory=False,
+                 rss_interval=1.0, tracemalloc_frames=10):
+        """
+        Args:
+            output_dir: 输出目录，为None时禁用
+            mode: deterministic 或 sampling
+            interval: sampling 模式的采样间隔（秒）
+            memory: 是否启用 tracemalloc 并在阶段边界保存快照
+            rss_interval: RSS采样间隔（秒）
+            tracemalloc_frames: tracemalloc 记录的调用栈深度
+        """
+        self.output_dir = output_dir
+        self.enabled = output_dir is not None
+        self.mode = mode
+        self.interval = interval
+        self.memory = memory
+        self.rss_interval = rss_interval
+        self.tracemalloc_frames = tracemalloc_frames
+
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._profiles = []  # 仍在运行的线程: [(threading.Thread, cProfile.Profile)]
+        self._merged_stats = {}  # 线程名 -> 已结束线程合并后的统计
+        self._samples = defaultdict(lambda: defaultdict(int))  # 线程id -> {折叠栈: 次数}
+        self._thread_names = {}
+        self._sampler_thread = None
+        self._rss_thread = None
+        self._rss_samples = []  # [(相对时间, rss字节)]
+        self._stages = []
+        self._started_at = None
+
+    @classmethod
+    def from_args(cls, args):
+        """根据命令行参数创建剖析器"""
+        return cls(output_dir=args.profile, mode=args.profile_mode, interval=args.profile_interval,
+                   memory=args.profile_memory, rss_interval=args.profile_rss_interval)
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def start(self):
+        """开始剖析"""
+        if not self.enabled:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._started_at = time.perf_counter()
+        if self.memory:
+            tracemalloc.start(self.tracemalloc_frames)
+        self._rss_thread = threading.Thread(target=self._sample_rss, name='profiler-rss', daemon=True)
+        self._rss_thread.start()
+        if self.mode == 'sampling':
+            self._sampler_thread = threading.Thread(target=self._sample_stacks, name='profiler-sampler',
+                                                    daemon=True)
+            self._sampler_thread.start()
+        else:
+            # 之后新建的线程在执行第一条语句前各自启动一个cProfile
+            threading.setprofile(self._bootstrap_thread_profile)
+            self._start_thread_profile()
+        self.mark_stage('start')
+
+    def _bootstrap_thread_profile(self, frame, event, arg):
+        # profile.enable() 会替换当前线程的profile钩子，因此每个线程只会进入一次
+        self._start_thread_profile()
+
+    def _start_thread_profile(self):
+        profile = cProfile.Profile()
+        current = threading.current_thread()
+        with self._lock:
+            self._collect_finished()
+            self._profiles.append((current, profile))
+        profile.enable()
+
+    def _collect_finished(self):
+        """将已结束线程的统计并入同名线程的合并结果并释放其cProfile，调用方需持有锁"""
+        running = []
+        for thread, profile in self._profiles:
+            if thread.is_alive():
+                running.append((thread, profile))
+            else:
+                self._merge_stats(thread.name, profile)
+        self._profiles = running
+
+    def _merge_stats(self, thread_name, profile):
+        # 不调用 create_stats()：它会对调用线程执行 disable()，停止调用线程自身的剖析
+        profile.snapshot_stats()
+        merged = self._merged_stats.setdefault(thread_name, {})
+        for func, stat in profile.stats.items():
+            merged[func] = pstats.add_func_stats(merged[func], stat) if func in merged else stat
+
+    def _sample_stacks(self):
+        """定时采样所有线程的调用栈"""
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or names.get(ident) == 'profiler-rss':
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._samples[ident][';'.join(reversed(stack))] += 1
+                self._thread_names[ident] = names.get(ident, str(ident))
+
+    @staticmethod
+    def _current_rss():
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            with open('/proc/self/statm') as file:
+                return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def _sample_rss(self):
+        while True:
+            self._rss_samples.append((time.perf_counter() - self._started_at, self._current_rss()))
+            if self._stop_event.wait(self.rss_interval):
+                return
+
+    def mark_stage(self, name):
+        """标记阶段边界，记录内存占用，启用 tracemalloc 时保存快照"""
+        if not self.enabled:
+            return
+        stage = {
+            'name': name,
+            'elapsed_seconds': time.perf_counter() - self._started_at,
+            'rss_bytes': self._current_rss(),
+        }
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            stage['traced_current_bytes'] = current
+            stage['traced_peak_bytes'] = peak
+            snapshot_path = self._path(f"mem_{self._pid}_{len(self._stages):02d}_{name}.snapshot")
+            tracemalloc.take_snapshot().dump(snapshot_path)
+            stage['snapshot'] = snapshot_path
+        with self._lock:
+            self._stages.append(stage)
+
+    @staticmethod
+    def _safe_name(name):
+        return re.sub(r'[^\w.-]+', '_', name)
+
+    def stop(self):
+        """停止剖析并写出所有结果文件
+
+        Returns:
+            list: 写出的文件路径
+        """
+        if not self.enabled:
+            return []
+        self.mark_stage('end')
+        written = []
+        self._stop_event.set()
+
+        if self.mode == 'sampling':
+            self._sampler_thread.join()
+            for ident, stacks in self._samples.items():
+                path = self._path(f"cpu_{self._pid}_{self._safe_name(self._thread_names[ident])}_{ident}.folded")
+                with open(path, 'w', encoding='utf-8') as file:
+                    for stack, count in sorted(stacks.items()):
+                        file.write(f"{stack} {count}\n")
+                written.append(path)
+        else:
+            threading.setprofile(None)
+            current_ident = threading.get_ident()
+            with self._lock:
+                for thread, profile in self._profiles:
+                    # disable() 只作用于调用线程，其他线程的profile直接读取统计
+                    if thread.ident == current_ident:
+                        profile.disable()
+                    self._merge_stats(thread.name, profile)
+                self._profiles = []
+                merged_stats = dict(self._merged_stats)
+            for thread_name, stats in merged_stats.items():
+                path = self._path(f"cpu_{self._pid}_{self._safe_name(thread_name)}.prof")
+                with open(path, 'wb') as file:
+                    marshal.dump(stats, file)
+                written.append(path)
+
+        if self.memory:
+            tracemalloc.stop()
+
+        self._rss_thread.join()
+        rss_path = self._path(f"rss_{self._pid}.csv")
+        with open(rss_path, 'w', encoding='utf-8') as file:
+            file.write("elapsed_seconds,rss_bytes\n")
+            for elapsed, rss in self._rss_samples:
+                file.write(f"{elapsed:.3f},{rss}\n")
+        written.append(rss_path)
+
+        summary_path = self._path(f"summary_{self._pid}.json")
+        peak_rss = max([rss for _, rss in self._rss_samples] + [stage['rss_bytes'] for stage in self._stages])
+        with open(summary_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'pid': self._pid,
+                'mode': self.mode,
+                'duration_seconds': time.perf_counter() - self._started_at,
+                'peak_rss_bytes': peak_rss,
+                'stages': self._stages,
+                'files': written,
+            }, file, ensure_ascii=False, indent=2)
+        written.append(summary_path)
+        return written
+
+
+def add_profile_arguments(parser):
+    """为命令行添加性能剖析参数"""
+    parser.add_argument('--profile', type=str, default=None, metavar='DIR',
+                        help="启用性能剖析并将结果写入指定目录")
+    parser.add_argument('--profile-mode', type=str, choices=['deterministic', 'sampling'],
+                        default='deterministic',
+                        help="deterministic: 每线程cProfile，同名线程合并(.prof)；sampling: 定时采样调用栈(.folded)，开销更低")
+    parser.add_argument('--profile-interval', type=float, default=0.01,
+                        help="sampling模式的采样间隔（秒），默认0.01")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="启用tracemalloc，在各阶段边界保存内存快照")
+    parser.add_argument('--profile-rss-interval', type=float, default=1.0,
+                        help="进程RSS采样间隔（秒），默认1")
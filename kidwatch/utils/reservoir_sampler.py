@@ -0,0 +1,91 @@
+class StratifiedReservoirSampler:
+    """单遍流式分层蓄水池采样
+
+    正在遍历的分层维护一个容量为 sample_size 的蓄水池（Algorithm R），
+    遍历结束后按各层实际数量的比例（最大余数法）分配采样名额，
+    再从各层蓄水池中随机抽取，使样本均匀覆盖所有分层。
+    分层键变化时，已遍历完的分层蓄水池截断到其最多可能分得的名额 floor(层数量*采样数/总数)+1，
+    总数增长后继续截断，因此所有蓄水池合计不超过约 2*sample_size + 分层数。
+    要求同一分层的元素连续到达（iter_video_files 按目录顺序遍历即满足），
+    不分层时等价于普通的蓄水池采样。
+    """
+
+    def __init__(self, sample_size, rng, key_func=None):
+        """
+        Args:
+            sample_size: 采样数量
+            rng: random.Random 实例，固定种子即可复现
+            key_func: 从元素计算分层键的函数，为None时不分层
+        """
+        self.sample_size = sample_size
+        self.rng = rng
+        self.key_func = key_func
+        self._reservoirs = {}  # 分层键 -> 蓄水池
+        self._counts = {}  # 分层键 -> 已遍历数量
+        self._current_key = None  # 正在遍历的分层键
+        self._started = False
+
+    def add(self, item):
+        """加入一个元素"""
+        key = self.key_func(item) if self.key_func else None
+        if not self._started or key != self._current_key:
+            if key in self._counts:
+                raise ValueError(f"分层 {key} 的元素没有连续到达")
+            if self._started:
+                self._finish_stratum(self._current_key)
+            self._current_key = key
+            self._started = True
+        reservoir = self._reservoirs.setdefault(key, [])
+        seen = self._counts.get(key, 0) + 1
+        self._counts[key] = seen
+        if len(reservoir) < self.sample_size:
+            reservoir.append(item)
+        else:
+            index = self.rng.randrange(seen)
+            if index < self.sample_size:
+                reservoir[index] = item
+
+    def _finish_stratum(self, key):
+        """分层遍历完毕：打乱其蓄水池，再把所有已完成分层截断到最多可能分得的名额"""
+        # 随机排列后任意前缀仍是该层的均匀样本
+        self.rng.shuffle(self._reservoirs[key])
+        total = self.total
+        # 此时新的分层尚未加入，字典中都是已遍历完的分层
+        for finished_key, reservoir in self._reservoirs.items():
+            limit = self._counts[finished_key] * self.sample_size // total + 1
+            del reservoir[limit:]
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+    @property
+    def total(self):
+        """已遍历的元素总数"""
+        return sum(self._counts.values())
+
+    def _allocate(self, sample_count):
+        """按各层数量比例分配名额，余数按小数部分从大到小补齐"""
+        total = self.total
+        keys = sorted(self._counts, key=lambda k: (k is None, k))
+        quotas = {}
+        remainders = []
+        for key in keys:
+            exact = self._counts[key] * sample_count / total
+            quotas[key] = int(exact)
+            remainders.append((exact - quotas[key], key))
+        left = sample_count - sum(quotas.values())
+        for _, key in sorted(remainders, key=lambda item: -item[0])[:left]:
+            quotas[key] += 1
+        return keys, quotas
+
+    def result(self):
+        """返回采样结果，数量为 min(sample_size, 总数)"""
+        total = self.total
+        if total == 0:
+            return []
+        keys, quotas = self._allocate(min(self.sample_size, total))
+        sample = []
+        for key in keys:
+            sample.extend(self.rng.sample(self._reservoirs[key], quotas[key]))
+        return sample
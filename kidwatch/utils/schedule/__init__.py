@@ -0,0 +1,8 @@
+from .mp4_probe import probe_mp4
+from .progress import ProgressTracker, format_duration
+from .scheduler import SCHEDULE_ORDERS, VideoScheduler, add_schedule_arguments, estimate_cost, video_date
+from .video_metadata import VideoMetadata, LocalPathReader, MetadataCache, MetadataScanner
+
+__all__ = ['probe_mp4', 'ProgressTracker', 'format_duration', 'SCHEDULE_ORDERS', 'VideoScheduler',
+           'add_schedule_arguments', 'estimate_cost', 'video_date', 'VideoMetadata', 'LocalPathReader',
+           'MetadataCache', 'MetadataScanner']
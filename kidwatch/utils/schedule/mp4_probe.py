@@ -0,0 +1,177 @@
+import struct
+
+# 首次读取文件头的字节数，moov在文件开头（faststart）时一次读取即可解析
+HEAD_BYTES = 64 * 1024
+# moov box 的大小上限，超出时视为文件损坏
+MAX_MOOV_BYTES = 32 * 1024 * 1024
+# 顶层box遍历的最大次数
+MAX_TOP_LEVEL_BOXES = 64
+
+
+def _box_header(data, offset):
+    """解析box头部
+
+    Returns:
+        tuple: (box类型, 头部长度, box总长度)，数据不足时返回None；总长度为0表示延伸到文件末尾
+    """
+    if offset + 8 > len(data):
+        return None
+    size, box_type = struct.unpack_from('>I4s', data, offset)
+    header_size = 8
+    if size == 1:
+        if offset + 16 > len(data):
+            return None
+        size = struct.unpack_from('>Q', data, offset + 8)[0]
+        header_size = 16
+    return box_type, header_size, size
+
+
+def _iter_boxes(data, start=0, end=None):
+    """遍历内存中 [start, end) 范围内的子box，产生 (box类型, 内容起始, box结束)"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        header = _box_header(data, offset)
+        if header is None:
+            return
+        box_type, header_size, size = header
+        box_end = end if size == 0 else offset + size
+        if box_end > end or size and size < header_size:
+            return
+        yield box_type, offset + header_size, box_end
+        offset = box_end
+
+
+def _find_box(data, start, end, box_type):
+    for child_type, child_start, child_end in _iter_boxes(data, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _find_path(data, start, end, path):
+    """按路径逐级查找box，如 (b'mdia', b'minf', b'stbl')"""
+    span = (start, end)
+    for box_type in path:
+        span = _find_box(data, span[0], span[1], box_type)
+        if span is None:
+            return None
+    return span
+
+
+def _timescale_duration(data, start):
+    """解析mvhd/mdhd中的时间刻度和时长"""
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, start + 12)
+    return timescale, duration
+
+
+def read_moov(read_range, size):
+    """从文件中读取moov box
+
+    camera录像的moov通常在mdat之后，按顶层box头部逐个跳过，
+    每个顶层box只需一次小范围读取。
+
+    Args:
+        read_range: read_range(offset, length) 函数
+        size: 文件大小
+    Returns:
+        bytes: moov box的内容（含头部），找不到时返回None
+    """
+    head = read_range(0, min(HEAD_BYTES, size))
+    offset = 0
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        if offset + 8 > size:
+            return None
+        if offset + 16 <= len(head):
+            header = _box_header(head, offset)
+        else:
+            header = _box_header(read_range(offset, 16), 0)
+        if header is None:
+            return None
+        box_type, header_size, box_size = header
+        if box_size == 0:
+            box_size = size - offset
+        if box_size < header_size:
+            return None
+        if box_type == b'moov':
+            if box_size > MAX_MOOV_BYTES:
+                return None
+            if offset + box_size <= len(head):
+                return head[offset:offset + box_size]
+            return read_range(offset, box_size)
+        offset += box_size
+    return None
+
+
+def parse_moov(moov):
+    """解析moov box，提取视频轨道的时长、帧数、帧率和分辨率
+
+    Args:
+        moov: moov box的内容（含头部）
+    Returns:
+        dict: duration / fps / frame_count / width / height，无法解析的字段为None
+    """
+    info = {'duration': None, 'fps': None, 'frame_count': None, 'width': None, 'height': None}
+    header = _box_header(moov, 0)
+    if header is None or header[0] != b'moov':
+        return info
+    start, end = header[1], len(moov)
+
+    mvhd = _find_box(moov, start, end, b'mvhd')
+    if mvhd:
+        timescale, duration = _timescale_duration(moov, mvhd[0])
+        if timescale:
+            info['duration'] = duration / timescale
+
+    for box_type, trak_start, trak_end in _iter_boxes(moov, start, end):
+        if box_type != b'trak':
+            continue
+        hdlr = _find_path(moov, trak_start, trak_end, (b'mdia', b'hdlr'))
+        if hdlr is None or moov[hdlr[0] + 8:hdlr[0] + 12] != b'vide':
+            continue
+        tkhd = _find_box(moov, trak_start, trak_end, b'tkhd')
+        if tkhd and tkhd[1] - tkhd[0] >= 8:
+            width, height = struct.unpack_from('>II', moov, tkhd[1] - 8)
+            info['width'], info['height'] = width >> 16, height >> 16
+        mdhd = _find_path(moov, trak_start, trak_end, (b'mdia', b'mdhd'))
+        if mdhd:
+            timescale, duration = _timescale_duration(moov, mdhd[0])
+            if timescale and duration:
+                info['duration'] = duration / timescale
+        stbl = _find_path(moov, trak_start, trak_end, (b'mdia', b'minf', b'stbl'))
+        if stbl:
+            # stsz 与 stz2 的样本数都在第8-12字节
+            sizes = _find_box(moov, stbl[0], stbl[1], b'stsz') or _find_box(moov, stbl[0], stbl[1], b'stz2')
+            if sizes:
+                info['frame_count'] = struct.unpack_from('>I', moov, sizes[0] + 8)[0]
+        if info['frame_count'] and info['duration']:
+            info['fps'] = info['frame_count'] / info['duration']
+        break
+    return info
+
+
+def probe_mp4(read_range, size):
+    """只读取MP4文件的box头部和moov，获取视频元数据，不下载整个文件
+
+    Args:
+        read_range: read_range(offset, length) 函数
+        size: 文件大小
+    Returns:
+        dict: 同 parse_moov，文件不是MP4或找不到moov时返回None
+    """
+    if size < 8:
+        return None
+    try:
+        moov = read_moov(read_range, size)
+    except struct.error:
+        return None
+    if moov is None:
+        return None
+    try:
+        return parse_moov(moov)
+    except (struct.error, IndexError):
+        return None
@@ -0,0 +1,62 @@
+import time
+from threading import Lock
+
+
+def format_duration(seconds):
+    """把秒数格式化为 1h02m03s / 2m03s / 3s"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressTracker:
+    """按估算开销计算进度和剩余时间
+
+    视频时长差别很大时，按个数计算的进度和剩余时间误差很大。
+    有开销估算时按已完成开销占总开销的比例计算进度，并按已用时间推算剩余时间；
+    没有估算的视频按1计，全部没有估算时退化为按个数计算。同一视频（如任务队列中重试的视频）只计一次。
+    可在多个线程中调用。
+    """
+
+    def __init__(self, video_paths, costs=None):
+        """
+        Args:
+            video_paths: 本次要处理的视频路径列表
+            costs: {路径: 估算开销}，见 VideoScheduler.plan
+        """
+        costs = costs or {}
+        self._costs = {path: costs.get(path, 1) for path in video_paths}
+        self.total_count = len(self._costs)
+        self.total_cost = sum(self._costs.values())
+        self.done_count = 0
+        self.done_cost = 0
+        self._done = set()
+        self._started_at = time.monotonic()
+        self._lock = Lock()
+
+    def advance(self, video_path):
+        """记录一个视频处理完成（成功或失败），返回当前进度描述"""
+        with self._lock:
+            if video_path not in self._done:
+                self._done.add(video_path)
+                self.done_count += 1
+                self.done_cost += self._costs.get(video_path, 1)
+            return self._format()
+
+    def format(self):
+        with self._lock:
+            return self._format()
+
+    def _format(self):
+        fraction = self.done_cost / self.total_cost if self.total_cost else 1.0
+        elapsed = time.monotonic() - self._started_at
+        message = (f"总体进度: {fraction * 100:.1f}% ({self.done_count}/{self.total_count})，"
+                   f"已用 {format_duration(elapsed)}")
+        if 0 < fraction < 1:
+            message += f"，预计剩余 {format_duration(elapsed * (1 - fraction) / fraction)}"
+        return message
@@ -0,0 +1,154 @@
+import statistics
+
+from ..video_filter import VideoFilter, DATE_DIR_PATTERN, DATE_HALF_DIR_PATTERN, DATE_HOUR_DIR_PATTERN
+
+# 处理顺序：listing 保持列表顺序，largest 时长最长优先，cost 按估算的处理开销从大到小
+SCHEDULE_ORDERS = ('listing', 'largest', 'cost')
+
+
+def video_date(path):
+    """从文件名或目录名解析视频的录制日期（YYYYMMDD），无法解析时返回空字符串"""
+    parts = [part for part in path.replace('\\', '/').split('/') if part]
+    if not parts:
+        return ''
+    recorded = VideoFilter.parse_file_time(parts[-1])
+    if recorded is not None:
+        return recorded.strftime('%Y%m%d')
+    for part in reversed(parts[:-1]):
+        for pattern in (DATE_HALF_DIR_PATTERN, DATE_HOUR_DIR_PATTERN, DATE_DIR_PATTERN):
+            match = pattern.match(part)
+            if match:
+                return match.group(1)
+    return ''
+
+
+def estimate_cost(metadata, sample_interval, sample_weight):
+    """估算处理一个视频的开销，单位为"解码一帧"的时间
+
+    每一帧都要解码，采样帧还要转换、编码或推理，其开销是解码一帧的sample_weight倍。
+
+    Args:
+        metadata: VideoMetadata
+        sample_interval: 采样间隔
+        sample_weight: 采样帧相对解码一帧的开销
+    Returns:
+        float: 估算开销，缺少帧数和时长时返回None
+    """
+    frames = metadata.frame_count
+    if not frames and metadata.duration and metadata.fps:
+        frames = metadata.duration * metadata.fps
+    if not frames:
+        return None
+    return frames * (1 + sample_weight / max(1, sample_interval))
+
+
+class VideoScheduler:
+    """根据视频元数据安排处理顺序
+
+    按列表顺序处理时，排在末尾的几个长视频会让其他工作线程空等（长尾）。
+    先处理开销大的视频（LPT），短视频在最后填补空闲的线程，总耗时更接近平均分配。
+    元数据同时给出每个视频的开销估算，用于按开销计算进度和剩余时间。
+    """
+
+    def __init__(self, order='listing', newest_first=False, sample_weight=5.0):
+        """
+        Args:
+            order: 处理顺序，见 SCHEDULE_ORDERS
+            newest_first: 是否先处理最近日期的视频，同一天内再按order排序
+            sample_weight: 采样帧相对解码一帧的开销，用于估算cost
+        """
+        if order not in SCHEDULE_ORDERS:
+            raise ValueError(f"无效的处理顺序: {order}，可选: {', '.join(SCHEDULE_ORDERS)}")
+        self.order = order
+        self.newest_first = newest_first
+        self.sample_weight = sample_weight
+
+    @classmethod
+    def from_args(cls, args, config=None):
+        """根据命令行参数和配置文件的schedule段创建调度器，命令行优先"""
+        config = config or {}
+        order = args.schedule or config.get('order') or 'listing'
+        newest_first = args.newest_first or bool(config.get('newest_first'))
+        return cls(order, newest_first, config.get('sample_weight', 5.0))
+
+    @property
+    def needs_metadata(self):
+        return self.order != 'listing'
+
+    def estimate_costs(self, video_paths, metadata, sample_intervals):
+        """估算每个视频的开销
+
+        缺少帧数和时长的视频按已知视频的每字节开销中位数和文件大小估算，
+        完全没有元数据的视频按已知开销的中位数估算。
+
+        Args:
+            video_paths: 视频路径列表
+            metadata: {路径: VideoMetadata}
+            sample_intervals: {路径: 采样间隔}
+        Returns:
+            dict: {路径: 开销}，没有任何元数据时为空字典
+        """
+        costs = {}
+        per_byte = []
+        for path in video_paths:
+            item = metadata.get(path)
+            if item is None:
+                continue
+            cost = estimate_cost(item, sample_intervals.get(path, 1), self.sample_weight)
+            if cost is not None:
+                costs[path] = cost
+                if item.size:
+                    per_byte.append(cost / item.size)
+        if not costs:
+            # 无法解析任何视频时，按文件大小估算
+            return {path: float(metadata[path].size) for path in video_paths
+                    if path in metadata and metadata[path].size}
+        cost_per_byte = statistics.median(per_byte) if per_byte else None
+        median_cost = statistics.median(costs.values())
+        for path in video_paths:
+            if path in costs:
+                continue
+            item = metadata.get(path)
+            if item is not None and item.size and cost_per_byte:
+                costs[path] = item.size * cost_per_byte
+            else:
+                costs[path] = median_cost
+        return costs
+
+    def plan(self, video_paths, metadata, sample_intervals):
+        """安排处理顺序
+
+        Args:
+            video_paths: 视频路径列表
+            metadata: {路径: VideoMetadata}，order为listing时可为空
+            sample_intervals: {路径: 采样间隔}
+        Returns:
+            tuple: (排序后的视频路径列表, {路径: 估算开销})
+        """
+        costs = self.estimate_costs(video_paths, metadata, sample_intervals) if metadata else {}
+        ordered = list(video_paths)
+        if self.order == 'largest':
+            def duration_key(path):
+                item = metadata.get(path)
+                if item is None:
+                    return (0, 0)
+                return (item.duration or 0, item.size or 0)
+            ordered.sort(key=duration_key, reverse=True)
+        elif self.order == 'cost' and costs:
+            ordered.sort(key=lambda path: costs.get(path, 0), reverse=True)
+        if self.newest_first:
+            # 稳定排序，同一天内保持上面的顺序
+            ordered.sort(key=video_date, reverse=True)
+        return ordered, costs
+
+    def __str__(self):
+        return f"{self.order}{'，最近日期优先' if self.newest_first else ''}"
+
+
+def add_schedule_arguments(parser):
+    """为命令行添加处理顺序参数"""
+    parser.add_argument('--schedule', type=str, choices=SCHEDULE_ORDERS, default=None,
+                        help="处理顺序：listing(列表顺序)、largest(时长最长优先)、cost(按估算开销从大到小)，"
+                             "默认使用配置文件schedule.order")
+    parser.add_argument('--newest-first', action='store_true',
+                        help="先处理最近日期的视频，同一天内再按--schedule排序")
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from ..fileHandler.file_handler import FileStat
+from ..metrics import Metrics
+from .mp4_probe import probe_mp4
+
+# 视频元数据：大小(字节)、修改时间、时长(秒)、帧率、帧数、分辨率，无法解析的字段为None
+VideoMetadata = namedtuple('VideoMetadata', ['size', 'mtime', 'duration', 'fps', 'frame_count', 'width', 'height'])
+
+
+class LocalPathReader:
+    """按绝对路径读取本地文件的读取器，提供与文件处理器相同的 stat / read_range 接口
+
+    用于视频列表中是本地路径的场景（如 video_classifier 的输入）。
+    """
+
+    def stat(self, path):
+        result = os.stat(path)
+        return FileStat(result.st_size, result.st_mtime)
+
+    def read_range(self, path, offset, length):
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            return file.read(length)
+
+    def get_safe_connections_limit(self):
+        return os.cpu_count() or 4
+
+
+class MetadataCache:
+    """视频元数据缓存
+
+    以SQLite保存每个视频的元数据。摄像头录像写完后不再变化，
+    探测时已稳定（修改时间早于探测时间stable_seconds以上）的记录直接信任，
+    重复运行时无需再访问NAS；探测时仍可能在写入的记录需先stat校验大小和修改时间。
+    """
+
+    def __init__(self, db_path, stable_seconds=600):
+        """
+        Args:
+            db_path: SQLite文件路径
+            stable_seconds: 视频修改后经过多久视为已写完
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.stable_seconds = stable_seconds
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_metadata (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    duration REAL,
+                    fps REAL,
+                    frame_count INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    probed_at REAL NOT NULL
+                )
+            """)
+
+    def get_many(self, paths):
+        """批量查询元数据
+
+        Returns:
+            tuple: ({路径: VideoMetadata} 可直接使用的记录, {路径: VideoMetadata} 需stat校验的记录)
+        """
+        trusted, unsettled = {}, {}
+        with self._lock:
+            for path in paths:
+                row = self._conn.execute(
+                    "SELECT size, mtime, duration, fps, frame_count, width, height, probed_at "
+                    "FROM video_metadata WHERE path = ?", (path,)).fetchone()
+                if row is None:
+                    continue
+                metadata = VideoMetadata(*row[:7])
+                if row[7] - metadata.mtime >= self.stable_seconds:
+                    trusted[path] = metadata
+                else:
+                    unsettled[path] = metadata
+        return trusted, unsettled
+
+    def record_many(self, items):
+        """保存（或覆盖）元数据
+
+        Args:
+            items: [(路径, VideoMetadata), ...]
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO video_metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((path, *metadata, now) for path, metadata in items))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MetadataScanner:
+    """预扫描视频元数据
+
+    未缓存的视频并发地stat并读取MP4的moov box（通常只需几次小范围读取），
+    无需下载整个文件即可得到时长、帧率和帧数。
+    """
+
+    def __init__(self, reader, cache=None, max_workers=8):
+        """
+        Args:
+            reader: 提供 stat(path) 和 read_range(path, offset, length) 的文件处理器
+            cache: MetadataCache，为None时每次都重新探测
+            max_workers: 并发探测数，不超过reader的安全连接数
+        """
+        self.reader = reader
+        self.cache = cache
+        self.max_workers = max(1, min(max_workers, reader.get_safe_connections_limit()))
+        self.metrics = Metrics()
+
+    def probe(self, path, file_stat=None):
+        """探测单个视频的元数据，无法解析MP4时只返回大小和修改时间"""
+        file_stat = file_stat or self.reader.stat(path)
+        self.metrics.inc('metadata_probes_total')
+        info = probe_mp4(lambda offset, length: self.reader.read_range(path, offset, length), file_stat.size)
+        if info is None:
+            self.metrics.inc('metadata_probe_failures_total')
+            return VideoMetadata(file_stat.size, file_stat.mtime, None, None, None, None, None)
+        return VideoMetadata(file_stat.size, file_stat.mtime, **info)
+
+    def _probe_checked(self, path, cached=None):
+        """stat后与缓存比较，大小和修改时间未变时沿用缓存，否则重新探测"""
+        file_stat = self.reader.stat(path)
+        if cached is not None and (cached.size, cached.mtime) == (file_stat.size, file_stat.mtime):
+            return cached
+        return self.probe(path, file_stat)
+
+    def scan(self, paths):
+        """获取一批视频的元数据
+
+        Args:
+            paths: 视频路径列表
+        Returns:
+            dict: {路径: VideoMetadata}，stat失败的视频不包含在内
+        """
+        with self.metrics.timer('metadata_scan_seconds'):
+            if self.cache is not None:
+                results, unsettled = self.cache.get_many(paths)
+            else:
+                results, unsettled = {}, {}
+            self.metrics.inc('metadata_cache_hits_total', len(results))
+            pending = [path for path in paths if path not in results]
+            if not pending:
+                return results
+
+            probed = []
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='metadata-probe') as executor:
+                futures = {path: executor.submit(self._probe_checked, path, unsettled.get(path))
+                           for path in pending}
+                for path, future in futures.items():
+                    try:
+                        metadata = future.result()
+                    except Exception as e:
+                        self.metrics.inc('metadata_probe_failures_total')
+                        print(f"获取视频元数据失败 {path}: {str(e)}")
+                        continue
+                    results[path] = metadata
+                    # 校验通过的记录也重新保存，更新探测时间，文件已写完时下次可直接信任
+                    probed.append((path, metadata))
+            if self.cache is not None and probed:
+                self.cache.record_many(probed)
+        return results
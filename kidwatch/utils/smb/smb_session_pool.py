@@ -70,4 +70,9 @@ class SMBSessionPool:
     
     def get_safe_sessions_limit(self) -> int:
         """获取安全的并发限制数"""
-        return max(1, self.max_sessions - 1) 
\ No newline at end of file
+        return self.safe_sessions_limit(self.max_sessions)
+
+    @staticmethod
+    def safe_sessions_limit(max_sessions) -> int:
+        """根据会话池大小计算安全的并发限制数"""
+        return max(1, max_sessions - 1) 
\ No newline at end of file
@@ -0,0 +1,155 @@
+import argparse
+import re
+from datetime import datetime, timedelta
+
+# 目录名：20240301AM / 20240301PM / 2024030119 / 20240301 / 19
+DATE_HALF_DIR_PATTERN = re.compile(r'^(\d{8})(AM|PM)$')
+DATE_HOUR_DIR_PATTERN = re.compile(r'^(\d{8})(\d{2})$')
+DATE_DIR_PATTERN = re.compile(r'^(\d{8})$')
+HOUR_DIR_PATTERN = re.compile(r'^(\d{2})$')
+# 文件名中的时间：14位 YYYYMMDDHHMMSS 或 10位unix时间戳，如 00M01S_1709251261.mp4
+DATETIME_FILE_PATTERN = re.compile(r'(?<!\d)(\d{14})(?!\d)')
+EPOCH_FILE_PATTERN = re.compile(r'(?<!\d)(\d{10})(?!\d)')
+
+HALF_HOURS = {'AM': range(0, 12), 'PM': range(12, 24)}
+
+
+class VideoFilter:
+    """视频时间过滤条件
+
+    在遍历目录时根据目录名和文件名中编码的日期、AM/PM和小时剪枝，
+    不满足条件的目录不会被列出。无法从名称解析出时间的目录和文件一律保留。
+    """
+
+    def __init__(self, start_date=None, end_date=None, halves=None, hours=None):
+        """
+        Args:
+            start_date: 起始日期（含），格式YYYYMMDD
+            end_date: 结束日期（含），格式YYYYMMDD
+            halves: 允许的半天集合，如 {'PM'}
+            hours: 小时窗口 (起始小时, 结束小时)，左闭右开，如 (19, 21) 表示19:00-20:59；
+                起始大于结束时跨过午夜，如 (22, 2) 表示22:00-次日01:59
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+        self.halves = set(halves) if halves else None
+        self.hours = None
+        if hours:
+            start_hour, end_hour = hours
+            if start_hour < end_hour:
+                self.hours = set(range(start_hour, end_hour))
+            else:
+                self.hours = set(range(start_hour, 24)) | set(range(0, end_hour))
+
+    @classmethod
+    def from_args(cls, args):
+        """根据命令行参数创建过滤条件，未指定任何条件时返回None"""
+        start_date = args.start_date
+        end_date = args.end_date
+        if args.last_days:
+            today = datetime.now()
+            start_date = (today - timedelta(days=args.last_days - 1)).strftime('%Y%m%d')
+            end_date = end_date or today.strftime('%Y%m%d')
+        halves = {args.half} if args.half else None
+        hours = args.hours
+        if not (start_date or end_date or halves or hours):
+            return None
+        return cls(start_date, end_date, halves, hours)
+
+    def _accept_date(self, date_str):
+        if self.start_date and date_str < self.start_date:
+            return False
+        if self.end_date and date_str > self.end_date:
+            return False
+        return True
+
+    def _accept_hour(self, hour):
+        if self.hours is not None and hour not in self.hours:
+            return False
+        if self.halves is not None and not any(hour in HALF_HOURS[half] for half in self.halves):
+            return False
+        return True
+
+    def accept_dir(self, name):
+        """判断目录是否可能包含符合条件的视频"""
+        match = DATE_HALF_DIR_PATTERN.match(name)
+        if match:
+            date_str, half = match.groups()
+            if self.halves is not None and half not in self.halves:
+                return False
+            if self.hours is not None and not self.hours.intersection(HALF_HOURS[half]):
+                return False
+            return self._accept_date(date_str)
+        match = DATE_HOUR_DIR_PATTERN.match(name)
+        if match:
+            return self._accept_date(match.group(1)) and self._accept_hour(int(match.group(2)))
+        match = DATE_DIR_PATTERN.match(name)
+        if match:
+            return self._accept_date(match.group(1))
+        match = HOUR_DIR_PATTERN.match(name)
+        if match and int(match.group(1)) < 24:
+            return self._accept_hour(int(match.group(1)))
+        return True
+
+    def accept_file(self, name):
+        """判断视频文件是否符合条件"""
+        timestamp = self.parse_file_time(name)
+        if timestamp is None:
+            return True
+        return self._accept_date(timestamp.strftime('%Y%m%d')) and self._accept_hour(timestamp.hour)
+
+    def accept_path(self, path):
+        """对完整相对路径逐级判断，用于不支持遍历时剪枝的场景"""
+        parts = [part for part in path.split('/') if part]
+        if not parts:
+            return True
+        return all(self.accept_dir(part) for part in parts[:-1]) and self.accept_file(parts[-1])
+
+    @staticmethod
+    def parse_file_time(name):
+        """从文件名解析录制时间，无法解析时返回None"""
+        match = DATETIME_FILE_PATTERN.search(name)
+        if match:
+            try:
+                return datetime.strptime(match.group(1), '%Y%m%d%H%M%S')
+            except ValueError:
+                pass
+        match = EPOCH_FILE_PATTERN.search(name)
+        if match:
+            return datetime.fromtimestamp(int(match.group(1)))
+        return None
+
+
+def parse_hours(text):
+    """解析小时窗口参数：19-21 / 22-2（跨午夜）/ 19（只含19点）
+
+    Returns:
+        tuple: (起始小时, 结束小时)，左闭右开
+    Raises:
+        argparse.ArgumentTypeError: 格式错误或小时超出范围，由argparse报告为参数错误
+    """
+    start_hour, separator, end_hour = text.partition('-')
+    try:
+        start_hour = int(start_hour)
+        end_hour = int(end_hour) if separator else (start_hour + 1) % 24
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的小时窗口: {text}，格式应为 19-21、22-2 或 19")
+    if not (0 <= start_hour < 24 and 0 <= end_hour <= 24):
+        raise argparse.ArgumentTypeError(f"无效的小时窗口: {text}，小时应在0-24之间")
+    if start_hour == end_hour:
+        raise argparse.ArgumentTypeError(f"无效的小时窗口: {text}，起始和结束小时相同，窗口为空")
+    return start_hour, end_hour
+
+
+def add_filter_arguments(parser):
+    """为命令行添加时间过滤参数"""
+    parser.add_argument('--start-date', type=str, default=None,
+                        help="起始日期（含），格式如：20240101")
+    parser.add_argument('--end-date', type=str, default=None,
+                        help="结束日期（含），格式如：20240107")
+    parser.add_argument('--last-days', type=int, default=None,
+                        help="最近N天（含今天），与--start-date同时指定时以本参数为准")
+    parser.add_argument('--half', type=str, choices=['AM', 'PM'], default=None,
+                        help="只处理上午(AM)或下午(PM)的视频")
+    parser.add_argument('--hours', type=parse_hours, default=None,
+                        help="小时窗口，左闭右开，如 19-21 表示19:00-20:59，22-2 表示22:00-次日01:59")
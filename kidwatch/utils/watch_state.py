@@ -0,0 +1,87 @@
+import os
+import sqlite3
+from datetime import datetime
+from threading import Lock
+
+
+class WatchState:
+    """监视模式的持久化状态
+
+    以SQLite保存每个摄像头的高水位（已处理完成的最新录像时间）、各日期目录上次列出时的修改时间
+    和处理失败的录像，重启后从上次的位置继续，修改时间未变的目录不会再次列出。
+    """
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS high_water_marks (
+                    camera TEXT PRIMARY KEY,
+                    recorded_at REAL NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS folder_mtimes (
+                    folder TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS failed_videos (
+                    video_path TEXT PRIMARY KEY,
+                    camera TEXT NOT NULL,
+                    recorded_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def get_mark(self, camera):
+        """获取摄像头的高水位（unix时间戳），未记录返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT recorded_at FROM high_water_marks WHERE camera = ?", (camera,)).fetchone()
+        return row[0] if row else None
+
+    def set_mark(self, camera, recorded_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO high_water_marks VALUES (?, ?, ?)",
+                (camera, recorded_at, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def get_folder_mtime(self, folder):
+        """获取目录上次列出时的修改时间，未记录返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT mtime FROM folder_mtimes WHERE folder = ?", (folder,)).fetchone()
+        return row[0] if row else None
+
+    def set_folder_mtime(self, folder, mtime):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO folder_mtimes VALUES (?, ?)", (folder, mtime))
+
+    def record_failure(self, video_path, camera, recorded_at, error):
+        """记录一次处理失败，返回该录像累计的失败次数"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT attempts FROM failed_videos WHERE video_path = ?", (video_path,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO failed_videos VALUES (?, ?, ?, ?, ?, ?)",
+                (video_path, camera, recorded_at, attempts, error,
+                 datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return attempts
+
+    def clear_failure(self, video_path):
+        """录像重试成功后删除失败记录"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM failed_videos WHERE video_path = ?", (video_path,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,271 @@
+import argparse
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+
+class Shard:
+    """确定性分片：按路径的稳定哈希把视频分配给N个节点之一
+
+    同一路径在任何机器、任何进程中都落在同一个分片，
+    各节点用相同的视频列表和不同的分片编号运行即可互不重叠地分担工作。
+    """
+
+    def __init__(self, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"无效的分片: {index}/{count}，应满足 0 <= i < N")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, spec):
+        """解析 i/N 形式的分片参数，i 从0开始
+
+        Raises:
+            argparse.ArgumentTypeError: 格式错误或分片编号超出范围，由argparse报告为参数错误
+        """
+        try:
+            index, count = (int(part) for part in spec.split('/'))
+            return cls(index, count)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f"无效的分片参数: {spec}，格式应为 i/N（0 <= i < N），如 0/4") from e
+
+    @classmethod
+    def from_args(cls, args):
+        """返回命令行指定的分片（--shard 已由 Shard.parse 解析），未指定时返回None"""
+        return args.shard
+
+    def owns(self, path):
+        """判断路径是否属于本分片"""
+        digest = hashlib.sha1(path.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') % self.count == self.index
+
+    def filter(self, paths):
+        return [path for path in paths if self.owns(path)]
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+
+class LeaseQueue:
+    """基于共享SQLite文件的租约任务队列
+
+    每个节点把自己列出的视频加入队列（重复加入会被忽略），然后按批领取任务。
+    领取的任务带有租约，后台线程定期续约；节点崩溃后租约过期，其他节点可重新领取。
+    处理失败的任务在未达到最大尝试次数前重新排队。
+    数据库文件需放在支持文件锁的共享存储上（如NAS的NFS/SMB共享目录）。
+    """
+
+    def __init__(self, db_path, queue_name, lease_seconds=300, max_attempts=3, claim_size=10, worker_id=None,
+                 log=print):
+        """
+        Args:
+            db_path: SQLite文件路径
+            queue_name: 队列名称，如 extract / classify，同一文件可保存多个队列
+            lease_seconds: 租约时长（秒），超过该时间未续约的任务可被其他节点领取
+            max_attempts: 每个任务的最大尝试次数
+            claim_size: 每次领取的任务数
+            worker_id: 节点标识，默认使用 主机名:进程号
+            log: 输出日志的函数
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.queue_name = queue_name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.claim_size = claim_size
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.log = log
+        self._lock = Lock()
+        self._held = set()  # 本节点持有租约、尚未完成的任务
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    queue TEXT NOT NULL,
+                    video_path TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at REAL,
+                    priority REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (queue, video_path)
+                )
+            """)
+            # 旧版本创建的队列文件没有priority列
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if 'priority' not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN priority REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (queue, status)")
+
+    @classmethod
+    def from_args(cls, args, queue_name, log=print):
+        """根据命令行参数创建任务队列，未指定--queue时返回None"""
+        if not args.queue:
+            return None
+        return cls(args.queue, queue_name, lease_seconds=args.lease_seconds,
+                   max_attempts=args.max_attempts, claim_size=args.claim_size, log=log)
+
+    @contextmanager
+    def _transaction(self):
+        """立即获取写锁的事务，保证多个节点领取任务时不会重叠"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, paths, ordered=False):
+        """加入任务，已存在的任务保持原状态
+
+        Args:
+            paths: 视频路径列表
+            ordered: 为True时按列表顺序设置优先级，排在前面的先被领取；否则按路径顺序领取
+        Returns:
+            int: 新加入的任务数
+        """
+        now = time.time()
+        paths = list(paths)
+        total = len(paths)
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (queue, video_path, updated_at, priority) VALUES (?, ?, ?, ?)",
+                ((self.queue_name, path, now, total - index if ordered else 0)
+                 for index, path in enumerate(paths)))
+            return conn.total_changes - before
+
+    def claim(self, limit=None):
+        """领取最多limit个待处理或租约已过期的任务，limit默认为claim_size
+
+        Returns:
+            list: 领取到的视频路径，队列中没有可领取的任务时为空列表
+        """
+        limit = limit or self.claim_size
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT video_path FROM jobs WHERE queue = ? AND attempts < ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY priority DESC, video_path LIMIT ?",
+                (self.queue_name, self.max_attempts, now, limit)).fetchall()
+            paths = [row[0] for row in rows]
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE queue = ? AND video_path = ?",
+                ((self.worker_id, now + self.lease_seconds, now, self.queue_name, path) for path in paths))
+        with self._lock:
+            self._held.update(paths)
+        return paths
+
+    def renew(self):
+        """为本节点持有的所有任务续约
+
+        Returns:
+            int: 续约的任务数
+        """
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return 0
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE queue = ? AND video_path = ? AND owner = ? AND status = 'leased'",
+                ((now + self.lease_seconds, now, self.queue_name, path, self.worker_id) for path in held))
+            return conn.total_changes - before
+
+    def complete(self, path):
+        """标记任务完成"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', lease_expires = NULL, error = NULL, updated_at = ? "
+                "WHERE queue = ? AND video_path = ?",
+                (time.time(), self.queue_name, path))
+        with self._lock:
+            self._held.discard(path)
+
+    def fail(self, path, error):
+        """记录任务失败，未达到最大尝试次数时重新排队"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE queue = ? AND video_path = ? AND status = 'leased'",
+                (self.max_attempts, error, time.time(), self.queue_name, path))
+        with self._lock:
+            self._held.discard(path)
+
+    def release(self):
+        """把本节点持有但未完成的任务放回队列，不计入尝试次数"""
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        if not held:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET status = 'pending', owner = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1, updated_at = ? "
+                "WHERE queue = ? AND video_path = ? AND owner = ? AND status = 'leased'",
+                ((time.time(), self.queue_name, path, self.worker_id) for path in held))
+
+    @contextmanager
+    def heartbeat(self):
+        """在上下文中运行后台续约线程，退出时归还未完成的任务"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    self.renew()
+                except sqlite3.Error as e:
+                    self.log(f"任务租约续约失败: {str(e)}")
+
+        thread = threading.Thread(target=run, name='lease-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+            self.release()
+
+    def counts(self):
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status",
+                (self.queue_name,)).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def add_work_arguments(parser):
+    """为命令行添加多节点分片和任务队列参数"""
+    parser.add_argument('--shard', type=Shard.parse, default=None,
+                        help="只处理第i个分片（共N个，i从0开始），格式如 0/4，按路径哈希确定性划分")
+    parser.add_argument('--queue', type=str, default=None, metavar='DB',
+                        help="共享任务队列的SQLite文件路径，多个节点从队列领取视频，互不重叠")
+    parser.add_argument('--lease-seconds', type=int, default=300,
+                        help="任务租约时长（秒），节点崩溃后超过该时间其他节点可接管，默认300")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="每个视频的最大尝试次数，默认3")
+    parser.add_argument('--claim-size', type=int, default=10,
+                        help="每次从任务队列领取的视频数，默认10")
@@ -1,20 +1,74 @@
-import cv2
-import numpy as np
-import torch
-from ultralytics import YOLO
 import argparse
-import csv
-from datetime import datetime
+from contextlib import closing
+from threading import Lock
 from .utils.base_handler import BaseHandler
+from .utils.cascade import CascadeStats, MotionGate, cascade_options
+from .utils.classification_results import format_camera_stats, make_result, write_results
+from .utils.decode import DecodeTask, FramePool, IntervalSampler, ProcessDecodePool, create_decoder
+from .utils.decode.process_pool import FRAME, OVERSIZED, DecodeWorkerError
+from .utils.deadline import DeadlineExceeded
+from .utils.frame_store import FrameLoader, list_frame_files, scan_frame_directories
+from .utils.profiler import Profiler, add_profile_arguments
+from .utils.schedule import LocalPathReader, add_schedule_arguments
+from .utils.work_queue import add_work_arguments
 
 class VideoClassifier(BaseHandler):
+    model_name = 'yolov8n.pt'
+
     def __init__(self):
         super().__init__()
-        # 加载预训练的YOLOv8模型
-        self.model = YOLO('yolov8n.pt')
+        # YOLOv8模型在首次推理时才加载
+        self._model = None
+        self._model_lock = Lock()
+        # ultralytics模型不是线程安全的，多个线程共用本分类器（如监视模式的处理线程）时推理串行执行，
+        # 读取和解码仍然并行
+        self._inference_lock = Lock()
+        # 级联检测：小模型初筛所有帧，大模型只复核候选帧；摄像头配置中的cascade可单独覆盖
+        self.cascade_config = self.config_reader.get_config().get('cascade') or {}
+        self.cascade_stats = CascadeStats()
+        self._cascade_models = {}
+        self._cascade_models_lock = Lock()
         # 从配置文件读取摄像头配置
         self.camera_configs = self.config_reader.get_config('cameras')
         self.person_class_id = 0
+        # 解码输出缓冲池，各视频之间复用帧内存
+        self.frame_pool = FramePool()
+        # 多进程解码：大于0时由解码进程解码，帧经共享内存帧槽交给本进程批量推理
+        self.process_config = self.config_reader.get_config().get('process_decode') or {}
+        self.decode_processes = 0
+
+    @property
+    def model(self):
+        """懒加载预训练的YOLOv8模型，torch和ultralytics也在此时才导入"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from ultralytics import YOLO
+                    self._model = YOLO(self.model_name)
+        return self._model
+
+    def _infer(self, model, frames, **kwargs):
+        """持有推理锁调用模型"""
+        with self._inference_lock:
+            return model(frames, **kwargs)
+
+    def load_cascade_models(self, config):
+        """预先加载摄像头级联检测两级的模型，未启用级联检测时不做任何事"""
+        options = cascade_options(self.cascade_config, config)
+        if options['enabled']:
+            self.get_cascade_model(options['screen_model'])
+            self.get_cascade_model(options['confirm_model'])
+
+    def get_cascade_model(self, name):
+        """懒加载级联检测某一级的模型，与默认模型同名时共用同一个实例"""
+        if name == self.model_name:
+            return self.model
+        with self._cascade_models_lock:
+            model = self._cascade_models.get(name)
+            if model is None:
+                from ultralytics import YOLO
+                model = self._cascade_models[name] = YOLO(name)
+        return model
         
     def get_camera_type(self, video_path):
         """根据视频路径判断摄像头类型"""
@@ -36,109 +90,463 @@ class VideoClassifier(BaseHandler):
         """获取摄像头的显示名称"""
         return self.camera_configs[camera_type]['name']
         
-    def process_video(self, video_path):
+    def frame_has_child(self, result, frame_height, config):
+        """根据单帧的检测结果判断是否包含小孩
+
+        Args:
+            result: YOLO单帧检测结果
+            frame_height: 帧高度
+            config: 摄像头配置
+        Returns:
+            bool: 是否检测到小孩
+        """
+        data = result.boxes.data
+        if len(data) == 0:
+            return False
+        # 整帧的检测结果一次性从GPU拷贝到内存，而不是逐个检测框拷贝
+        detections = data.cpu().numpy() if hasattr(data, 'cpu') else data
+        for x1, y1, x2, y2, confidence, class_id in detections[:, :6]:
+            # 批量推理时使用批内最低阈值，这里再按摄像头阈值过滤
+            if int(class_id) == self.person_class_id and confidence >= config['conf_threshold']:
+                # 基于身高判断是否为小孩
+                if y2 - y1 < frame_height * config['height_ratio']:
+                    return True
+        return False
+
+    def detect_batch(self, frames, configs):
+        """对一批帧做一次批量推理，启用级联检测的摄像头的帧先初筛再复核
+
+        Args:
+            frames: 帧列表
+            configs: 与帧一一对应的摄像头配置
+        Returns:
+            list: 每帧是否检测到小孩
+        """
+        if not frames:
+            return []
+        options = [cascade_options(self.cascade_config, config) for config in configs]
+        cascaded = [index for index, option in enumerate(options) if option['enabled']]
+        if not cascaded:
+            return self._detect_single_stage(frames, configs)
+        results = [False] * len(frames)
+        plain = [index for index, option in enumerate(options) if not option['enabled']]
+        if plain:
+            detections = self._detect_single_stage([frames[index] for index in plain],
+                                                   [configs[index] for index in plain])
+            for index, has_child in zip(plain, detections):
+                results[index] = has_child
+        self.cascade_stats.add('sampled', len(cascaded))
+        detections = self._detect_cascade([frames[index] for index in cascaded],
+                                          [configs[index] for index in cascaded],
+                                          [options[index] for index in cascaded])
+        for index, has_child in zip(cascaded, detections):
+            results[index] = has_child
+        return results
+
+    def _detect_single_stage(self, frames, configs):
+        """只用默认模型做一次批量推理"""
+        conf = min(config['conf_threshold'] for config in configs)
+        with self.metrics.timer('inference_seconds'):
+            results = self._infer(self.model, frames, conf=conf, verbose=False)
+        self.metrics.inc('frames_inferred_total', len(frames))
+        return [self.frame_has_child(result, frame.shape[0], config)
+                for result, frame, config in zip(results, frames, configs)]
+
+    def _run_stage(self, stage, frames, configs, options):
+        """级联检测的一级：按模型和输入尺寸分组批量推理
+
+        初筛使用级联配置中较低的置信度阈值以保证召回，复核使用摄像头自己的阈值；
+        身高比例的判断两级相同。
+
+        Args:
+            stage: screen（初筛）或 confirm（复核）
+            frames: 帧列表
+            configs: 与帧一一对应的摄像头配置
+            options: 与帧一一对应的级联配置
+        Returns:
+            list: 每帧在该级是否判定为有小孩
+        """
+        results = [False] * len(frames)
+        groups = {}
+        for index, option in enumerate(options):
+            groups.setdefault((option[f'{stage}_model'], option[f'{stage}_imgsz']), []).append(index)
+        for (model_name, imgsz), indices in groups.items():
+            batch = [frames[index] for index in indices]
+            thresholds = [dict(configs[index], conf_threshold=options[index]['screen_conf'])
+                          if stage == 'screen' else configs[index] for index in indices]
+            conf = min(threshold['conf_threshold'] for threshold in thresholds)
+            model = self.get_cascade_model(model_name)
+            with self.metrics.timer(f'cascade_{stage}_seconds'):
+                detections = self._infer(model, batch, conf=conf, imgsz=imgsz, verbose=False)
+            self.metrics.inc('frames_inferred_total', len(batch))
+            for index, detection, frame, threshold in zip(indices, detections, batch, thresholds):
+                results[index] = self.frame_has_child(detection, frame.shape[0], threshold)
+        return results
+
+    def _detect_cascade(self, frames, configs, options):
+        """两级检测：所有帧先初筛，只有候选帧进入复核"""
+        self.cascade_stats.add('screened', len(frames))
+        screened = self._run_stage('screen', frames, configs, options)
+        candidates = [index for index, is_candidate in enumerate(screened) if is_candidate]
+        results = [False] * len(frames)
+        if not candidates:
+            return results
+        self.cascade_stats.add('candidates', len(candidates))
+        confirmed = self._run_stage('confirm', [frames[index] for index in candidates],
+                                    [configs[index] for index in candidates],
+                                    [options[index] for index in candidates])
+        for index, has_child in zip(candidates, confirmed):
+            results[index] = has_child
+        self.cascade_stats.add('confirmed', sum(confirmed))
+        return results
+
+    def motion_gate(self, config):
+        """为单个视频创建运动过滤器，未启用级联检测或运动过滤时返回None
+
+        批量推理时不同视频的帧交错进入同一批，调用方需为每个视频各建一个，在帧进入批次前判断。
+        """
+        options = cascade_options(self.cascade_config, config)
+        if not (options['enabled'] and options['motion']):
+            return None
+        return MotionGate(options['motion_threshold'])
+
+    def motion_skipped(self, gate, frame):
+        """帧与该视频上一个通过的帧相比没有变化时记入统计并返回True，调用方跳过该帧"""
+        if gate is None or gate.changed(frame):
+            return False
+        self.cascade_stats.add('sampled')
+        self.cascade_stats.add('motion_skipped')
+        return True
+
+    def detect_frames(self, frames, config):
+        """逐帧检测，检测到小孩即停止
+
+        启用级联检测时逐帧初筛和复核；开启运动过滤时，与上一帧相比没有变化的帧直接跳过
+        （画面相同检测结果也相同，上一帧未确认有小孩，这一帧也不会）。
+
+        Args:
+            frames: 帧迭代器
+            config: 摄像头配置
+        Returns:
+            bool: 是否检测到小孩
+        """
+        options = cascade_options(self.cascade_config, config)
+        if options['enabled']:
+            gate = self.motion_gate(config)
+            for frame in frames:
+                if self.motion_skipped(gate, frame):
+                    continue
+                self.cascade_stats.add('sampled')
+                if self._detect_cascade([frame], [config], [options])[0]:
+                    return True
+            return False
+
+        metrics = self.metrics
+        for frame in frames:
+            # 使用YOLO进行目标检测
+            with metrics.timer('inference_seconds'):
+                results = self._infer(self.model, frame, conf=config['conf_threshold'])[0]
+            metrics.inc('frames_inferred_total')
+
+            # 分析检测结果
+            if self.frame_has_child(results, frame.shape[0], config):
+                return True
+        return False
+
+    def process_video(self, video_path, camera_type=None):
         """
         处理视频文件，检测是否包含小孩
+
+        Args:
+            video_path: 本地视频路径
+            camera_type: 摄像头类型，不指定时根据路径判断（路径为临时文件时需指定）
         """
-        camera_type = self.get_camera_type(video_path)
+        camera_type = camera_type or self.get_camera_type(video_path)
         config = self.camera_configs[camera_type]
         
-        cap = cv2.VideoCapture(video_path)
-        frame_count = 0
-        child_detected = False
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            if frame_count % config['sample_interval'] == 0:
-                # 使用YOLO进行目标检测
-                results = self.model(frame, conf=config['conf_threshold'])[0]
-                
-                # 分析检测结果
-                for detection in results.boxes.data:
-                    class_id = int(detection[5])
-                    confidence = float(detection[4])
-                    
-                    if class_id == self.person_class_id:
-                        # 获取边界框信息
-                        bbox = detection[:4].cpu().numpy()
-                        height = bbox[3] - bbox[1]
-                        
-                        # 基于身高判断是否为小孩
-                        if height < frame.shape[0] * config['height_ratio']:
-                            child_detected = True
-                            break
-                
-                if child_detected:
-                    break
-            
-            frame_count += 1
+        # 只有采样帧才转换为图像，且写入从缓冲池获取的复用缓冲区
+        with create_decoder(video_path, IntervalSampler.from_config(config),
+                            self.get_decode_options(camera_type), self.frame_pool) as decoder:
+            child_detected = self.detect_frames((frame for _, frame in decoder), config)
         
-        cap.release()
+        self.metrics.inc('videos_processed_total')
         return child_detected, camera_type
 
+    def select_extracted_frames(self, frame_directory, camera_type):
+        """按摄像头的采样间隔从已抽取的帧中选出要检测的帧
+
+        抽帧间隔能整除摄像头的采样间隔时，所需的帧都已抽取，与直接解码视频检测的帧相同。
+
+        Args:
+            frame_directory: FrameDirectory
+            camera_type: 摄像头类型
+        Returns:
+            list: 帧文件路径，抽帧间隔不匹配时返回None
+        """
+        interval = self.camera_configs[camera_type]['sample_interval']
+        if interval % frame_directory.sample_interval:
+            return None
+        sampler = IntervalSampler(interval)
+        return [path for index, path in list_frame_files(frame_directory.frame_dir) if sampler.want(index)]
+
+    def _classify_remote_video(self, video_path, camera_type):
+        """读取并解码NAS上的视频后检测"""
+        with self.open_local_video(video_path) as local_path:
+            return self.process_video(local_path, camera_type)
+
+    def _classify_with_processes(self, video_paths, progress, results):
+        """多进程解码后批量推理
+
+        解码进程解码本地视频，采样帧写入共享内存帧槽；本进程把不同视频的帧凑成一批，
+        直接在帧槽上推理，帧数据不经过pickle。视频检测到小孩后，解码进程跳过其剩余的帧。
+
+        Args:
+            video_paths: 本地视频路径列表
+            progress: 进度跟踪器
+            results: 结果列表，处理完的视频追加到其中
+        """
+        tasks = []
+        camera_types = []
+        for index, video_path in enumerate(video_paths):
+            camera_type = self.get_camera_type(video_path)
+            config = self.camera_configs[camera_type]
+            tasks.append(DecodeTask(index, video_path, config['sample_interval'],
+                                    self.get_decode_options(camera_type), False))
+            camera_types.append(camera_type)
+        batch_size = self.process_config.get('batch_size', 16)
+        has_child = [False] * len(tasks)
+        finished = set()
+        # 各视频的运动过滤器，同一视频的帧由同一个解码进程按顺序送达
+        gates = {}
+        # 等待推理的帧: [(槽编号, 帧, 视频序号), ...]
+        pending = []
+
+        def flush():
+            if not pending:
+                return
+            indices = [index for _, _, index in pending]
+            try:
+                detections = self.detect_batch([frame for _, frame, _ in pending],
+                                               [self.camera_configs[camera_types[index]] for index in indices])
+            finally:
+                for slot, _, _ in pending:
+                    pool.release(slot)
+                del pending[:]
+            for index, detected in zip(indices, detections):
+                if detected and not has_child[index]:
+                    has_child[index] = True
+                    pool.mark_decided(index)
+
+        with ProcessDecodePool.from_config(self.process_config, workers=self.decode_processes,
+                                           min_slots=batch_size) as pool:
+            pool.start(tasks, track_decided=True)
+            try:
+                for slot, frame, message in pool.messages(self.process_config.get('batch_timeout', 0.05)):
+                    if message is None:
+                        flush()
+                        continue
+                    kind, index, _, error = message
+                    if kind == FRAME:
+                        if index not in gates:
+                            gates[index] = self.motion_gate(self.camera_configs[camera_types[index]])
+                        if has_child[index] or self.motion_skipped(gates[index], frame):
+                            pool.release(slot)
+                            continue
+                        pending.append((slot, frame, index))
+                        if len(pending) >= batch_size:
+                            flush()
+                        continue
+                    # 该视频的帧都已收到，推理完积攒的帧才能得出结论
+                    if any(pending_index == index for _, _, pending_index in pending):
+                        flush()
+                    finished.add(index)
+                    gates.pop(index, None)
+                    video_path = tasks[index].video_path
+                    if kind == OVERSIZED and not has_child[index]:
+                        # 帧放不进帧槽（分辨率超过 max_width x max_height），在本进程中解码该视频
+                        self._classify_in_process(video_path, camera_types[index], error, progress, results)
+                        continue
+                    if error is not None:
+                        self.report_video(video_path, error)
+                        self.log_print(f"处理视频 {video_path} 时出错: {error}")
+                    else:
+                        self.metrics.inc('videos_processed_total')
+                        self.report_video(video_path)
+                        self._append_result(results, video_path, camera_types[index], has_child[index])
+                    self.log_print(progress.advance(video_path))
+            except (DeadlineExceeded, DecodeWorkerError) as e:
+                # 已得出的结果保留。解码进程卡住时尚未完成的视频都记为失败；异常退出时只有其正在解码的视频记为失败，
+                # 尚未开始解码的视频在本进程中继续处理
+                self.log_print(f"多进程解码中止: {str(e)}")
+                for task in tasks:
+                    if task.index in finished:
+                        continue
+                    if isinstance(e, DecodeWorkerError) and task.index not in pool.started:
+                        self._classify_in_process(task.video_path, camera_types[task.index], "解码进程已退出",
+                                                  progress, results)
+                        continue
+                    self.report_video(task.video_path, str(e))
+                    self.log_print(f"处理视频 {task.video_path} 时出错: {str(e)}")
+                    progress.advance(task.video_path)
+            finally:
+                for slot, _, _ in pending:
+                    pool.release(slot)
+                del pending[:]
+
+    def _classify_in_process(self, video_path, camera_type, reason, progress, results):
+        """多进程解码无法处理的视频改在本进程中解码和推理"""
+        self.metrics.inc('process_decode_fallbacks_total')
+        self.log_print(f"{video_path}: {reason}，改为在本进程中解码")
+        try:
+            has_child, _ = self.run_watched(video_path, self.process_video, video_path, camera_type)
+            self.report_video(video_path)
+            self._append_result(results, video_path, camera_type, has_child)
+        except Exception as e:
+            self.report_video(video_path, str(e))
+            self.log_print(f"处理视频 {video_path} 时出错: {str(e)}")
+        self.log_print(progress.advance(video_path))
+
+    def _append_result(self, results, video_path, camera_type, has_child):
+        camera_name = self.get_camera_name(camera_type)
+        results.append(make_result(video_path, camera_type, camera_name, has_child))
+        self.log_print(f"处理视频 {video_path} ({camera_name}): {'有' if has_child else '无'}小孩")
+
+    def _write_summary(self, results, output_file):
+        """输出每个摄像头的统计信息，并将结果写入CSV文件"""
+        self.log_print("\n=== 处理统计 ===")
+        for line in format_camera_stats(results, self.camera_configs):
+            self.log_print(line)
+        if self.cascade_stats.counts()['sampled']:
+            self.log_print(self.cascade_stats.format())
+        write_results(output_file, results)
+
     def batch_process_videos(self, video_list_file, output_file):
         """
         批量处理视频文件并输出结果
         """
         results = []
-        # 初始化统计信息（不包括default配置）
-        camera_stats = {camera: {'total': 0, 'with_child': 0} 
-                       for camera in self.camera_configs.keys()
-                       if camera != 'default'}
         
         with open(video_list_file, 'r') as f:
             video_paths = [line.strip() for line in f.readlines()]
+        # 列表中是本地路径，元数据直接从本地文件读取
+        video_paths = self.schedule_videos(self.select_videos(video_paths), LocalPathReader())
+        self.profiler.mark_stage('listed')
         
-        for video_path in video_paths:
-            try:
-                has_child, camera_type = self.process_video(video_path)
-                camera_name = self.get_camera_name(camera_type)
-                results.append({
-                    'video_path': video_path,
-                    'camera_type': camera_type,
-                    'camera_name': camera_name,
-                    'has_child': has_child,
-                    'processed_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-                
-                # 更新统计信息（只统计非default的摄像头）
-                if camera_type != 'default':
-                    camera_stats[camera_type]['total'] += 1
-                    if has_child:
-                        camera_stats[camera_type]['with_child'] += 1
-                    
-                self.log_print(f"处理视频 {video_path} ({camera_name}): {'有' if has_child else '无'}小孩")
-            except Exception as e:
-                self.log_print(f"处理视频 {video_path} 时出错: {str(e)}")
-        
-        # 输出每个摄像头的统计信息
-        self.log_print("\n=== 处理统计 ===")
-        for camera_type, stats in camera_stats.items():
-            if stats['total'] > 0:
-                camera_name = self.get_camera_name(camera_type)
-                child_ratio = (stats['with_child'] / stats['total']) * 100
-                self.log_print(f"{camera_name}摄像头: 总计 {stats['total']} 个视频, "
-                             f"包含小孩 {stats['with_child']} 个 ({child_ratio:.1f}%)")
+        # 使用任务队列时逐批领取视频，出错退出时立即归还未完成的任务
+        with closing(self.iter_work_batches(video_paths)) as batches:
+            for batch in batches:
+                progress = self.create_progress(batch)
+                if self.decode_processes:
+                    self._classify_with_processes(batch, progress, results)
+                    continue
+                for video_path in batch:
+                    try:
+                        has_child, camera_type = self.run_watched(video_path, self.process_video, video_path)
+                        self.report_video(video_path)
+                        self._append_result(results, video_path, camera_type, has_child)
+                    except Exception as e:
+                        self.report_video(video_path, str(e))
+                        self.log_print(f"处理视频 {video_path} 时出错: {str(e)}")
+                    self.log_print(progress.advance(video_path))
         
-        # 将结果写入CSV文件
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, 
-                                  fieldnames=['video_path', 'camera_type', 
-                                            'camera_name', 'has_child', 
-                                            'processed_time'])
-            writer.writeheader()
-            writer.writerows(results)
+        self.profiler.mark_stage('processed')
+        self._write_summary(results, output_file)
+
+    def batch_process_frames(self, output_file, frames_dir=None, video_list_file=None):
+        """
+        使用 extract_video_frames 已抽取的帧检测视频，输出与 batch_process_videos 相同
+
+        抽帧间隔能整除摄像头采样间隔的视频直接读取帧目录，不读取和解码视频；
+        不匹配或没有帧目录的视频回退为从NAS读取并解码。
+
+        Args:
+            output_file: 结果输出文件路径
+            frames_dir: 抽帧输出目录，默认为配置文件的 video_frames.frames_path
+            video_list_file: 只处理列表中的视频（NAS路径，每行一个），默认处理帧目录中的所有视频
+        """
+        frames_dir = frames_dir or self.get_frames_dir()
+        frame_directories, missing = scan_frame_directories(frames_dir)
+        if missing:
+            self.log_print(f"{missing} 个帧目录缺少清单（抽帧未完成或由旧版本生成），已跳过")
+        by_video = {directory.video_path: directory for directory in frame_directories}
+        if video_list_file:
+            with open(video_list_file, 'r') as f:
+                video_paths = [line.strip() for line in f.readlines() if line.strip()]
+        else:
+            video_paths = list(by_video)
+        video_paths = self.select_videos(video_paths)
+        self.profiler.mark_stage('listed')
+
+        video_frames_config = self.config_reader.get_config().get('video_frames') or {}
+        loader = FrameLoader(video_frames_config.get('load_workers', 4), video_frames_config.get('load_prefetch', 64))
+        results = []
+        with closing(self.iter_work_batches(video_paths)) as batches:
+            for batch in batches:
+                progress = self.create_progress(batch)
+                from_frames, from_video = [], []
+                for video_path in batch:
+                    directory = by_video.get(video_path)
+                    camera_type = (directory.camera_type if directory and directory.camera_type in self.camera_configs
+                                   else self.get_camera_type(video_path))
+                    frame_paths = self.select_extracted_frames(directory, camera_type) if directory else None
+                    if frame_paths is None:
+                        from_video.append((video_path, camera_type))
+                    else:
+                        from_frames.append(((video_path, camera_type), frame_paths))
+                self.log_print(f"{len(from_frames)} 个视频使用已抽取的帧，{len(from_video)} 个视频需要解码")
+
+                for (video_path, camera_type), frames in loader.iter_videos(from_frames):
+                    try:
+                        has_child = self.detect_frames(frames, self.camera_configs[camera_type])
+                        self.metrics.inc('videos_from_frames_total')
+                        self.report_video(video_path)
+                        self._append_result(results, video_path, camera_type, has_child)
+                    except Exception as e:
+                        self.report_video(video_path, str(e))
+                        self.log_print(f"处理视频 {video_path} 时出错: {str(e)}")
+                    self.log_print(progress.advance(video_path))
+
+                for video_path, camera_type in from_video:
+                    try:
+                        has_child, _ = self.run_watched(video_path, self._classify_remote_video,
+                                                        video_path, camera_type)
+                        self.report_video(video_path)
+                        self._append_result(results, video_path, camera_type, has_child)
+                    except Exception as e:
+                        self.report_video(video_path, str(e))
+                        self.log_print(f"处理视频 {video_path} 时出错: {str(e)}")
+                    self.log_print(progress.advance(video_path))
+
+        self.profiler.mark_stage('processed')
+        self._write_summary(results, output_file)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='检测视频中是否包含小孩')
-    parser.add_argument('-i', '--input', required=True,
-                      help='包含视频文件路径的列表文件')
+    parser.add_argument('-i', '--input', default=None,
+                      help='包含视频文件路径的列表文件，使用--frames时可省略')
     parser.add_argument('-o', '--output', required=True,
                       help='结果输出文件路径')
+    parser.add_argument('--frames', nargs='?', const='', default=None, metavar='FRAMES_DIR',
+                      help='使用extract_video_frames已抽取的帧检测，可指定帧目录，默认为配置文件video_frames.frames_path')
+    parser.add_argument('--processes', type=int, default=0, metavar='N',
+                      help='使用N个解码进程，帧经共享内存交给本进程批量推理；默认0，在本进程解码')
+    add_profile_arguments(parser)
+    add_work_arguments(parser)
+    add_schedule_arguments(parser)
     
     args = parser.parse_args()
+    if args.frames is None and not args.input:
+        parser.error('需要指定 -i/--input 或 --frames')
     classifier = VideoClassifier()
-    classifier.batch_process_videos(args.input, args.output) 
\ No newline at end of file
+    classifier.configure_work(args, 'classify')
+    classifier.configure_schedule(args)
+    classifier.decode_processes = args.processes
+    classifier.start_profiler(Profiler.from_args(args))
+    try:
+        if args.frames is not None:
+            classifier.batch_process_frames(args.output, args.frames or None, args.input)
+        else:
+            classifier.batch_process_videos(args.input, args.output)
+    finally:
+        classifier.stop_profiler()
+        classifier.export_metrics('video_classifier') 
\ No newline at end of file
@@ -0,0 +1,336 @@
+import argparse
+import csv
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+from .utils.base_handler import BaseHandler
+from .utils.classification_results import RESULT_FIELDS, make_result
+from .utils.profiler import Profiler, add_profile_arguments
+from .utils.video_filter import VideoFilter
+from .utils.watch_state import WatchState
+
+WATCH_ACTIONS = ('classify', 'extract')
+
+
+class RecordingWatcher(BaseHandler):
+    """持续监视NAS上的新录像，写完后立即交给分类或抽帧
+
+    每轮只查看每个摄像头最近的几个日期目录，目录修改时间未变时不再列出；
+    每个摄像头记录高水位（已处理完成的最新录像时间），早于高水位的录像不会重复处理。
+    新发现的录像在大小连续 stable_seconds 不变后才视为写完，
+    然后以有限的并发数交给 VideoClassifier 或 ExtractVideoFrames 处理。
+    高水位只越过处理成功的录像，处理中或失败待重试的录像会挡住高水位，保证每个录像至少处理一次；
+    失败的录像记录在状态库中，重新等待后重试，累计失败 max_retries 次后放弃。
+    """
+
+    def __init__(self, action='classify', output_file=None):
+        """
+        Args:
+            action: classify（检测是否包含小孩，结果追加到output_file）或 extract（抽帧）
+            output_file: classify 的结果CSV
+        """
+        super().__init__()
+        if action not in WATCH_ACTIONS:
+            raise ValueError(f"无效的处理方式: {action}，可选: {', '.join(WATCH_ACTIONS)}")
+        if action == 'classify' and not output_file:
+            raise ValueError("classify 需要指定结果输出文件")
+        self.action = action
+        self.output_file = output_file
+        self.watch_config = self.config_reader.get_config().get('watch') or {}
+        state_path = self.watch_config.get('state_path', 'data/intermediate/watch_state.db')
+        if not os.path.isabs(state_path):
+            state_path = os.path.join(self.config_reader.get_root_path(), state_path)
+        self.state = WatchState(state_path)
+        # 正在等待写完的录像: {路径: (摄像头, 录制时间, 上次大小, 大小开始不变的时间, 发现时间)}
+        self._pending = {}
+        # 已交给处理、尚未完成的录像: {路径: (摄像头, 录制时间)}
+        self._submitted = {}
+        # 已处理完成但高水位尚未越过的录像（被更早的未完成录像挡住）: {路径: (摄像头, 录制时间)}
+        self._completed = {}
+        # 工作线程的处理结果，由主循环取出后更新上面的状态: (路径, 摄像头, 录制时间, 错误信息)
+        self._outcomes = queue.Queue()
+        # 本次运行中已完整列出过的摄像头；目录修改时间只反映文件的增删，
+        # 重启前仍在写入或未处理完的录像不会改变它，所以启动后的第一轮总是列出所有最近目录
+        self._scanned_cameras = set()
+        self._stop = threading.Event()
+        self._worker = None
+        self._worker_lock = Lock()
+        self._executor = None
+        self._in_flight = None
+        self._output_lock = Lock()
+
+    @property
+    def worker(self):
+        """懒加载实际处理录像的分类器或抽帧器，共用本监视器的文件处理器
+
+        各处理线程共用同一个实例，分类器内部串行执行模型推理。
+        """
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    if self.action == 'classify':
+                        from .video_classifier import VideoClassifier
+                        worker = VideoClassifier()
+                    else:
+                        from .extract_video_frames import ExtractVideoFrames
+                        worker = ExtractVideoFrames()
+                        os.makedirs(worker.output_dir, exist_ok=True)
+                    worker.file_handler = self.file_handler
+                    self._worker = worker
+        return self._worker
+
+    def _get_max_workers(self):
+        """处理并发数：配置值与SMB连接池安全限制的一半取较小值"""
+        return max(1, min(self.watch_config.get('max_workers', 2),
+                          self.file_handler.get_safe_connections_limit() // 2))
+
+    def _cameras(self, camera=None):
+        if camera:
+            if camera not in self.camera_configs:
+                raise ValueError(f'{camera} is not a valid camera type in config')
+            return [camera]
+        return [key for key, config in self.camera_configs.items() if key != 'default' and config.get('folder')]
+
+    def _recorded_at(self, video_path):
+        """录像的录制时间：优先从文件名解析，否则使用修改时间"""
+        recorded = VideoFilter.parse_file_time(os.path.basename(video_path))
+        if recorded is not None:
+            return recorded.timestamp()
+        return self.file_handler.stat(video_path).mtime
+
+    def _recent_folders(self, folder):
+        """摄像头目录下最近的几个日期目录，目录名按日期排序"""
+        names = sorted(name for name in self.file_handler.list_files(path=folder, excludes=['.DS_Store'])
+                       if not (name.startswith('.') or name.startswith('@')))
+        return [f'{folder}/{name}' for name in names[-self.watch_config.get('recent_folders', 2):]]
+
+    def scan_camera(self, camera):
+        """列出摄像头最近日期目录中高水位之后的新录像，加入等待写完的列表
+
+        启动后的第一轮列出所有最近目录，之后只列出修改时间变化的目录。
+
+        Returns:
+            int: 新发现的录像数
+        """
+        mark = self.state.get_mark(camera)
+        if mark is None:
+            # 首次运行只补处理最近 backfill_minutes 内的录像
+            mark = time.time() - self.watch_config.get('backfill_minutes', 60) * 60
+            self.state.set_mark(camera, mark)
+        found = 0
+        first_scan = camera not in self._scanned_cameras
+        for folder in self._recent_folders(self.camera_configs[camera]['folder']):
+            mtime = self.file_handler.stat(folder).mtime
+            if not first_scan and mtime == self.state.get_folder_mtime(folder):
+                self.metrics.inc('watch_folders_skipped_total')
+                continue
+            self.metrics.inc('watch_folders_listed_total')
+            for video_path in self.file_handler.list_video_files(folder):
+                if video_path in self._pending or video_path in self._submitted or video_path in self._completed:
+                    continue
+                recorded_at = self._recorded_at(video_path)
+                if recorded_at <= mark:
+                    continue
+                self._pending[video_path] = (camera, recorded_at, None, None, time.monotonic())
+                found += 1
+            self.state.set_folder_mtime(folder, mtime)
+        self._scanned_cameras.add(camera)
+        return found
+
+    def collect_complete(self):
+        """检查等待中的录像大小是否已稳定，返回已写完的录像 [(摄像头, 录制时间, 路径), ...]
+
+        等待超过 max_wait_minutes 仍未写完的录像（如录制中断留下的空文件）被放弃，不再阻挡高水位。
+        """
+        stable_seconds = self.watch_config.get('stable_seconds', 30)
+        max_wait = self.watch_config.get('max_wait_minutes', 60) * 60
+        now = time.monotonic()
+        complete = []
+        for video_path, (camera, recorded_at, last_size, since, found_at) in list(self._pending.items()):
+            if now - found_at > max_wait:
+                del self._pending[video_path]
+                self.metrics.inc('watch_abandoned_total')
+                self.log_print(f"录像 {video_path} 等待超过 {max_wait / 60:.0f} 分钟仍未写完，放弃处理")
+                continue
+            try:
+                size = self.file_handler.stat(video_path).size
+            except Exception as e:
+                self.log_print(f"获取录像大小失败 {video_path}: {str(e)}")
+                continue
+            if size != last_size or size == 0:
+                self._pending[video_path] = (camera, recorded_at, size, now, found_at)
+            elif now - since >= stable_seconds:
+                del self._pending[video_path]
+                complete.append((camera, recorded_at, video_path))
+        return sorted(complete, key=lambda item: item[1])
+
+    def _collect_outcomes(self):
+        """取出工作线程的处理结果：成功的录像计入已完成，失败的录像重新等待后重试"""
+        max_retries = self.watch_config.get('max_retries', 3)
+        while True:
+            try:
+                video_path, camera, recorded_at, error = self._outcomes.get_nowait()
+            except queue.Empty:
+                return
+            self._submitted.pop(video_path, None)
+            if error is None:
+                self._completed[video_path] = (camera, recorded_at)
+                # 之前失败过（可能在重启前）的录像重试成功后删除失败记录
+                self.state.clear_failure(video_path)
+                continue
+            attempts = self.state.record_failure(video_path, camera, recorded_at, error)
+            if attempts >= max_retries:
+                # 放弃后不再挡住高水位，失败记录保留在状态库中
+                self._completed[video_path] = (camera, recorded_at)
+                self.metrics.inc('watch_given_up_total')
+                self.log_print(f"录像 {video_path} 已失败 {attempts} 次，放弃处理")
+            else:
+                self._pending[video_path] = (camera, recorded_at, None, None, time.monotonic())
+                self.metrics.inc('watch_retries_total')
+                self.log_print(f"录像 {video_path} 第 {attempts} 次处理失败，稍后重试")
+
+    def _advance_mark(self, camera):
+        """把高水位推进到已处理完成的最新录像，但不越过仍在等待、处理中或待重试的录像，
+        处理失败或进程中途退出时重启后不会漏掉它们"""
+        blocking = [item[1] for item in self._pending.values() if item[0] == camera]
+        blocking += [recorded_at for item_camera, recorded_at in self._submitted.values() if item_camera == camera]
+        limit = min(blocking) if blocking else float('inf')
+        mark = max((recorded_at for item_camera, recorded_at in self._completed.values()
+                    if item_camera == camera and recorded_at < limit), default=None)
+        if mark is None:
+            return
+        if mark > (self.state.get_mark(camera) or 0):
+            self.state.set_mark(camera, mark)
+        # 高水位之前的录像不会再被列出，无需继续记录
+        for video_path, (item_camera, recorded_at) in list(self._completed.items()):
+            if item_camera == camera and recorded_at <= mark:
+                del self._completed[video_path]
+
+    def _append_result(self, result):
+        """追加一条分类结果，文件不存在时先写表头"""
+        with self._output_lock:
+            exists = os.path.exists(self.output_file) and os.path.getsize(self.output_file) > 0
+            with open(self.output_file, 'a', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
+                if not exists:
+                    writer.writeheader()
+                writer.writerow(result)
+
+    def _classify(self, camera, video_path):
+        with self.open_local_video(video_path) as local_path:
+            return self.worker.process_video(local_path, camera)
+
+    def process(self, camera, video_path, recorded_at):
+        """处理一个已写完的录像，卡住时由看门狗放弃，不占用处理名额；结果交给主循环更新高水位"""
+        started = time.perf_counter()
+        error = None
+        try:
+            if self.action == 'classify':
+                has_child, camera_type = self.run_watched(video_path, self._classify, camera, video_path)
+                camera_name = self.camera_configs[camera_type]['name']
+                self._append_result(make_result(video_path, camera_type, camera_name, has_child))
+                self.log_print(f"处理视频 {video_path} ({camera_name}): {'有' if has_child else '无'}小孩")
+            else:
+                frames_count = self.run_watched(video_path, self.worker.capture_frames,
+                                                video_path, self.worker.output_dir)
+                self.log_print(f"处理视频 {video_path}: 提取 {frames_count} 帧")
+            self.metrics.observe('watch_video_seconds', time.perf_counter() - started)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            self.metrics.inc('watch_failures_total')
+            self.log_print(f"处理视频 {video_path} 时出错: {error}")
+        finally:
+            self._outcomes.put((video_path, camera, recorded_at, error))
+            self._in_flight.release()
+
+    def poll_once(self, camera=None):
+        """执行一轮：扫描新录像，把已写完的录像交给线程池
+
+        Returns:
+            int: 本轮交给处理的录像数
+        """
+        self._collect_outcomes()
+        for key in self._cameras(camera):
+            try:
+                found = self.scan_camera(key)
+                if found:
+                    self.log_print(f"{self.camera_configs[key]['name']}: 发现 {found} 个新录像")
+            except Exception as e:
+                self.log_print(f"扫描摄像头 {key} 失败: {str(e)}")
+        complete = self.collect_complete()
+        for key, recorded_at, video_path in complete:
+            self._submitted[video_path] = (key, recorded_at)
+        for key in self._cameras(camera):
+            self._advance_mark(key)
+        for key, recorded_at, video_path in complete:
+            # 正在处理的录像达到上限时等待，避免积压占用内存和连接
+            self._in_flight.acquire()
+            self._executor.submit(self.process, key, video_path, recorded_at)
+        self.metrics.inc('watch_videos_submitted_total', len(complete))
+        return len(complete)
+
+    def run(self, camera=None, interval=None, once=False):
+        """持续监视，直到收到SIGINT/SIGTERM
+
+        Args:
+            camera: 只监视指定摄像头
+            interval: 两轮之间的间隔（秒），默认使用配置文件watch.interval
+            once: 只执行一轮并等待处理完成，用于cron调度
+        """
+        interval = interval or self.watch_config.get('interval', 60)
+        max_workers = self._get_max_workers()
+        self._in_flight = BoundedSemaphore(max_workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='watch-worker')
+        self.log_print(f"开始监视新录像: 处理方式 {self.action}, 并发数 {max_workers}, 间隔 {interval}s")
+        try:
+            while not self._stop.is_set():
+                self.poll_once(camera)
+                if once:
+                    # 新录像至少要再观察一次大小才能确认写完
+                    if self._pending and not self._stop.wait(self.watch_config.get('stable_seconds', 30)):
+                        self.poll_once(camera)
+                    break
+                self._stop.wait(interval)
+        finally:
+            self._executor.shutdown(wait=True)
+            # 保存停止前完成的录像推进的高水位
+            self._collect_outcomes()
+            for key in self._cameras(camera):
+                self._advance_mark(key)
+            self.state.close()
+            self.log_print(f"停止监视，仍在等待写完的录像 {len(self._pending)} 个")
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='持续监视NAS上的新录像，写完后立即分类或抽帧')
+    parser.add_argument('-a', '--action', type=str, choices=WATCH_ACTIONS, default='classify',
+                        help="处理方式：classify(检测是否包含小孩)、extract(抽帧)，默认classify")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='classify 的结果输出文件路径，结果逐条追加')
+    parser.add_argument('-camera', '--camera', type=str, default=None,
+                        help="摄像头配置名称(如：bedroom, living_room， dining_room)，若不设置则监视所有摄像头")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="两轮扫描之间的间隔（秒），默认使用配置文件watch.interval")
+    parser.add_argument('--once', action='store_true',
+                        help="只扫描一轮并等待处理完成，用于cron调度")
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    watcher = RecordingWatcher(args.action, args.output)
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    watcher.start_profiler(Profiler.from_args(args))
+    try:
+        watcher.run(args.camera, args.interval, args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop_profiler()
+        watcher.export_metrics('watch')
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from kidwatch.benchmarks.fake_file_handler import FakeFileHandler
+from kidwatch.utils.config_reader import ConfigReader
+from kidwatch.utils.fileHandler.file_handler import DirSummary
+from kidwatch.utils.notifier import NotificationDispatcher
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """记录收到的POST请求，前 fail_times 次返回503"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.attempts += 1
+            failing = server.attempts <= server.fail_times
+            if not failing:
+                server.received.append((dict(self.headers), json.loads(body)))
+        self.send_response(503 if failing else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubNotifyServer:
+    def __init__(self, fail_times=0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.attempts = 0
+        self.server.fail_times = fail_times
+        self.server.received = []
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/notify"
+
+    @property
+    def received(self):
+        return self.server.received
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+def notify_config(url):
+    return {'url': url, 'api_token': 'token', 'topic_id': 'topic', 'timeout': 5, 'backoff_factor': 0}
+
+
+class NotificationDispatcherTest(unittest.TestCase):
+    def test_submit_delivers_after_retry(self):
+        with StubNotifyServer(fail_times=1) as stub:
+            dispatcher = NotificationDispatcher(notify_config(stub.url), log=lambda *args: None)
+            dispatcher.submit('摘要', '内容')
+            dispatcher.close(timeout=10)
+
+        self.assertEqual(stub.server.attempts, 2)
+        self.assertEqual(len(stub.received), 1)
+        headers, payload = stub.received[0]
+        self.assertEqual(headers['X-API-Token'], 'token')
+        self.assertEqual(payload['summary'], '摘要')
+        self.assertEqual(payload['content'], '内容')
+        self.assertEqual(payload['extra'], {'topic_id': 'topic'})
+
+
+class CheckFilesNotificationTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.work = tempfile.mkdtemp()
+        self.target = datetime.now() - timedelta(days=3)
+        for k in range(1, 8):
+            for camera in ('ok', 'partial', 'broken'):
+                self._make(camera, self.target - timedelta(days=k), 10)
+        self._make('ok', self.target, 10)
+        self._make('partial', self.target, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def _make(self, camera, day, count):
+        folder = f"{self.root}/{camera}/{day.strftime('%Y%m%d')}AM"
+        os.makedirs(folder, exist_ok=True)
+        for i in range(count):
+            with open(f"{folder}/{i:02d}M00S_1.mp4", 'wb') as file:
+                file.write(b'x')
+
+    def _checker(self, url):
+        # 不依赖本地config.yaml，直接给单例填入测试配置
+        previous = ConfigReader._instance
+        reader = object.__new__(ConfigReader)
+        reader.config = {
+            'notify': notify_config(url),
+            'check': {'history_path': os.path.join(self.work, 'history.db'), 'partial_ratio': 0.5},
+        }
+        reader.is_internal = False
+        ConfigReader._instance = reader
+        self.addCleanup(setattr, ConfigReader, '_instance', previous)
+
+        from kidwatch.check_surveillance import CheckerSurveillance
+        checker = CheckerSurveillance()
+        checker._file_handler = FakeFileHandler(self.root)
+        for k in range(1, 8):
+            date_str = (self.target - timedelta(days=k)).strftime('%Y%m%d')
+            for camera in ('ok', 'partial', 'broken'):
+                checker.history.record(camera, date_str, DirSummary(10, 10))
+        return checker
+
+    def test_one_aggregated_notification_per_run(self):
+        with StubNotifyServer() as stub:
+            checker = self._checker(stub.url)
+            checker.check_files(self.target.strftime('%Y%m%d'))
+            checker.close()
+
+        self.assertEqual(len(stub.received), 1)
+        content = stub.received[0][1]['content']
+        self.assertIn('异常摄像头：broken', content)
+        self.assertIn('同步不完整摄像头：partial', content)
+        self.assertNotIn('ok：', content)
+
+
+if __name__ == '__main__':
+    unittest.main()